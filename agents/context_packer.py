@@ -0,0 +1,195 @@
+import logging
+import re
+from typing import Dict, List, Optional
+
+from langchain.schema import Document
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Local tokenizer; fall back to a ~4 chars/token estimate without tiktoken
+try:
+    import tiktoken
+    HAS_TIKTOKEN = True
+except ImportError:
+    HAS_TIKTOKEN = False
+
+_encoding = None
+
+# Token budgets per agent for retrieved context and conversation history
+CONTEXT_BUDGETS = {
+    "product": {"documents": 700, "history": 250},
+    "education": {"documents": 600, "history": 250},
+    "reassurance": {"documents": 400, "history": 350},
+}
+
+# Chunks sharing this much of their word shingles are treated as duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.8
+# Minimum shared characters for a suffix/prefix overlap (chunking overlap is 100)
+MIN_OVERLAP_CHARS = 40
+# Don't bother including a truncated chunk smaller than this
+MIN_CHUNK_TOKENS = 40
+
+PACKED_TOKENS = metrics.histogram(
+    "nua_prompt_context_tokens",
+    "Tokens of retrieved context + history packed into agent prompts",
+    labels=("agent", "section"),
+    buckets=(50, 100, 200, 400, 800, 1600, 3200),
+)
+
+
+def _get_encoding():
+    """Load the cl100k tokenizer on first use (it may need a one-off download)"""
+    global _encoding, HAS_TIKTOKEN
+    if _encoding is None and HAS_TIKTOKEN:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"tiktoken encoding unavailable ({e}), estimating tokens from length")
+            HAS_TIKTOKEN = False
+    return _encoding
+
+
+def warm_up_tokenizer():
+    """Load the tokenizer at startup so no request pays for it"""
+    _get_encoding()
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding:
+        return encoding.decode(encoding.encode(text)[:max_tokens]).rstrip() + "..."
+    return text[:max_tokens * 4].rstrip() + "..."
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _overlap_length(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right`"""
+    longest = min(len(left), len(right))
+    for length in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+class ContextPacker:
+    """
+    Dedupes, ranks and trims retrieved chunks and conversation history
+    so an agent prompt stays inside its token budget
+    """
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+        budgets = CONTEXT_BUDGETS[agent_name]
+        self.document_budget = budgets["documents"]
+        self.history_budget = budgets["history"]
+
+    def pack(self, documents: List[Document]) -> List[Document]:
+        """Return the most relevant distinct chunks that fit the document budget"""
+        ranked = self._rank(documents)
+        distinct = self._dedupe(ranked)
+
+        packed, used = [], 0
+        for doc in distinct:
+            tokens = count_tokens(doc.page_content)
+            remaining = self.document_budget - used
+            if tokens > remaining:
+                if remaining < MIN_CHUNK_TOKENS:
+                    break
+                doc = Document(page_content=truncate_to_tokens(doc.page_content, remaining), metadata=doc.metadata)
+                tokens = remaining
+            packed.append(doc)
+            used += tokens
+
+        PACKED_TOKENS.observe(self.agent_name, "documents", value=used)
+        return packed
+
+    def pack_history(self, previous_interactions: List[Dict], summary: Optional[str] = None) -> str:
+        """
+        The rolling conversation summary (up to half the history budget),
+        then newest-first turns, each trimmed, until the budget is used
+        """
+        summary_text, used = "", 0
+        if summary:
+            summary_text = "Summary of the conversation so far: " + truncate_to_tokens(summary, self.history_budget // 2)
+            used = count_tokens(summary_text)
+        turns = []
+        for interaction in previous_interactions or []:
+            query = interaction.get("query") or ""
+            response = interaction.get("response") or ""
+            remaining = self.history_budget - used
+            if remaining < MIN_CHUNK_TOKENS:
+                break
+            turn = f"Customer: {query}\nNua: {response}"
+            turn = truncate_to_tokens(turn, remaining)
+            turns.append(turn)
+            used += count_tokens(turn)
+
+        PACKED_TOKENS.observe(self.agent_name, "history", value=used)
+        # Oldest first so it reads like a transcript
+        return "\n\n".join(([summary_text] if summary_text else []) + list(reversed(turns)))
+
+    def _rank(self, documents: List[Document]) -> List[Document]:
+        # Retrievers put their fused/BM25/vector score in metadata["score"]
+        # (lexical_index.with_score); unscored fallbacks keep their order
+        indexed = list(enumerate(documents))
+        indexed.sort(key=lambda item: (-float(item[1].metadata.get("score", 0.0)), item[0]))
+        return [doc for _, doc in indexed]
+
+    def _dedupe(self, documents: List[Document]) -> List[Document]:
+        kept: List[Document] = []
+        kept_shingles: List[set] = []
+        for doc in documents:
+            text = doc.page_content.strip()
+            if not text:
+                continue
+            shingles = _shingles(text)
+
+            duplicate = False
+            for i, existing in enumerate(kept):
+                existing_text = existing.page_content
+                if text in existing_text:
+                    duplicate = True
+                    break
+                if existing_text in text:
+                    kept[i] = Document(page_content=text, metadata=existing.metadata)
+                    kept_shingles[i] = shingles
+                    duplicate = True
+                    break
+                union = len(shingles | kept_shingles[i])
+                if union and len(shingles & kept_shingles[i]) / union >= NEAR_DUPLICATE_THRESHOLD:
+                    duplicate = True
+                    break
+                # Adjacent chunks from the same source overlap by the chunking overlap
+                overlap = _overlap_length(existing_text, text)
+                if overlap:
+                    merged = existing_text + text[overlap:]
+                elif _overlap_length(text, existing_text):
+                    merged = text + existing_text[_overlap_length(text, existing_text):]
+                else:
+                    continue
+                kept[i] = Document(page_content=merged, metadata=existing.metadata)
+                kept_shingles[i] = _shingles(merged)
+                duplicate = True
+                break
+
+            if not duplicate:
+                kept.append(Document(page_content=text, metadata=doc.metadata))
+                kept_shingles.append(shingles)
+        return kept
@@ -0,0 +1,57 @@
+import logging
+import os
+
+from langchain.schema import HumanMessage
+
+from utils.llm import LLMClient
+from .context_packer import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MODEL = os.getenv("NUA_SUMMARY_MODEL", "gpt-3.5-turbo")
+# Ceiling on the rolling summary, whatever the conversation length
+SUMMARY_MAX_TOKENS = int(os.getenv("NUA_SUMMARY_MAX_TOKENS", "150"))
+# The newest exchange is trimmed to this before it is folded in
+TURN_MAX_TOKENS = 400
+
+
+class ConversationSummarizer:
+    """
+    Folds each finished turn into a per-user rolling summary, so agents
+    get a bounded digest of the whole conversation plus only the last few
+    turns verbatim. Runs in the background, off the response path.
+    """
+
+    def __init__(self):
+        self.llm = LLMClient(temperature=0.0, model=SUMMARY_MODEL, agent="summarizer")
+
+    async def initialize(self):
+        pass
+
+    async def summarize(self, previous_summary: str, query: str, response: str) -> str:
+        """The previous summary updated with one more exchange"""
+        turn = truncate_to_tokens(f"Customer: {query}\nNua: {response}", TURN_MAX_TOKENS)
+        prompt = f"""
+        You maintain a running summary of a customer's conversation with Nua, a women's health brand.
+        Update the summary with the latest exchange. Keep: the customer's concerns and symptoms,
+        products discussed or recommended, stated preferences, emotional state, and open questions.
+        Drop greetings and anything already resolved. At most {SUMMARY_MAX_TOKENS // 4 * 3} words,
+        third person, no preamble.
+
+        CURRENT SUMMARY:
+        {previous_summary or "(none yet)"}
+
+        LATEST EXCHANGE:
+        {turn}
+
+        UPDATED SUMMARY:
+        """
+        try:
+            message = await self.llm.apredict_messages([HumanMessage(content=prompt)])
+            summary = message.content.strip()
+        except Exception as e:
+            logger.warning(f"Summary update failed, keeping the previous summary: {e}")
+            return previous_summary
+        if count_tokens(summary) > SUMMARY_MAX_TOKENS:
+            summary = truncate_to_tokens(summary, SUMMARY_MAX_TOKENS)
+        return summary
@@ -1,11 +1,10 @@
 from datetime import datetime
 import logging
-try:
-    from langchain_openai import ChatOpenAI
-except ImportError:
-    from langchain.chat_models import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
+from typing import List, Optional
+from langchain.schema import SystemMessage, HumanMessage, Document
 from database.pinecone_db import VectorDBWrapper
+from utils.llm import LLMClient
+from .context_packer import ContextPacker
 
 logger = logging.getLogger(__name__)
 
@@ -14,9 +13,17 @@ class EducationAgent:
     Handles health education and information queries
     """
     
+    # Used when the orchestrator answers in fused classify-and-answer mode
+    persona = (
+        "Nua's Health Educator. Be factual but accessible (no unexplained jargon), debunk myths "
+        "if relevant and never diagnose. If the context doesn't fully answer, use general "
+        "medical knowledge but add a disclaimer."
+    )
+    
     def __init__(self):
         self.vector_db = VectorDBWrapper()
-        self.llm = ChatOpenAI(temperature=0.3, model="gpt-4-turbo") # Lower temp for factual info
+        self.llm = LLMClient(temperature=0.3, model="gpt-4-turbo", agent="education") # Lower temp for factual info
+        self.packer = ContextPacker("education")
     
     async def initialize(self):
         await self.vector_db.initialize()
@@ -25,17 +32,28 @@ class EducationAgent:
         """
         Retrieve educational content and explain clearly
         """
-        # 1. Search vector DB for health topics
-        relevant_info = await self.vector_db.search(
+        relevant_info = await self.retrieve(query, context)
+        return await self.generate(query, relevant_info, context)
+
+    async def retrieve(self, query: str, context: dict, query_vector: Optional[List[float]] = None, metadata_filter: Optional[dict] = None) -> List[Document]:
+        """Search vector DB for health topics"""
+        return await self.vector_db.search(
             query=query,
             namespace="education",
-            top_k=2
+            top_k=2,
+            metadata_filter=metadata_filter,
+            query_vector=query_vector
         )
+
+    async def generate(self, query: str, relevant_info: List[Document], context: dict) -> str:
+        """Explain the topic using the retrieved scientific context"""
+        # 1. Format context
+        relevant_info = self.packer.pack(relevant_info)
+        info_context = self.format_context(relevant_info)
+        history = self.packer.pack_history(context.get("previous_interactions"), context.get("conversation_summary"))
+        history_section = f"\n        RECENT CONVERSATION:\n{history}\n" if history else ""
         
-        # 2. Format context
-        info_context = "\n\n".join([doc.page_content for doc in relevant_info])
-        
-        # 3. Generate response
+        # 2. Generate response
         prompt = f"""
         You are Nua's Health Educator. Answer the customer's question using the scientific context provided.
         
@@ -43,6 +61,7 @@ class EducationAgent:
         
         SCIENTIFIC CONTEXT:
         {info_context}
+        {history_section}
         
         GUIDELINES:
         - Be factual but accessible (no jargon without explanation).
@@ -58,3 +77,13 @@ class EducationAgent:
         ])
         
         return response.content
+
+    def format_context(self, relevant_info: List[Document]) -> str:
+        return "\n\n".join([doc.page_content for doc in relevant_info])
+
+    def fallback_answer(self, query: str, relevant_info: List[Document]) -> str:
+        """Retrieval-only answer used when generation runs out of time"""
+        if not relevant_info:
+            return "I couldn't look that up fully right now. Please try again in a moment."
+        info = "\n\n".join([doc.page_content for doc in relevant_info])
+        return f"Here's some information that may help:\n\n{info}"
@@ -0,0 +1,202 @@
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from data.knowledge_base import NUAT_KNOWLEDGE_STRUCTURE
+from utils.metrics import metrics
+
+from .safety_agent import is_emergency
+
+logger = logging.getLogger(__name__)
+
+FAST_PATH_ENABLED = os.getenv("NUA_FAST_PATH", "true").lower() in ("1", "true", "yes")
+# Longer queries usually carry detail a template can't address
+MAX_QUERY_TOKENS = int(os.getenv("NUA_FAST_PATH_MAX_TOKENS", "20"))
+# Share of a myth's words the query must contain
+MYTH_MATCH_THRESHOLD = 0.8
+
+# Everyday words customers use for the concerns in PRODUCTS.concern_addresses
+CONCERN_SYNONYMS = {
+    "leakage": ["leak", "leaks", "leaking", "leaked", "leakage", "stain", "stains", "overflow"],
+    "irritation": ["rash", "rashes", "itch", "itchy", "itching", "irritation", "irritated"],
+    "discomfort": ["discomfort", "uncomfortable", "chafing", "bulky"],
+    "odor": ["odor", "odour", "smell", "smells", "smelly"],
+}
+PRODUCT_INTENT_WORDS = {"pad", "pads", "product", "products", "recommend", "suggest", "buy", "best", "which"}
+# Questions about causes, side effects or safety need more than a product template
+CAUSAL_WORDS = {
+    "cause", "causes", "caused", "causing", "why", "side", "effect", "effects",
+    "safe", "unsafe", "harm", "harmful", "risk", "risks", "dangerous",
+}
+# Symptoms a template must never answer; HEALTH_TOPICS' when_to_see_doctor terms are added at compile time
+SYMPTOM_WORDS = {
+    "bleed", "bleeding", "blood", "clot", "clots", "soak", "soaking", "soaked", "hour", "hourly",
+    "infection", "infections", "infected", "fever", "pain", "painful", "discharge", "burning",
+    "swelling", "swollen", "dizzy", "faint", "pregnant", "missed",
+}
+# Questions about how periods and the body work route to the education agent
+EDUCATION_WORDS = {
+    "what", "why", "how", "normal", "explain", "mean", "means", "cycle", "hormone", "hormones",
+    "pcos", "myth", "myths", "true",
+}
+STOPWORDS = {"a", "an", "and", "are", "at", "i", "in", "is", "it", "my", "of", "on", "the", "to", "with"}
+
+FAST_PATH_REQUESTS = metrics.counter(
+    "nua_fast_path_total", "Queries answered from the compiled knowledge tables vs sent to the LLM", labels=("result",)
+)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def _tokens(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _is_placeholder(text: str) -> bool:
+    return not text or text.strip(". ") == ""
+
+
+class KnowledgeFastPath:
+    """
+    Answers well-covered concern, product and myth questions straight from
+    NUAT_KNOWLEDGE_STRUCTURE, compiled once into lookup tables. Returns
+    None whenever it is not confident, and the LLM agents take over.
+    """
+
+    def __init__(self, knowledge: Dict = None):
+        knowledge = knowledge or NUAT_KNOWLEDGE_STRUCTURE
+        self.enabled = FAST_PATH_ENABLED
+        self.products: Dict[str, Dict] = {}
+        self.concern_products: Dict[str, List[str]] = {}
+        self.concern_guides: List[Tuple[set, Dict]] = []
+        self.myths: List[Tuple[set, str, str]] = []
+        self.synonyms: Dict[str, str] = {}
+        self.decline_words = CAUSAL_WORDS | SYMPTOM_WORDS
+        self._compile(knowledge)
+
+    def _compile(self, knowledge: Dict):
+        for key, product in knowledge.get("PRODUCTS", {}).items():
+            self.products[key] = {
+                "name": product.get("name", key.title()),
+                "benefits": [b for b in product.get("benefits", []) if not _is_placeholder(b)],
+            }
+            for concern in product.get("concern_addresses", []):
+                self.concern_products.setdefault(concern, []).append(key)
+
+        for key, guide in knowledge.get("CUSTOMER_CONCERNS", {}).items():
+            trigger = {word for word in key.split("_") if word not in STOPWORDS}
+            self.concern_guides.append((trigger, {
+                "validation": guide.get("emotional_validation", ""),
+                "solutions": [s for s in guide.get("practical_solutions", []) if not _is_placeholder(s)],
+                "products": [p for p in guide.get("product_recommendations", []) if p in self.products],
+                "reassurance": guide.get("reassurance", ""),
+                "concern": key,
+            }))
+
+        for topic in knowledge.get("HEALTH_TOPICS", {}).values():
+            for symptom in topic.get("when_to_see_doctor", []):
+                self.decline_words |= {word for word in symptom.split("_") if word not in STOPWORDS}
+            for entry in topic.get("myths_to_debunk", []):
+                myth, fact = entry.get("myth", ""), entry.get("fact", "")
+                if _is_placeholder(myth) or _is_placeholder(fact):
+                    continue
+                self.myths.append(({t for t in _tokens(myth) if t not in STOPWORDS}, myth, fact))
+
+        for concern, words in CONCERN_SYNONYMS.items():
+            if concern in self.concern_products:
+                for word in words:
+                    self.synonyms[word] = concern
+
+        logger.info(
+            f"Fast path compiled: {len(self.concern_products)} concerns, "
+            f"{len(self.concern_guides)} concern guides, {len(self.myths)} myths"
+        )
+
+    def answer(self, query: str) -> Optional[Tuple[Dict, str]]:
+        """(classification, answer) when the tables cover the query confidently, else None"""
+        if not self.enabled:
+            return None
+        tokens = _tokens(query)
+        words = set(tokens)
+        # Emergencies, symptoms and "does X cause Y" questions always get the full pipeline
+        if is_emergency(query) or words & self.decline_words:
+            FAST_PATH_REQUESTS.inc("declined")
+            return None
+        result = None
+        if 0 < len(tokens) <= MAX_QUERY_TOKENS:
+            result = self._myth(words) or self._concern_guide(words) or self._product_for_concern(words)
+        FAST_PATH_REQUESTS.inc("hit" if result else "miss")
+        return result
+
+    def classify(self, query: str) -> Dict:
+        """
+        Keyword routing for when no LLM may classify (minimal budget mode):
+        product questions go to the product agent, causes, symptoms and how
+        things work to education, the rest to reassurance. Never None, and
+        not gated by NUA_FAST_PATH since nothing is answered from templates.
+        """
+        words = set(_tokens(query))
+        concerns = sorted({self.synonyms[w] for w in words if w in self.synonyms})
+        if words & PRODUCT_INTENT_WORDS:
+            classification = self._classification("product", "curious", concerns)
+        elif words & (self.decline_words | EDUCATION_WORDS) or self._myth(words):
+            classification = self._classification("education", "curious", concerns)
+        else:
+            classification = self._classification("reassurance", "anxious", concerns)
+        classification.update(
+            urgency="high" if is_emergency(query) else "medium",
+            source="keywords"
+        )
+        return classification
+
+    def _myth(self, words: set) -> Optional[Tuple[Dict, str]]:
+        for trigger, myth, fact in self.myths:
+            if trigger and len(trigger & words) / len(trigger) >= MYTH_MATCH_THRESHOLD:
+                answer = f"That's a common myth: \"{myth}\". The truth is: {fact}"
+                return self._classification("education", "curious", []), answer
+        return None
+
+    def _concern_guide(self, words: set) -> Optional[Tuple[Dict, str]]:
+        for trigger, guide in self.concern_guides:
+            if not trigger or not trigger <= words:
+                continue
+            parts = [guide["validation"].rstrip(".") + "."]
+            if guide["solutions"]:
+                parts.append("A few things that help: " + ", ".join(guide["solutions"]) + ".")
+            for key in guide["products"]:
+                parts.append(self._product_line(key))
+            if guide["reassurance"]:
+                parts.append(guide["reassurance"].rstrip(".") + ".")
+            concerns = [c for c in trigger if c in self.concern_products]
+            return self._classification("reassurance", "anxious", concerns), " ".join(parts)
+        return None
+
+    def _product_for_concern(self, words: set) -> Optional[Tuple[Dict, str]]:
+        if not words & PRODUCT_INTENT_WORDS:
+            return None
+        concerns = {self.synonyms[w] for w in words if w in self.synonyms}
+        # More than one concern needs a comparison the templates don't make
+        if len(concerns) != 1:
+            return None
+        concern = concerns.pop()
+        lines = [self._product_line(key) for key in self.concern_products[concern]]
+        answer = f"Worrying about {concern} is really common, and you're not alone. " + " ".join(lines)
+        return self._classification("product", "anxious", [concern]), answer
+
+    def _product_line(self, key: str) -> str:
+        product = self.products[key]
+        if product["benefits"]:
+            return f"{product['name']} can help: {', '.join(product['benefits'])}."
+        return f"{product['name']} can help."
+
+    def _classification(self, primary_agent: str, emotion: str, concerns: List[str]) -> Dict:
+        return {
+            "primary_agent": primary_agent,
+            "intent": "question",
+            "emotion": emotion,
+            "urgency": "low",
+            "funnel_stage": "consideration",
+            "concerns": concerns,
+            "source": "fast_path",
+        }
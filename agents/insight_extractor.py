@@ -8,7 +8,7 @@ class InsightExtractorAgent:
     async def initialize(self):
         pass
 
-    async def extract(self, user_query, response, classification, user_context):
+    async def extract(self, user_query, classification, user_context, response=None):
         """
         Extract and log insights from interaction
         """
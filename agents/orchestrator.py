@@ -1,31 +1,85 @@
 import json
 import logging
+import os
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
 import asyncio
 
-try:
-    from langchain_openai import ChatOpenAI
-except ImportError:
-    from langchain.chat_models import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
+from langchain.schema import HumanMessage
 
 from .product_agent import ProductAgent
 from .education_agent import EducationAgent
 from .reassurance_agent import ReassuranceAgent
 from .tone_guardian import ToneGuardianAgent
-from .safety_agent import SafetyAgent
+from .safety_agent import SafetyAgent, is_emergency
 from .insight_extractor import InsightExtractorAgent
+from .context_packer import warm_up_tokenizer
+from .conversation_summarizer import ConversationSummarizer
+from .fast_path import KnowledgeFastPath
+from database.metadata_index import filter_from_classification
+from database.vetted_answers import VettedAnswerStore
+from utils.admission import (
+    AdmissionRejected, Priority, current_priority, escalate_request_priority, llm_admission, request_admitted,
+    set_request_priority
+)
+from utils.deadline import Deadline
+from utils.llm import LLMClient
+from utils.metrics import track_stage
+from utils.pipeline import Stage, StageGraph
+from utils.usage import (
+    BUDGET_ECONOMY, BUDGET_MODE, BUDGET_NORMAL, USAGE_CONFIG, budget_mode, track_request_usage
+)
 
 logger = logging.getLogger(__name__)
 
+FALLBACK_CLASSIFICATION = {
+    "primary_agent": "reassurance",
+    "intent": "question",
+    "emotion": "curious",
+    "urgency": "medium",
+    "funnel_stage": "consideration",
+    "concerns": []
+}
+
+PRIMARY_AGENTS = ("product", "education", "reassurance")
+
+# Fused mode: one LLM call returns both the classification and the answer
+FUSED_MODE = os.getenv("NUA_FUSED_MODE", "false").lower() in ("1", "true", "yes")
+FUSED_CANDIDATES_PER_AGENT = 2
+
+# Queries per multi-item classification prompt in batch mode
+CLASSIFY_BATCH_SIZE = 10
+
+CLASSIFICATION_FIELDS = """
+        1. PRIMARY_AGENT: Choose one - "product" (product recommendation), "education" (health info), "reassurance" (emotional support)
+        2. INTENT: "question" | "concern" | "comparison" | "complaint"
+        3. EMOTION: "anxious" | "embarrassed" | "curious" | "confident" | "frustrated"
+        4. URGENCY: "low" | "medium" | "high"
+        5. FUNNEL_STAGE: "awareness" | "consideration" | "purchase" | "retention"
+        6. CONCERNS: List specific concerns (e.g., "discomfort", "irritation", "leakage")
+"""
+
+
+def _valid_classification(item) -> Optional[Dict]:
+    """An LLM classification with defaults filled in, or None when it has no usable primary_agent"""
+    if not isinstance(item, dict) or item.get("primary_agent") not in PRIMARY_AGENTS:
+        return None
+    for key, default in FALLBACK_CLASSIFICATION.items():
+        item.setdefault(key, default)
+    if not isinstance(item["concerns"], list):
+        item["concerns"] = [item["concerns"]]
+    return item
+
+
 class NuaOrchestrator:
     """
     Primary orchestrator that routes queries to specialized agents
     """
     
     def __init__(self):
-        self.llm = ChatOpenAI(temperature=0.7, model="gpt-4-turbo")
+        self.llm = LLMClient(temperature=0.7, model="gpt-4-turbo", agent="orchestrator")
+        # Users over their token budget get one fused call on a cheaper model
+        self.economy_llm = LLMClient(temperature=0.7, model=USAGE_CONFIG["economy_model"], agent="orchestrator")
         
         self.agents = {
             "product": ProductAgent(),
@@ -33,101 +87,483 @@ class NuaOrchestrator:
             "reassurance": ReassuranceAgent(),
             "tone_guardian": ToneGuardianAgent(),
             "safety": SafetyAgent(),
-            "insight_extractor": InsightExtractorAgent()
+            "insight_extractor": InsightExtractorAgent(),
+            "summarizer": ConversationSummarizer()
         }
+        self.fast_path = KnowledgeFastPath()
+        self.vetted_answers = VettedAnswerStore()
+        self.pipeline = self._build_pipeline()
     
     async def initialize(self):
         """Initialize all agents"""
         for agent_name, agent in self.agents.items():
             await agent.initialize()
             logger.info(f"✓ Initialized {agent_name} agent")
+        await asyncio.to_thread(warm_up_tokenizer)
     
-    async def process_query(self, user_query: str, user_context: Dict[str, Any]) -> Dict:
+    async def process_query(
+        self,
+        user_query: str,
+        user_context: Dict[str, Any],
+        deadline: Optional[Deadline] = None,
+        classification: Optional[Dict] = None,
+        query_vector: Optional[List[float]] = None,
+        fused: Optional[bool] = None
+    ) -> Dict:
         """
-        Main processing pipeline
+        Main processing pipeline, executed as a stage graph:
+        classify -> primary_agent -> tone -> safety is the critical path,
+        insight_extraction only needs the classification and runs alongside
+        it (local and cheap, so it is awaited: its output is in the result).
+        Each stage runs under its slice of the request deadline and degrades
+        instead of failing when that slice runs out. Batch callers pass a
+        precomputed classification and query embedding to skip those calls.
+        Over-budget users and an over-budget day take cheaper paths (see
+        utils.usage); the request's token usage is returned under "usage".
+        "personalized" says whether the answer was generated with the user's
+        history or conversation summary in the prompt.
         """
-        try:
-            # Step 1: Classify query
-            classification = await self._classify_query(user_query)
-            logger.info(f"Classification: {classification}")
-            
-            # Step 2: Route to primary agent based on classification
-            primary_agent_name = classification["primary_agent"]
-            primary_agent = self.agents[primary_agent_name]
-            
-            primary_response = await primary_agent.handle(user_query, user_context)
-            
-            # Step 3: Validate with tone guardian
-            validated_response = await self.agents["tone_guardian"].validate(
-                primary_response,
-                classification
-            )
-            
-            # Step 4: Safety check
-            safety_check = await self.agents["safety"].validate(
-                validated_response,
-                user_query
-            )
-            
-            if not safety_check["is_safe"]:
-                logger.warning(f"Safety issue detected: {safety_check['reason']}")
-                validated_response = safety_check["fallback_response"]
-            
-            # Step 5: Extract insights
-            insights = await self.agents["insight_extractor"].extract(
-                user_query=user_query,
-                response=validated_response,
-                classification=classification,
-                user_context=user_context
-            )
+        mode = budget_mode(user_context.get("user_id"))
+        BUDGET_MODE.inc(mode)
+        context = {
+            "user_query": user_query,
+            "user_context": user_context,
+            "deadline": deadline or Deadline(),
+            "degraded": [],
+            "classification": classification,
+            "query_vector": query_vector,
+            "fused": FUSED_MODE if fused is None else fused,
+            "stage_timings": {},
+            "budget_mode": mode
+        }
+        with track_request_usage(user_context.get("user_id")) as usage:
+            try:
+                run = await self.pipeline.run(context)
+            except Exception as e:
+                logger.error(f"Orchestration error: {str(e)}", exc_info=True)
+                return {
+                    "response": "I'm having trouble processing your question right now. Please try again in a moment.",
+                    "classification": {"error": str(e)},
+                    "insights": {},
+                    "degraded_stages": ["orchestration"],
+                    "usage": usage.to_dict()
+                }
             
             return {
-                "response": validated_response,
-                "classification": classification,
-                "insights": insights,
+                "response": run.results["safety"],
+                "classification": run.results["classify"]["classification"],
+                "insights": run.results["insight_extraction"],
+                "degraded_stages": context["degraded"],
+                "stage_timings": context["stage_timings"],
+                "budget_mode": mode,
+                "personalized": run.results["classify"]["fused_response"] is None and bool(
+                    user_context.get("previous_interactions") or user_context.get("conversation_summary")
+                ),
+                "usage": usage.to_dict(),
                 "timestamp": datetime.now().isoformat()
             }
+    
+    def _build_pipeline(self) -> StageGraph:
+        return StageGraph([
+            Stage("classify", self._classify_stage),
+            Stage("primary_agent", self._primary_agent_stage, depends_on=["classify"]),
+            Stage("tone", self._tone_stage, depends_on=["classify", "primary_agent"]),
+            Stage("safety", self._safety_stage, depends_on=["tone"]),
+            Stage("insight_extraction", self._insight_stage, depends_on=["classify"]),
+        ])
+    
+    async def _classify_stage(self, ctx: Dict) -> Dict:
+        """Step 1: classification (and the answer too: fused mode, fast path, vetted answers)"""
+        deadline = ctx["deadline"]
+        classification = ctx["classification"]
+        fused_response = None
+        # A batch's fallback classification is kept as is (no third attempt)
+        if classification is not None and classification.get("source") == "fallback":
+            ctx["degraded"].append("classify")
         
+        # Common concern/product/myth questions the knowledge base covers
+        # outright are answered from the compiled tables, with no LLM call
+        if classification is None:
+            fast_result = self.fast_path.answer(ctx["user_query"])
+            if fast_result:
+                classification, fused_response = fast_result
+        
+        # Answers users rated highly are served again as-is; a computed query
+        # embedding is kept for retrieval if the lookup misses. The lookup's
+        # embedding call is charged to the retrieve budget.
+        if classification is None and not is_emergency(ctx["user_query"]):
+            try:
+                vetted_result, query_vector = await asyncio.wait_for(
+                    self.vetted_answers.lookup(ctx["user_query"], self.agents["product"].vector_db.embed_queries),
+                    timeout=deadline.budget("retrieve")
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Vetted answer lookup exceeded the retrieve budget, skipping it")
+                vetted_result, query_vector = None, None
+                ctx["degraded"].append("vetted_lookup")
+            if ctx["query_vector"] is None:
+                ctx["query_vector"] = query_vector
+            if vetted_result:
+                classification, fused_response = vetted_result
+        
+        # Fused mode: classification + answer from a single LLM call,
+        # falling back to the two-call path if the output is unusable.
+        # Economy mode always makes this one call, on the economy model.
+        economy = ctx["budget_mode"] == BUDGET_ECONOMY
+        if classification is None and (ctx["fused"] or economy):
+            fused_result = await self._fused_classify_and_answer(
+                ctx["user_query"], ctx["user_context"], deadline, llm=self.economy_llm if economy else None
+            )
+            if fused_result:
+                classification, fused_response = fused_result
+        
+        # Over budget, nothing else may call the LLM: route on keywords and
+        # answer from the routed agent's retrieved passages
+        if classification is None and ctx["budget_mode"] != BUDGET_NORMAL:
+            classification = self.fast_path.classify(ctx["user_query"])
+        
+        if classification is None:
+            try:
+                classification = await asyncio.wait_for(
+                    self._classify_query(ctx["user_query"]),
+                    timeout=deadline.budget("classify")
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Classification exceeded its budget, using fallback classification")
+                classification = dict(FALLBACK_CLASSIFICATION)
+                ctx["degraded"].append("classify")
+        logger.info(f"Classification: {classification}")
+        # Urgent conversations get ahead of the queue for the remaining LLM calls
+        if classification.get("urgency") == "high":
+            escalate_request_priority(Priority.HIGH)
+        
+        return {"classification": classification, "fused_response": fused_response}
+    
+    async def _primary_agent_stage(self, ctx: Dict, classify: Dict) -> str:
+        """Step 2: route to the primary agent based on classification"""
+        if classify["fused_response"] is not None:
+            return classify["fused_response"]
+        
+        primary_agent_name = classify["classification"].get("primary_agent")
+        if primary_agent_name not in PRIMARY_AGENTS:
+            primary_agent_name = FALLBACK_CLASSIFICATION["primary_agent"]
+        
+        return await self._run_primary_agent(
+            primary_agent_name, ctx["user_query"], ctx["user_context"],
+            ctx["deadline"], ctx["degraded"], ctx["query_vector"],
+            metadata_filter=filter_from_classification(classify["classification"]),
+            generate=ctx["budget_mode"] == BUDGET_NORMAL
+        )
+    
+    async def _tone_stage(self, ctx: Dict, classify: Dict, primary_agent: str) -> str:
+        """Step 3: validate with tone guardian"""
+        try:
+            return await asyncio.wait_for(
+                self.agents["tone_guardian"].validate(primary_agent, classify["classification"]),
+                timeout=ctx["deadline"].budget("validate")
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Tone validation exceeded its budget, keeping unvalidated response")
+            ctx["degraded"].append("validate")
+            return primary_agent
+    
+    async def _safety_stage(self, ctx: Dict, tone: str) -> str:
+        """Step 4: safety check (local and cheap, never skipped)"""
+        safety_check = await self.agents["safety"].validate(tone, ctx["user_query"])
+        
+        if not safety_check["is_safe"]:
+            logger.warning(f"Safety issue detected: {safety_check['reason']}")
+            return safety_check["fallback_response"]
+        return tone
+    
+    async def _insight_stage(self, ctx: Dict, classify: Dict) -> Dict:
+        """Step 5: extract insights (needs only the query and classification)"""
+        return await self.agents["insight_extractor"].extract(
+            user_query=ctx["user_query"],
+            classification=classify["classification"],
+            user_context=ctx["user_context"]
+        )
+    
+    async def _run_primary_agent(
+        self,
+        primary_agent_name: str,
+        user_query: str,
+        user_context: Dict[str, Any],
+        deadline: Deadline,
+        degraded: List[str],
+        query_vector: Optional[List[float]] = None,
+        metadata_filter: Optional[Dict] = None,
+        generate: bool = True
+    ) -> str:
+        """Retrieve + generate with the routed agent, each under its budget (retrieval-only without `generate`)"""
+        primary_agent = self.agents[primary_agent_name]
+        try:
+            with track_stage("retrieve"):
+                documents = await asyncio.wait_for(
+                    primary_agent.retrieve(user_query, user_context, query_vector=query_vector, metadata_filter=metadata_filter),
+                    timeout=deadline.budget("retrieve")
+                )
+        except asyncio.TimeoutError:
+            logger.warning(f"Retrieval for {primary_agent_name} exceeded its budget, answering without context")
+            documents = []
+            degraded.append("retrieve")
         except Exception as e:
-            logger.error(f"Orchestration error: {str(e)}", exc_info=True)
-            return {
-                "response": "I'm having trouble processing your question right now. Please try again in a moment.",
-                "classification": {"error": str(e)},
-                "insights": {}
-            }
+            logger.error(f"Retrieval for {primary_agent_name} failed: {str(e)}, answering without context")
+            documents = []
+            degraded.append("retrieve")
+        
+        if not generate:
+            return primary_agent.fallback_answer(user_query, documents)
+        try:
+            with track_stage("generate"):
+                return await asyncio.wait_for(
+                    primary_agent.generate(user_query, documents, user_context),
+                    timeout=deadline.budget("generate")
+                )
+        except asyncio.TimeoutError:
+            logger.warning(f"Generation for {primary_agent_name} exceeded its budget, using retrieval-only answer")
+            degraded.append("generate")
+        except Exception as e:
+            logger.error(f"Generation for {primary_agent_name} failed: {str(e)}, using retrieval-only answer")
+            degraded.append("generate")
+        return primary_agent.fallback_answer(user_query, documents)
+    
+    async def _fused_classify_and_answer(
+        self,
+        user_query: str,
+        user_context: Dict[str, Any],
+        deadline: Deadline,
+        llm: Optional[LLMClient] = None
+    ) -> Optional[Tuple[Dict, str]]:
+        """
+        Retrieve a few candidates from every agent's namespace, then classify
+        and answer in one LLM call. Returns None when the output is malformed.
+        """
+        try:
+            with track_stage("retrieve"):
+                candidates = await asyncio.wait_for(
+                    asyncio.gather(*(
+                        self.agents[name].retrieve(user_query, user_context) for name in PRIMARY_AGENTS
+                    )),
+                    timeout=deadline.budget("retrieve")
+                )
+        except Exception as e:
+            logger.warning(f"Fused retrieval failed ({type(e).__name__}), using two-call path")
+            return None
+        
+        specialists = "\n".join(
+            f"        - {name}: {self.agents[name].persona}" for name in PRIMARY_AGENTS
+        )
+        packed = {
+            name: self.agents[name].packer.pack(docs)[:FUSED_CANDIDATES_PER_AGENT]
+            for name, docs in zip(PRIMARY_AGENTS, candidates)
+        }
+        context = "\n\n".join(
+            f"        [{name}]\n{self.agents[name].format_context(docs)}"
+            for name, docs in packed.items()
+        )
+        fused_prompt = f"""
+        Analyze this customer query from a women's health platform (Nua), then answer it.
+        
+        Customer Query: "{user_query}"
+        
+        Determine:{CLASSIFICATION_FIELDS}
+        Then answer as the specialist you chose for PRIMARY_AGENT, using only that specialist's context:
+{specialists}
+        
+        CONTEXT BY SPECIALIST:
+{context}
+        
+        Respond as a JSON object only: {{"classification": {{"primary_agent": ..., "intent": ..., "emotion": ..., "urgency": ..., "funnel_stage": ..., "concerns": [...]}}, "answer": "..."}}
+        """
+        
+        try:
+            with track_stage("fused_generate"):
+                response = await asyncio.wait_for(
+                    (llm or self.llm).apredict_messages([HumanMessage(content=fused_prompt)]),
+                    timeout=deadline.budget("generate")
+                )
+        except Exception as e:
+            logger.warning(f"Fused generation failed ({type(e).__name__}), using two-call path")
+            return None
+        
+        return self._parse_fused_output(response.content)
+    
+    def _parse_fused_output(self, content: str) -> Optional[Tuple[Dict, str]]:
+        """Validate the fused JSON; None means fall back to the two-call path"""
+        text = content.strip()
+        if text.startswith("```"):
+            text = text.strip("`")
+            text = text[text.find("{"):]
+        try:
+            parsed = json.loads(text)
+        except ValueError:
+            logger.warning("Fused output was not valid JSON, using two-call path")
+            return None
+        
+        classification = _valid_classification(parsed.get("classification")) if isinstance(parsed, dict) else None
+        answer = parsed.get("answer") if isinstance(parsed, dict) else None
+        if classification is None:
+            logger.warning("Fused output has no usable classification, using two-call path")
+            return None
+        if not isinstance(answer, str) or not answer.strip():
+            logger.warning("Fused output has no answer, using two-call path")
+            return None
+        
+        return classification, answer.strip()
     
     async def _classify_query(self, query: str) -> Dict:
         """
         Classify query using LLM
         """
+        try:
+            return await self._request_classification(query)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Fallback classification
+            return dict(FALLBACK_CLASSIFICATION)
+    
+    async def _request_classification(self, query: str) -> Dict:
+        """One single-query classification call; raises when the answer isn't a usable classification"""
         classification_prompt = f"""
         Analyze this customer query from a women's health platform (Nua).
         
         Customer Query: "{query}"
         
-        Determine:
-        1. PRIMARY_AGENT: Choose one - "product" (product recommendation), "education" (health info), "reassurance" (emotional support)
-        2. INTENT: "question" | "concern" | "comparison" | "complaint"
-        3. EMOTION: "anxious" | "embarrassed" | "curious" | "confident" | "frustrated"
-        4. URGENCY: "low" | "medium" | "high"
-        5. FUNNEL_STAGE: "awareness" | "consideration" | "purchase" | "retention"
-        6. CONCERNS: List specific concerns (e.g., "discomfort", "irritation", "leakage")
-        
+        Determine:{CLASSIFICATION_FIELDS}
         Respond as JSON only.
         """
         
+        response = await self.llm.apredict_messages([HumanMessage(content=classification_prompt)])
+        classification = _valid_classification(json.loads(response.content))
+        if classification is None:
+            raise ValueError("response has no usable primary_agent")
+        return classification
+
+    # ============================================
+    # BATCH MODE
+    # ============================================
+
+    async def process_batch(
+        self,
+        items: List[Tuple[str, Dict[str, Any]]],
+        max_concurrency: int = 8
+    ) -> AsyncIterator[Tuple[int, Dict]]:
+        """
+        Process many (query, user_context) pairs, yielding (index, result)
+        in completion order. Classification is grouped into multi-item
+        prompts, query embeddings come from one batched call, and
+        generation runs with bounded parallelism (never more items than
+        the LLM admission controller has slots). Items whose classification
+        fell back keep it and report "classify" in degraded_stages. Closing
+        the generator (client disconnect) cancels pending items.
+        """
+        queries = [query for query, _ in items]
+        with track_stage("classify_batch"):
+            classifications = await self.classify_batch(queries)
+        with track_stage("embed_batch"):
+            vectors = await self._embed_batch(queries)
+
+        semaphore = asyncio.Semaphore(min(max_concurrency, llm_admission.max_concurrency))
+
+        async def run(index: int) -> Tuple[int, Dict]:
+            query, user_context = items[index]
+            # Own priority tag per item, so one urgent item doesn't escalate the batch
+            set_request_priority(current_priority(), admitted=request_admitted())
+            async with semaphore:
+                result = await self.process_query(
+                    query,
+                    user_context,
+                    classification=classifications[index],
+                    query_vector=vectors[index] if vectors else None
+                )
+            return index, result
+
+        tasks = [asyncio.ensure_future(run(i)) for i in range(len(items))]
         try:
-            response = await self.llm.apredict(classification_prompt)
-            classification = json.loads(response)
-        except:
-            # Fallback classification
-            classification = {
-                "primary_agent": "reassurance",
-                "intent": "question",
-                "emotion": "curious",
-                "urgency": "medium",
-                "funnel_stage": "consideration",
-                "concerns": []
-            }
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def classify_batch(self, queries: List[str]) -> List[Dict]:
+        """
+        Classify queries CLASSIFY_BATCH_SIZE at a time, one LLM call per group.
+        Items the group call doesn't classify are retried one by one (not
+        when the group call was shed for overload); those that still fail get
+        FALLBACK_CLASSIFICATION with "source": "fallback" and an "error".
+        Calls in flight are capped at the admission controller's slots.
+        """
+        groups = [queries[i:i + CLASSIFY_BATCH_SIZE] for i in range(0, len(queries), CLASSIFY_BATCH_SIZE)]
+        semaphore = asyncio.Semaphore(llm_admission.max_concurrency)
+        results = await asyncio.gather(*(self._classify_group(group, semaphore) for group in groups))
+        return [classification for group in results for classification in group]
+
+    async def _classify_group(self, queries: List[str], semaphore: asyncio.Semaphore) -> List[Dict]:
+        numbered = "\n".join(f'        {i + 1}. {json.dumps(q)}' for i, q in enumerate(queries))
+        classification_prompt = f"""
+        Analyze each of these customer queries from a women's health platform (Nua).
         
-        return classification
+        Customer Queries:
+{numbered}
+        
+        For EACH query determine:{CLASSIFICATION_FIELDS}
+        Use lowercase keys: primary_agent, intent, emotion, urgency, funnel_stage, concerns.
+        Respond as a JSON array only, one object per query in the same order, each with an "index" field (1-based).
+        """
+
+        classifications: List[Optional[Dict]] = [None] * len(queries)
+        try:
+            async with semaphore:
+                response = await self.llm.apredict_messages([HumanMessage(content=classification_prompt)])
+            parsed = json.loads(response.content)
+            if not isinstance(parsed, list) or len(parsed) != len(queries):
+                raise ValueError(f"expected a JSON array of {len(queries)} classifications")
+            for position, item in enumerate(parsed):
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    index = int(item.pop("index", position + 1)) - 1
+                except (TypeError, ValueError):
+                    continue
+                if 0 <= index < len(queries) and classifications[index] is None:
+                    classifications[index] = _valid_classification(item)
+        except asyncio.CancelledError:
+            raise
+        except AdmissionRejected as e:
+            # Overloaded: more calls would only add to the queue
+            logger.warning(f"Batch classification shed for {len(queries)} queries: {str(e)}")
+            return [self._fallback_classification(e) for _ in queries]
+        except Exception as e:
+            logger.warning(f"Batch classification failed for {len(queries)} queries, classifying them one by one: {str(e)}")
+
+        missing = [i for i, classification in enumerate(classifications) if classification is None]
+        if missing:
+            retried = await asyncio.gather(*(self._classify_single(queries[i], semaphore) for i in missing))
+            for index, classification in zip(missing, retried):
+                classifications[index] = classification
+        return classifications
+
+    async def _classify_single(self, query: str, semaphore: asyncio.Semaphore) -> Dict:
+        try:
+            async with semaphore:
+                return await self._request_classification(query)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Classification failed, using fallback: {str(e)}")
+            return self._fallback_classification(e)
+
+    @staticmethod
+    def _fallback_classification(error: Exception) -> Dict:
+        return dict(FALLBACK_CLASSIFICATION, source="fallback", error=str(error) or type(error).__name__)
+
+    async def _embed_batch(self, queries: List[str]) -> Optional[List[List[float]]]:
+        """One embedding call for the whole batch (None in mock vector mode)"""
+        try:
+            return await self.agents["product"].vector_db.embed_queries(queries)
+        except Exception as e:
+            logger.error(f"Batch embedding failed: {str(e)}, agents will embed individually")
+            return None
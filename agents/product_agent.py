@@ -1,12 +1,11 @@
 from datetime import datetime
 import json
 import logging
-try:
-    from langchain_openai import ChatOpenAI
-except ImportError:
-    from langchain.chat_models import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
+from typing import List, Optional
+from langchain.schema import SystemMessage, HumanMessage, Document
 from database.pinecone_db import VectorDBWrapper
+from utils.llm import LLMClient
+from .context_packer import ContextPacker
 
 logger = logging.getLogger(__name__)
 
@@ -16,9 +15,17 @@ class ProductAgent:
     Refined with real RAG logic
     """
     
+    # Used when the orchestrator answers in fused classify-and-answer mode
+    persona = (
+        "Nua's Product Specialist. Recommend products based strictly on the product context, "
+        "mention specific features (e.g. \"wider back\", \"rash-free\") and explain why they help "
+        "with the customer's concern. Warm and professional."
+    )
+    
     def __init__(self):
         self.vector_db = VectorDBWrapper()
-        self.llm = ChatOpenAI(temperature=0.5, model="gpt-4-turbo")
+        self.llm = LLMClient(temperature=0.5, model="gpt-4-turbo", agent="product")
+        self.packer = ContextPacker("product")
     
     async def initialize(self):
         await self.vector_db.initialize()
@@ -27,21 +34,28 @@ class ProductAgent:
         """
         Retrieve relevant products and generate recommendation
         """
-        # 1. Search vector DB for product matches
-        # Filter could be extracted from context or query classification
-        relevant_products = await self.vector_db.search(
+        relevant_products = await self.retrieve(query, context)
+        return await self.generate(query, relevant_products, context)
+
+    async def retrieve(self, query: str, context: dict, query_vector: Optional[List[float]] = None, metadata_filter: Optional[dict] = None) -> List[Document]:
+        """Search vector DB for product matches"""
+        return await self.vector_db.search(
             query=query,
             namespace="products",
-            top_k=3
+            top_k=3,
+            metadata_filter=metadata_filter,
+            query_vector=query_vector
         )
+
+    async def generate(self, query: str, relevant_products: List[Document], context: dict) -> str:
+        """Generate a recommendation grounded in the retrieved products"""
+        # 1. Format context for LLM
+        relevant_products = self.packer.pack(relevant_products)
+        products_context = self.format_context(relevant_products)
+        history = self.packer.pack_history(context.get("previous_interactions"), context.get("conversation_summary"))
+        history_section = f"\n        RECENT CONVERSATION:\n{history}\n" if history else ""
         
-        # 2. Format context for LLM
-        products_context = "\n\n".join([
-            f"Product: {p.metadata.get('name', 'Nua Product')}\nDetails: {p.page_content}" 
-            for p in relevant_products
-        ])
-        
-        # 3. Generate response
+        # 2. Generate response
         prompt = f"""
         You are Nua's Product Specialist. Recommend products based STRICTLY on the context below.
         
@@ -49,6 +63,7 @@ class ProductAgent:
         
         AVAILABLE PRODUCTS CONTEXT:
         {products_context}
+        {history_section}
         
         GUIDELINES:
         - Be helpful and specific.
@@ -63,3 +78,19 @@ class ProductAgent:
         ])
         
         return response.content
+
+    def format_context(self, relevant_products: List[Document]) -> str:
+        return "\n\n".join([
+            f"Product: {p.metadata.get('name', 'Nua Product')}\nDetails: {p.page_content}" 
+            for p in relevant_products
+        ])
+
+    def fallback_answer(self, query: str, relevant_products: List[Document]) -> str:
+        """Retrieval-only answer used when generation runs out of time"""
+        if not relevant_products:
+            return "I couldn't put together a full recommendation right now. Please try again in a moment."
+        lines = [
+            f"- {p.metadata.get('name', 'Nua Product')}: {p.page_content}"
+            for p in relevant_products
+        ]
+        return "Here are some Nua products that may help:\n" + "\n".join(lines)
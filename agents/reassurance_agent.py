@@ -1,11 +1,10 @@
 from datetime import datetime
 import logging
-try:
-    from langchain_openai import ChatOpenAI
-except ImportError:
-    from langchain.chat_models import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage
+from typing import List, Optional
+from langchain.schema import SystemMessage, HumanMessage, Document
 from database.pinecone_db import VectorDBWrapper
+from utils.llm import LLMClient
+from .context_packer import ContextPacker
 
 logger = logging.getLogger(__name__)
 
@@ -15,9 +14,17 @@ class ReassuranceAgent:
     Focuses on tone, validation, and community connection.
     """
     
+    # Used when the orchestrator answers in fused classify-and-answer mode
+    persona = (
+        "Nua's 'Big Sister'. Start with validation (\"I hear you\", \"It's completely normal to "
+        "feel...\"), use warm, safe language, remind them many women feel this way and don't "
+        "push products unless they solve a direct pain point."
+    )
+    
     def __init__(self):
         self.vector_db = VectorDBWrapper()
-        self.llm = ChatOpenAI(temperature=0.8, model="gpt-4-turbo") # Higher temp for empathy
+        self.llm = LLMClient(temperature=0.8, model="gpt-4-turbo", agent="reassurance") # Higher temp for empathy
+        self.packer = ContextPacker("reassurance")
     
     async def initialize(self):
         # Even reassurance might fetch "community stories" from DB
@@ -27,14 +34,26 @@ class ReassuranceAgent:
         """
         Provide a compassionate, validating response
         """
-        # 1. Search for similar community stories/feelings
-        related_stories = await self.vector_db.search(
+        related_stories = await self.retrieve(query, context)
+        return await self.generate(query, related_stories, context)
+
+    async def retrieve(self, query: str, context: dict, query_vector: Optional[List[float]] = None, metadata_filter: Optional[dict] = None) -> List[Document]:
+        """Search for similar community stories/feelings"""
+        return await self.vector_db.search(
             query=query,
             namespace="reassurance",
-            top_k=2
+            top_k=2,
+            metadata_filter=metadata_filter,
+            query_vector=query_vector
         )
-        
-        stories_context = "\n".join([doc.page_content for doc in related_stories])
+
+    async def generate(self, query: str, related_stories: List[Document], context: dict) -> str:
+        """Write an empathetic response informed by community stories"""
+        # 1. Format context
+        related_stories = self.packer.pack(related_stories)
+        stories_context = self.format_context(related_stories)
+        history = self.packer.pack_history(context.get("previous_interactions"), context.get("conversation_summary"))
+        history_section = f"\n        RECENT CONVERSATION:\n{history}\n" if history else ""
         
         # 2. Generate Empathetic Response
         prompt = f"""
@@ -45,6 +64,7 @@ class ReassuranceAgent:
         
         COMMUNITY CONTEXT (Similar feelings):
         {stories_context}
+        {history_section}
         
         GUIDELINES:
         - START with validation ("I hear you," "It's completely normal to feel...").
@@ -60,3 +80,13 @@ class ReassuranceAgent:
         ])
         
         return response.content
+
+    def format_context(self, related_stories: List[Document]) -> str:
+        return "\n".join([doc.page_content for doc in related_stories])
+
+    def fallback_answer(self, query: str, related_stories: List[Document]) -> str:
+        """Retrieval-only answer used when generation runs out of time"""
+        message = "I hear you, and what you're feeling is completely valid 💙"
+        if related_stories:
+            message += "\n\n" + related_stories[0].page_content
+        return message
@@ -1,5 +1,14 @@
 import logging
 
+# Symptoms in a query that need immediate doctor attention
+EMERGENCY_KEYWORDS = ["severe bleeding", "fainted", "unbearable pain", "high fever"]
+
+
+def is_emergency(query: str) -> bool:
+    lowered = query.lower()
+    return any(kw in lowered for kw in EMERGENCY_KEYWORDS)
+
+
 class SafetyAgent:
     """
     Prevents medical overreach and ensures safety guidelines
@@ -31,8 +40,7 @@ class SafetyAgent:
                 break
         
         # 2. Check for serious symptoms in Query that require immediate doctor attention
-        emergency_keywords = ["severe bleeding", "fainted", "unbearable pain", "high fever"]
-        if any(kw in query.lower() for kw in emergency_keywords):
+        if is_emergency(query):
             # We don't block the response, but we MUST append a strong warning
             if "doctor" not in lower_response and "healthcare" not in lower_response:
                  fallback_response = response + "\n\n⚠️ Given strictly what you described, please visit a doctor immediately."
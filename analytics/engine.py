@@ -10,8 +10,9 @@ class NuaAnalyticsEngine:
     Real-time business intelligence from conversations
     """
     
-    def __init__(self):
-        self.db = PostgresDB()
+    def __init__(self, db: PostgresDB = None):
+        # Pass the app's PostgresDB so analytics shares its pool
+        self.db = db or PostgresDB()
         
     async def extract_insights(self, user_id, query, response, classification):
         """
@@ -0,0 +1,84 @@
+import asyncio
+import csv
+import io
+import logging
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, List
+
+from database.postgres_db import EXPORT_COLUMNS
+from utils.http_cache import dumps_json
+
+logger = logging.getLogger(__name__)
+
+# Parquet export is optional: pyarrow is a large dependency
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+EXPORT_DIR = os.getenv("NUA_EXPORT_DIR", "exports")
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+
+# JSONB columns are flattened to JSON text for CSV and Parquet
+JSON_COLUMNS = {"classification", "emotional_trigger", "llm_usage"}
+
+
+def _flatten(row: Dict) -> Dict:
+    return {
+        key: dumps_json(value).decode("utf-8") if key in JSON_COLUMNS and value is not None else value
+        for key, value in row.items()
+    }
+
+
+async def ndjson_stream(batches: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    """One JSON object per line, one chunk per batch"""
+    async for batch in batches:
+        yield b"".join(dumps_json(row) + b"\n" for row in batch)
+
+
+async def csv_stream(table: str, batches: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    """Header row, then one chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS[table], extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue().encode("utf-8")
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_flatten(row) for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _parquet_schema(table: str):
+    # Everything not listed is text (UUIDs and JSON included)
+    types = {"id": pa.int64(), "feedback_rating": pa.int32(), "timestamp": pa.timestamp("us")}
+    return pa.schema([(column, types.get(column, pa.string())) for column in EXPORT_COLUMNS[table]])
+
+
+async def write_parquet(table: str, batches: AsyncIterator[List[Dict]], start: datetime, end: datetime) -> Dict:
+    """Write batches as row groups of a local Parquet file; returns its path and row count"""
+    if not HAS_PYARROW:
+        raise RuntimeError("pyarrow is required for Parquet export")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f"{table}_{start:%Y%m%dT%H%M%S}_{end:%Y%m%dT%H%M%S}.parquet")
+    schema = _parquet_schema(table)
+    text_columns = [field.name for field in schema if pa.types.is_string(field.type)]
+    rows = 0
+    writer = pq.ParquetWriter(path + ".partial", schema)
+    try:
+        async for batch in batches:
+            flat = [_flatten(row) for row in batch]
+            for row in flat:
+                for column in text_columns:
+                    if row.get(column) is not None:
+                        row[column] = str(row[column])
+            record_batch = pa.RecordBatch.from_pylist(flat, schema=schema)
+            await asyncio.to_thread(writer.write_batch, record_batch)
+            rows += len(batch)
+    finally:
+        writer.close()
+    os.replace(path + ".partial", path)
+    return {"path": path, "rows": rows}
@@ -0,0 +1,84 @@
+"""
+Filtered vs unfiltered local retrieval as the corpus grows.
+
+Ingests synthetic chunks tagged with the CONTENT_CHUNKING_STRATEGY facets
+and times BM25 and the int8 local vector index with and without a
+concern + funnel_stage filter (the filter agents derive from classification).
+
+    python -m benchmarks.filtered_search --sizes 1000 10000 50000
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+
+import numpy as np
+from langchain.schema import Document
+
+from benchmarks.load_test import percentile
+from database.lexical_index import BM25Index
+from database.metadata_index import METADATA_FIELDS, MetadataIndex
+from database.vector_index import QuantizedVectorIndex
+
+WORDS = ("pads comfort leak night soft rash cycle cramps flow wash skin odor gentle "
+         "work travel sleep heavy light cotton organic period pain relief hygiene").split()
+DIMENSION = 256
+
+
+def synthetic_documents(count: int, rng: random.Random):
+    for i in range(count):
+        metadata = {"id": i}
+        # Most chunks carry one concern and one funnel stage, like tagged site content
+        metadata["concern"] = rng.choice(METADATA_FIELDS["concern"])
+        metadata["funnel_stage"] = rng.choice(METADATA_FIELDS["funnel_stage"])
+        text = " ".join(rng.choice(WORDS) for _ in range(60))
+        yield Document(page_content=text, metadata=metadata)
+
+
+def timed(func, runs: int):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return round(percentile(samples, 0.5) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filtered vs unfiltered local retrieval latency")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    metadata_filter = {"concern": {"$in": ["leakage"]}, "funnel_stage": {"$eq": "purchase"}}
+    query = "soft pads for heavy flow at night"
+    reports = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            rng = random.Random(args.seed)
+            documents = list(synthetic_documents(size, rng))
+            lexical, metadata = BM25Index(), MetadataIndex()
+            metadata.add(lexical.add(documents))
+            vectors = QuantizedVectorIndex(f"filtered-{size}", DIMENSION, mode="int8", directory=directory)
+            vectors.add(np.random.default_rng(args.seed).standard_normal((size, DIMENSION)))
+            query_vector = np.random.default_rng(args.seed + 1).standard_normal(DIMENSION)
+
+            positions = metadata.positions(metadata_filter)
+            reports.append({
+                "documents": size,
+                "matching": len(positions),
+                "filter_ms": timed(lambda: metadata.positions(metadata_filter), args.runs),
+                "bm25_ms": timed(lambda: lexical.search(query, 5), args.runs),
+                "bm25_filtered_ms": timed(lambda: lexical.search(query, 5, set(metadata.positions(metadata_filter))), args.runs),
+                "vector_ms": timed(lambda: vectors.search(query_vector, 5), args.runs),
+                "vector_filtered_ms": timed(lambda: vectors.search(query_vector, 5, candidates=metadata.positions(metadata_filter)), args.runs),
+            })
+            vectors.close()
+
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Offline load test for the chat API.
+
+Boots the app in a subprocess with the stub LLM/embedding backends and the
+mock vector store, drives /api/v1/chat or /ws/chat/{user_id} with a
+closed-loop asyncio load generator, and reports throughput plus
+p50/p95/p99 latency and time-to-first-token.
+
+    python -m benchmarks.load_test --mode http --concurrency 16 --requests 400
+    python -m benchmarks.load_test --mode ws --save-baseline
+    python -m benchmarks.load_test --mode http --compare
+
+--compare exits non-zero when the run regresses against the stored baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aiohttp
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+QUERIES = [
+    "I have severe cramps and I fainted.",
+    "I need pads for heavy flow night usage.",
+    "Is it normal to have brown blood?",
+    "I feel so anxious about leaking at work.",
+    "Which Nua product helps with rashes?",
+    "What is PCOS and how does it affect my cycle?",
+    "Can I wear the pads while sleeping?",
+    "I'm embarrassed to talk about my period with anyone.",
+]
+
+
+def percentile(samples: List[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], ttfts: List[float], errors: int, wall_seconds: float) -> Dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall_seconds, 2) if wall_seconds else 0.0,
+        "latency_p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "latency_p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "ttft_p50_ms": round(percentile(ttfts, 0.50) * 1000, 1),
+        "ttft_p95_ms": round(percentile(ttfts, 0.95) * 1000, 1),
+        "ttft_p99_ms": round(percentile(ttfts, 0.99) * 1000, 1),
+    }
+
+
+# ============================================
+# LOAD GENERATORS
+# ============================================
+
+async def _http_worker(worker_id: int, base_url: str, queue: asyncio.Queue, results: Dict):
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                n = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            payload = {
+                "user_id": f"bench_user_{worker_id}",
+                "message": QUERIES[n % len(QUERIES)],
+                "session_id": f"bench_session_{worker_id}",
+            }
+            started = time.perf_counter()
+            try:
+                async with session.post(f"{base_url}/api/v1/chat", json=payload) as resp:
+                    await resp.content.readany()
+                    first_byte = time.perf_counter()
+                    await resp.read()
+                    if resp.status != 200:
+                        results["errors"] += 1
+                        continue
+            except aiohttp.ClientError:
+                results["errors"] += 1
+                continue
+            results["latencies"].append(time.perf_counter() - started)
+            results["ttfts"].append(first_byte - started)
+
+
+async def _ws_worker(worker_id: int, base_url: str, queue: asyncio.Queue, results: Dict):
+    ws_url = base_url.replace("http", "ws", 1) + f"/ws/chat/bench_user_{worker_id}"
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect(ws_url) as ws:
+            while True:
+                try:
+                    n = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                first_token = None
+                try:
+                    await ws.send_str(QUERIES[n % len(QUERIES)])
+                    async for msg in ws:
+                        if msg.type != aiohttp.WSMsgType.TEXT:
+                            raise aiohttp.ClientError(f"WebSocket closed: {msg.type}")
+                        if first_token is None:
+                            first_token = time.perf_counter()
+                        if msg.data.endswith("[END]"):
+                            break
+                    else:
+                        raise aiohttp.ClientError("WebSocket closed before [END]")
+                except aiohttp.ClientError:
+                    results["errors"] += 1
+                    return
+                results["latencies"].append(time.perf_counter() - started)
+                results["ttfts"].append(first_token - started)
+
+
+async def run_load(base_url: str, mode: str, concurrency: int, total_requests: int) -> Dict:
+    queue: asyncio.Queue = asyncio.Queue()
+    for n in range(total_requests):
+        queue.put_nowait(n)
+    results = {"latencies": [], "ttfts": [], "errors": 0}
+    worker = _ws_worker if mode == "ws" else _http_worker
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i, base_url, queue, results) for i in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    return summarize(results["latencies"], results["ttfts"], results["errors"], wall)
+
+
+# ============================================
+# SERVER + BASELINES
+# ============================================
+
+def start_server(port: int, extra_env: Optional[Dict[str, str]] = None, workers: int = 1) -> subprocess.Popen:
+    """Launch uvicorn with the offline backends and wait until it reports ready"""
+    env = dict(os.environ)
+    env.update({
+        "NUA_LLM_BACKEND": "stub",
+        "NUA_EMBEDDING_BACKEND": "stub",
+        "OPENAI_API_KEY": env.get("OPENAI_API_KEY", "sk-offline-benchmark"),
+    })
+    env.pop("PINECONE_API_KEY", None)
+    env.pop("DATABASE_URL", None)
+    env.update(extra_env or {})
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning",
+         "--workers", str(workers)],
+        cwd=REPO_ROOT,
+        env=env,
+    )
+    ready_url = f"http://127.0.0.1:{port}/api/v1/admin/ready"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Benchmark server exited during startup")
+        try:
+            with urllib.request.urlopen(ready_url, timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Benchmark server did not become ready within 60s")
+
+
+def baseline_path(name: str) -> Path:
+    return BASELINE_DIR / f"{name}.json"
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a list of human-readable regressions (empty when within tolerance)"""
+    regressions = []
+    for key in ("latency_p50_ms", "latency_p95_ms", "latency_p99_ms", "ttft_p95_ms"):
+        if baseline.get(key) and report[key] > baseline[key] * (1 + tolerance):
+            regressions.append(f"{key}: {baseline[key]} -> {report[key]}")
+    if baseline.get("throughput_rps") and report["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput_rps: {baseline['throughput_rps']} -> {report['throughput_rps']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the Nua chat API")
+    parser.add_argument("--mode", choices=["http", "ws"], default="http")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--llm-latency", help="Stub LLM latency spec, e.g. lognormal:0.6:0.35 or fixed:0.05")
+    parser.add_argument("--name", help="Baseline name (default: <mode>-c<concurrency>)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="Fail if worse than the stored baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    name = args.name or f"{args.mode}-c{args.concurrency}"
+    extra_env = {"NUA_STUB_LLM_LATENCY": args.llm_latency} if args.llm_latency else {}
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server = start_server(args.port, extra_env)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        report = asyncio.run(run_load(base_url, args.mode, args.concurrency, args.requests))
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+
+    report.update({"scenario": name, "mode": args.mode, "concurrency": args.concurrency})
+    print(json.dumps(report, indent=2))
+
+    exit_code = 0
+    path = baseline_path(name)
+    if args.compare:
+        if not path.exists():
+            print(f"No baseline at {path}; run with --save-baseline first")
+        else:
+            regressions = compare_to_baseline(report, json.loads(path.read_text()), args.tolerance)
+            for regression in regressions:
+                print(f"REGRESSION {regression}")
+            exit_code = 1 if regressions else 0
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path.write_text(json.dumps(report, indent=2))
+        print(f"Saved baseline to {path}")
+
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
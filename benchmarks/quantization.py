@@ -0,0 +1,87 @@
+"""
+Recall and memory of the quantized local vector index against float32.
+
+Builds a synthetic clustered corpus at the production embedding dimension,
+takes exact float32 brute-force top-k as ground truth and, for each storage
+mode, reports recall@k, resident memory and per-query latency.
+
+    python -m benchmarks.quantization --vectors 20000 --queries 200 --top-k 10
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.load_test import percentile
+from data.data_sources import EMBEDDING_CONFIG
+from database.vector_index import QUANTIZATION_MODES, QuantizedVectorIndex
+
+
+def synthetic_corpus(count: int, dimension: int, clusters: int, seed: int):
+    """Unit vectors around random centroids, roughly how chunk embeddings cluster by topic"""
+    rng = np.random.default_rng(seed)
+    centroids = _unit(rng.standard_normal((clusters, dimension)))
+    assignments = rng.integers(0, clusters, size=count)
+    return _unit(centroids[assignments] + 0.8 * _unit(rng.standard_normal((count, dimension))))
+
+
+def _unit(matrix):
+    matrix = matrix.astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized vs float32 local vector index")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--dimension", type=int, default=EMBEDDING_CONFIG["dimension"])
+    parser.add_argument("--clusters", type=int, default=64)
+    parser.add_argument("--rescore-factor", type=int, help="Override the per-mode shortlist multiple")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.vectors, args.dimension, args.clusters, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.integers(0, args.vectors, size=args.queries)
+    # Paraphrase-like queries: a corpus vector plus noise of half its length
+    queries = _unit(corpus[picks] + 0.5 * _unit(rng.standard_normal((args.queries, args.dimension))))
+
+    truth = np.argsort(-(queries @ corpus.T), axis=1)[:, :args.top_k]
+    float_bytes = corpus.nbytes
+
+    reports = []
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in QUANTIZATION_MODES:
+            index = QuantizedVectorIndex(f"bench-{mode}", args.dimension, mode=mode, directory=directory)
+            index.add(corpus)
+            latencies, hits = [], 0
+            for query, expected in zip(queries, truth):
+                started = time.perf_counter()
+                found = index.search(query, args.top_k, rescore_factor=args.rescore_factor)
+                latencies.append(time.perf_counter() - started)
+                hits += len(set(position for position, _ in found) & set(expected.tolist()))
+
+            memory = index.memory_bytes()
+            # Float mode has no codes; the baseline holds the whole matrix in RAM
+            resident = memory["resident"] if mode != "float" else float_bytes
+            reports.append({
+                "mode": mode,
+                f"recall@{args.top_k}": round(hits / (args.queries * args.top_k), 4),
+                "resident_mb": round(resident / 2 ** 20, 2),
+                "memory_vs_float": round(resident / float_bytes, 3),
+                "latency_p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+                "latency_p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            })
+
+    print(f"{'mode':>8} {'recall':>8} {'MB':>9} {'vs float':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for report in reports:
+        print(f"{report['mode']:>8} {report[f'recall@{args.top_k}']:>8} {report['resident_mb']:>9} "
+              f"{report['memory_vs_float']:>9} {report['latency_p50_ms']:>8} {report['latency_p95_ms']:>8}")
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Offline replay of historical queries through the orchestrator.
+
+Reads interactions from a JSONL file (one object per line with "query" or
+"message", and optionally "classification", "user_id", "interaction_id")
+or straight from the interactions table, runs each query through
+NuaOrchestrator.process_query in-process with bounded concurrency, and
+reports per-stage latency, token usage, cache hit rates and how routing
+differs from the logged classification.
+
+    python -m benchmarks.replay --jsonl interactions.jsonl --concurrency 256 --stub-latency fixed:0.02
+    python -m benchmarks.replay --from-db --start 2026-09-01 --limit 100000 --diffs diffs.ndjson
+    python -m benchmarks.replay --jsonl sample.jsonl --backend openai --concurrency 16
+
+The stub backend is the default. Replays use a private shared-cache file
+unless --shared-cache is given, so they never touch production caches.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional
+
+from benchmarks.load_test import percentile
+
+# Fields compared between the logged and the replayed classification
+ROUTING_FIELDS = ("primary_agent", "intent", "urgency", "funnel_stage")
+
+
+def _configure_environment(args):
+    """Everything here is read at import time, so it runs before the app is imported"""
+    os.environ["NUA_LLM_BACKEND"] = args.backend if args.backend == "stub" else "openai"
+    if args.stub_latency:
+        os.environ["NUA_STUB_LLM_LATENCY"] = args.stub_latency
+    # Offline the provider's rate limit isn't the bottleneck being measured
+    os.environ.setdefault("NUA_LLM_MAX_CONCURRENCY", str(args.llm_concurrency or args.concurrency * 2))
+    os.environ.setdefault("NUA_ADMISSION_QUEUE_SIZE", str(args.concurrency * 4))
+    os.environ.setdefault("NUA_ADMISSION_SHED_DEPTH", str(args.concurrency * 4))
+    if not args.shared_cache:
+        os.environ["NUA_SHARED_CACHE_PATH"] = os.path.join(
+            tempfile.mkdtemp(prefix="nua-replay-"), "shared-cache.sqlite3"
+        )
+
+
+def _parse_classification(value) -> Optional[Dict]:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    return value if isinstance(value, dict) else None
+
+
+async def jsonl_rows(path: str) -> AsyncIterator[Dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+async def db_rows(start: datetime, end: datetime) -> AsyncIterator[Dict]:
+    from database.postgres_db import PostgresDB
+    db = PostgresDB()
+    await db.initialize()
+    if not db.pool:
+        raise SystemExit("DATABASE_URL is not set or the database is unreachable")
+    try:
+        async for batch in db.stream_rows("interactions", start, end):
+            for row in batch:
+                yield row
+    finally:
+        await db.close()
+
+
+class ReplayReport:
+    """Running aggregates; only per-query latencies are kept in full"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.stage_latencies: Dict[str, List[float]] = {}
+        self.sources = Counter()
+        self.degraded = Counter()
+        self.errors = 0
+        self.compared = 0
+        self.field_diffs = Counter()
+        self.agent_transitions = Counter()
+
+    def add(self, row: Dict, result: Dict, latency: float) -> Optional[Dict]:
+        """Fold one replayed query in; returns a diff record when routing changed"""
+        self.latencies.append(latency)
+        for stage, seconds in result.get("stage_timings", {}).items():
+            self.stage_latencies.setdefault(stage, []).append(seconds)
+        self.degraded.update(result.get("degraded_stages", []))
+        replayed = result.get("classification") or {}
+        if "error" in replayed:
+            self.errors += 1
+            return None
+        self.sources[replayed.get("source", "llm")] += 1
+
+        logged = _parse_classification(row.get("classification"))
+        if not logged:
+            return None
+        self.compared += 1
+        changed = [f for f in ROUTING_FIELDS if logged.get(f) != replayed.get(f)]
+        self.field_diffs.update(changed)
+        if "primary_agent" in changed:
+            self.agent_transitions[f"{logged.get('primary_agent')}->{replayed.get('primary_agent')}"] += 1
+        if not changed:
+            return None
+        return {
+            "interaction_id": str(row.get("interaction_id", "")),
+            "query": row.get("query") or row.get("message"),
+            "changed": changed,
+            "logged": {f: logged.get(f) for f in ROUTING_FIELDS},
+            "replayed": {f: replayed.get(f) for f in ROUTING_FIELDS},
+        }
+
+    def summary(self, wall_seconds: float, counters: Dict) -> Dict:
+        def latency(samples):
+            return {
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+            }
+
+        queries = len(self.latencies)
+        return {
+            "queries": queries,
+            "errors": self.errors,
+            "wall_seconds": round(wall_seconds, 2),
+            "throughput_qps": round(queries / wall_seconds, 1) if wall_seconds else 0.0,
+            "latency": latency(self.latencies),
+            "stages": {stage: latency(samples) for stage, samples in sorted(self.stage_latencies.items())},
+            "answered_by": dict(self.sources),
+            "degraded_stages": dict(self.degraded),
+            "tokens": counters["tokens"],
+            "tokens_per_query": {kind: round(n / queries, 1) for kind, n in counters["tokens"].items()} if queries else {},
+            "cache_hit_rate": counters["cache_hit_rate"],
+            "routing": {
+                "compared": self.compared,
+                "changed": {field: n for field, n in self.field_diffs.items()},
+                "change_rate": {f: round(n / self.compared, 4) for f, n in self.field_diffs.items()} if self.compared else {},
+                "primary_agent_transitions": dict(self.agent_transitions.most_common(20)),
+            },
+        }
+
+
+def _counter_snapshot(metric) -> Dict:
+    return dict(metric.values)
+
+
+def _counter_delta(before: Dict, after: Dict) -> Dict:
+    return {key: value - before.get(key, 0) for key, value in after.items() if value - before.get(key, 0)}
+
+
+def _summarize_counters(tokens: Dict, caches: Dict) -> Dict:
+    token_totals = Counter()
+    for (model, kind), n in tokens.items():
+        token_totals[kind] += n
+    lookups: Dict[str, Counter] = {}
+    for (cache, result), n in caches.items():
+        lookups.setdefault(cache, Counter())[result] += n
+    hit_rate = {
+        cache: {"lookups": int(sum(c.values())), "hit_rate": round(c["hit"] / sum(c.values()), 4)}
+        for cache, c in sorted(lookups.items())
+    }
+    return {"tokens": {kind: int(n) for kind, n in token_totals.items()}, "cache_hit_rate": hit_rate}
+
+
+async def replay(args) -> Dict:
+    from agents.orchestrator import NuaOrchestrator
+    from utils.admission import Priority, set_request_priority
+    from utils.metrics import CACHE_REQUESTS, LLM_TOKENS
+
+    orchestrator = NuaOrchestrator()
+    await orchestrator.initialize()
+
+    if args.jsonl:
+        rows = jsonl_rows(args.jsonl)
+    else:
+        end = datetime.fromisoformat(args.end) if args.end else datetime.now()
+        start = datetime.fromisoformat(args.start) if args.start else end - timedelta(days=7)
+        rows = db_rows(start, end)
+
+    report = ReplayReport()
+    diffs = open(args.diffs, "w", encoding="utf-8") if args.diffs else None
+    # Bounded queue: rows are read only as fast as they are replayed
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 4)
+    tokens_before, caches_before = _counter_snapshot(LLM_TOKENS), _counter_snapshot(CACHE_REQUESTS)
+    progress_every = max(1, args.progress)
+
+    async def produce():
+        count = 0
+        async for row in rows:
+            if not (row.get("query") or row.get("message")):
+                continue
+            await queue.put(row)
+            count += 1
+            if args.limit and count >= args.limit:
+                break
+        for _ in range(args.concurrency):
+            await queue.put(None)
+
+    async def work():
+        set_request_priority(Priority.NORMAL)
+        while True:
+            row = await queue.get()
+            if row is None:
+                return
+            user_context = {"user_id": row.get("user_id") or "replay", "previous_interactions": []}
+            started = time.perf_counter()
+            result = await orchestrator.process_query(row.get("query") or row.get("message"), user_context)
+            diff = report.add(row, result, time.perf_counter() - started)
+            if diff and diffs:
+                diffs.write(json.dumps(diff) + "\n")
+            done = len(report.latencies)
+            if done % progress_every == 0:
+                print(f"  {done} queries replayed ({done / (time.perf_counter() - wall_started):.0f}/s)", flush=True)
+
+    wall_started = time.perf_counter()
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(args.concurrency)))
+    finally:
+        if diffs:
+            diffs.close()
+    wall_seconds = time.perf_counter() - wall_started
+
+    counters = _summarize_counters(
+        _counter_delta(tokens_before, _counter_snapshot(LLM_TOKENS)),
+        _counter_delta(caches_before, _counter_snapshot(CACHE_REQUESTS)),
+    )
+    return report.summary(wall_seconds, counters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay logged queries through the orchestrator")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--jsonl", help="JSONL file of interactions")
+    source.add_argument("--from-db", action="store_true", help="Read the interactions table (DATABASE_URL)")
+    parser.add_argument("--start", help="ISO start of the --from-db range (default: 7 days before --end)")
+    parser.add_argument("--end", help="ISO end of the --from-db range (default: now)")
+    parser.add_argument("--limit", type=int, default=0, help="Replay at most this many queries")
+    parser.add_argument("--concurrency", type=int, default=128)
+    parser.add_argument("--backend", choices=("stub", "openai"), default="stub")
+    parser.add_argument("--stub-latency", help="Stub LLM latency spec, e.g. fixed:0.02 (see benchmarks/stubs.py)")
+    parser.add_argument("--llm-concurrency", type=int, help="Admission limit on LLM calls (default: 2x --concurrency)")
+    parser.add_argument("--shared-cache", action="store_true", help="Use the host's shared cache instead of a private one")
+    parser.add_argument("--diffs", help="Write routing differences here as NDJSON")
+    parser.add_argument("--output", help="Write the report here as JSON")
+    parser.add_argument("--progress", type=int, default=10000, help="Print progress every N queries")
+    args = parser.parse_args()
+
+    _configure_environment(args)
+    report = asyncio.run(replay(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
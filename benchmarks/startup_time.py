@@ -0,0 +1,126 @@
+"""
+Startup and import-time report.
+
+1. Runs `python -X importtime -c "import main"` in a fresh interpreter and
+   lists the slowest modules by cumulative import time.
+2. Boots uvicorn (stub backends) and measures time from process launch to
+   the first 200 from the liveness probe (/api/v1/admin/health) and from the
+   readiness probe (/api/v1/admin/ready), plus the warm-up breakdown the
+   app reports.
+
+    python -m benchmarks.startup_time --top 15 --runs 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+
+from benchmarks.load_test import REPO_ROOT
+
+
+def import_profile(top: int) -> Dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=REPO_ROOT, capture_output=True, text=True, env=_offline_env()
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        modules.append((name, int(self_us), int(cumulative_us)))
+    total_us = next((cumulative for name, _, cumulative in modules if name == "main"), 0)
+    slowest = sorted(modules, key=lambda m: -m[2])[:top]
+    return {
+        "import_main_ms": round(total_us / 1000, 1),
+        "slowest": [{"module": name, "cumulative_ms": round(c / 1000, 1), "self_ms": round(s / 1000, 1)} for name, s, c in slowest],
+    }
+
+
+def _offline_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "NUA_LLM_BACKEND": "stub",
+        "NUA_EMBEDDING_BACKEND": "stub",
+        "OPENAI_API_KEY": env.get("OPENAI_API_KEY", "sk-offline-benchmark"),
+    })
+    env.pop("PINECONE_API_KEY", None)
+    env.pop("DATABASE_URL", None)
+    return env
+
+
+def _get(url: str) -> Optional[Dict]:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as resp:
+            return json.loads(resp.read())
+    except (OSError, urllib.error.HTTPError):
+        return None
+
+
+def measure_boot(port: int, timeout: float = 60) -> Dict:
+    launched = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=_offline_env()
+    )
+    base = f"http://127.0.0.1:{port}/api/v1/admin"
+    live_at = ready_at = None
+    ready_body = None
+    try:
+        while time.perf_counter() - launched < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            if live_at is None and _get(f"{base}/health"):
+                live_at = time.perf_counter()
+            ready_body = _get(f"{base}/ready")
+            if ready_body:
+                ready_at = time.perf_counter()
+                break
+            time.sleep(0.02)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    if ready_at is None:
+        raise RuntimeError(f"Server was not ready within {timeout}s")
+    return {
+        "live_ms": round(((live_at or ready_at) - launched) * 1000, 1),
+        "ready_ms": round((ready_at - launched) * 1000, 1),
+        "app_startup": ready_body.get("startup", {}),
+    }
+
+
+def _median(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time and time-to-live/ready")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    imports = import_profile(args.top)
+    print(f"import main: {imports['import_main_ms']} ms")
+    for module in imports["slowest"]:
+        print(f"  {module['cumulative_ms']:>9} ms  {module['module']}")
+
+    boots = [measure_boot(args.port) for _ in range(args.runs)]
+    report = {
+        "imports": imports,
+        "boots": boots,
+        "live_ms_median": _median([b["live_ms"] for b in boots]),
+        "ready_ms_median": _median([b["ready_ms"] for b in boots]),
+    }
+    print(f"live after {report['live_ms_median']} ms, ready after {report['ready_ms_median']} ms (median of {args.runs})")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import zlib
+from typing import List
+
+from langchain.schema import AIMessage, BaseMessage
+
+from data.data_sources import EMBEDDING_CONFIG
+
+# Latency spec: "fixed:<s>", "uniform:<lo>:<hi>" or "lognormal:<median>:<sigma>"
+STUB_LLM_LATENCY = os.getenv("NUA_STUB_LLM_LATENCY", "lognormal:0.6:0.35")
+STUB_EMBEDDING_LATENCY = os.getenv("NUA_STUB_EMBEDDING_LATENCY", "fixed:0.02")
+STUB_SEED = int(os.getenv("NUA_STUB_SEED", "7"))
+
+
+def _stable_hash(text: str) -> int:
+    return zlib.crc32(text.encode("utf-8"))
+
+
+class LatencyDistribution:
+    """
+    Parses a latency spec and samples from it deterministically per key
+    """
+
+    def __init__(self, spec: str):
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, key: str) -> float:
+        rng = random.Random(_stable_hash(key) ^ STUB_SEED)
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(self.params[0], self.params[1])
+        median, sigma = self.params
+        return rng.lognormvariate(math.log(median), sigma)
+
+
+class StubChatModel:
+    """
+    Offline stand-in for ChatOpenAI: same apredict_messages surface,
+    deterministic output and configurable latency
+    """
+
+    AGENT_KEYWORDS = {
+        "product": ["pad", "product", "buy", "recommend", "price", "wipes", "wash", "patch"],
+        "education": ["what", "why", "normal", "pcos", "pcod", "blood", "cycle", "explain"],
+    }
+
+    def __init__(self, latency: str = STUB_LLM_LATENCY):
+        self.latency = LatencyDistribution(latency)
+
+    async def apredict_messages(self, messages: List[BaseMessage]) -> AIMessage:
+        prompt = "\n".join(message.content for message in messages)
+        await asyncio.sleep(self.latency.sample(prompt))
+
+        if "Respond as a JSON array only" in prompt:
+            queries = re.findall(r'^\s*(\d+)\. (".*")$', prompt, flags=re.MULTILINE)
+            content = json.dumps([
+                dict(self._classify(json.loads(query)), index=int(number))
+                for number, query in queries
+            ])
+        elif "Respond as a JSON object only" in prompt:
+            match = re.search(r'Customer Query: "(.*)"', prompt)
+            content = json.dumps({
+                "classification": self._classify(match.group(1) if match else prompt),
+                "answer": self._answer(prompt)
+            })
+        elif "Respond as JSON only" in prompt:
+            match = re.search(r'Customer Query: "(.*)"', prompt)
+            content = json.dumps(self._classify(match.group(1) if match else prompt))
+        else:
+            content = self._answer(prompt)
+
+        return AIMessage(
+            content=content,
+            response_metadata={"token_usage": {
+                "prompt_tokens": len(prompt.split()),
+                "completion_tokens": len(content.split()),
+            }}
+        )
+
+    def _classify(self, query: str) -> dict:
+        lowered = query.lower()
+        primary_agent = "reassurance"
+        for agent, keywords in self.AGENT_KEYWORDS.items():
+            if any(kw in lowered for kw in keywords):
+                primary_agent = agent
+                break
+        return {
+            "primary_agent": primary_agent,
+            "intent": "question",
+            "emotion": "curious",
+            "urgency": "medium",
+            "funnel_stage": "consideration",
+            "concerns": [c for c in ("leakage", "discomfort", "irritation", "odor") if c[:4] in lowered]
+        }
+
+    def _answer(self, prompt: str) -> str:
+        rng = random.Random(_stable_hash(prompt) ^ STUB_SEED)
+        words = ["comfort", "care", "support", "normal", "gentle", "safe", "rash-free", "wider", "back", "soft"]
+        body = " ".join(rng.choice(words) for _ in range(60))
+        return f"Thanks for asking. {body}."
+
+
+class StubEmbeddings:
+    """
+    Deterministic hash-seeded unit vectors with the production dimension
+    """
+
+    def __init__(self, dimension: int = EMBEDDING_CONFIG["dimension"], latency: str = STUB_EMBEDDING_LATENCY):
+        self.dimension = dimension
+        self.latency = LatencyDistribution(latency)
+
+    def _vector(self, text: str) -> List[float]:
+        rng = random.Random(_stable_hash(text) ^ STUB_SEED)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.dimension)]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # One simulated round trip per batch, like the real API
+        await asyncio.sleep(self.latency.sample("|".join(texts)))
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency.sample(text))
+        return self.embed_query(text)
@@ -0,0 +1,59 @@
+"""
+Throughput scaling across uvicorn worker processes.
+
+Runs the same HTTP load against the app started with 1, 2, 4, ... workers
+(stub backends, shared cache tier enabled) and reports throughput, p95
+latency and the speed-up relative to a single worker. Use a short stub LLM
+latency so the run is bound by per-request CPU work rather than waiting.
+
+    python -m benchmarks.worker_scaling --workers 1 2 4 --concurrency 64 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.load_test import run_load, start_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure chat API throughput across worker counts")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--llm-latency", default="fixed:0.01")
+    args = parser.parse_args()
+
+    reports = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for workers in args.workers:
+            # Fresh cache file per run so one run's warm cache doesn't help the next
+            extra_env = {
+                "NUA_STUB_LLM_LATENCY": args.llm_latency,
+                "NUA_SHARED_CACHE_PATH": os.path.join(cache_dir, f"cache-{workers}.sqlite3"),
+            }
+            server = start_server(args.port, extra_env, workers=workers)
+            try:
+                # Let every worker finish its lifespan startup before measuring
+                time.sleep(1.0)
+                report = asyncio.run(run_load(f"http://127.0.0.1:{args.port}", "http", args.concurrency, args.requests))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+            report["workers"] = workers
+            reports.append(report)
+
+    base = reports[0]["throughput_rps"] or 1.0
+    print(f"{'workers':>8} {'rps':>10} {'speedup':>8} {'p95 ms':>10} {'errors':>7}")
+    for report in reports:
+        report["speedup"] = round(report["throughput_rps"] / base, 2)
+        print(f"{report['workers']:>8} {report['throughput_rps']:>10} {report['speedup']:>8} "
+              f"{report['latency_p95_ms']:>10} {report['errors']:>7}")
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import math
+import re
+from bisect import bisect_left
+import zlib
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain.schema import Document
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Reciprocal rank fusion constant (Cormack et al. use 60)
+RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def document_id(doc: Document) -> str:
+    """Stable identity used to fuse result lists from different retrievers"""
+    explicit = doc.metadata.get("id") if doc.metadata else None
+    return str(explicit) if explicit is not None else "%08x" % zlib.crc32(doc.page_content.encode("utf-8"))
+
+
+def with_score(doc: Document, score: float) -> Document:
+    """
+    Copy of an indexed document carrying its retrieval score in
+    metadata["score"] (context packing ranks on it). Indexed documents are
+    shared across requests, so they are never scored in place.
+    """
+    return Document(page_content=doc.page_content, metadata={**(doc.metadata or {}), "score": score})
+
+
+class BM25Index:
+    """
+    Okapi BM25 over one namespace. Postings are two parallel compact arrays
+    per term (doc ids and term frequencies) rather than Python lists of tuples.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: List[Document] = []
+        self.ids: List[str] = []
+        self.doc_lengths = array("I")
+        self.total_length = 0
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, documents: Iterable[Document]) -> List[Document]:
+        """Index documents not seen before; returns those, in position order"""
+        added = []
+        for doc in documents:
+            doc_key = document_id(doc)
+            if doc_key in self._positions:
+                continue
+            added.append(doc)
+            position = len(self.documents)
+            self._positions[doc_key] = position
+            self.documents.append(doc)
+            self.ids.append(doc_key)
+
+            tokens = tokenize(doc.page_content)
+            self.doc_lengths.append(len(tokens))
+            self.total_length += len(tokens)
+            for term, frequency in Counter(tokens).items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array("I"), array("H"))
+                postings[0].append(position)
+                postings[1].append(min(frequency, 65535))
+        return added
+
+    def search(self, query: str, top_k: int, candidates: Optional[set] = None) -> List[Tuple[int, float]]:
+        """(position, score) pairs, best first. `candidates` restricts scoring to those positions."""
+        count = len(self.documents)
+        if not count:
+            return []
+        average_length = self.total_length / count
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            doc_ids, frequencies = postings
+            idf = math.log(1 + (count - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            for position, frequency in self._matches(doc_ids, frequencies, candidates):
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / average_length)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: -item[1])[:top_k]
+
+    @staticmethod
+    def _matches(doc_ids: array, frequencies: array, candidates: Optional[set]):
+        if candidates is None:
+            return zip(doc_ids, frequencies)
+        # Postings are sorted by position: for a small candidate set, binary
+        # search each candidate instead of walking the whole posting list
+        if len(candidates) * max(1, len(doc_ids).bit_length()) < len(doc_ids):
+            found = []
+            for position in candidates:
+                i = bisect_left(doc_ids, position)
+                if i < len(doc_ids) and doc_ids[i] == position:
+                    found.append((position, frequencies[i]))
+            return found
+        return ((p, f) for p, f in zip(doc_ids, frequencies) if p in candidates)
+
+    def search_documents(self, query: str, top_k: int, candidates: Optional[set] = None) -> List[Document]:
+        """Best documents first, each with its BM25 score in metadata["score"]"""
+        return [with_score(self.documents[position], score) for position, score in self.search(query, top_k, candidates)]
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], top_k: int, k: int = RRF_K) -> List[Document]:
+    """
+    Merge ranked lists; a document's score is the sum of 1 / (k + rank) over
+    the lists it appears in, and replaces its per-list score in metadata["score"]
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = document_id(doc)
+            documents.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    ranked = sorted(scores, key=lambda key: -scores[key])
+    return [with_score(documents[key], scores[key]) for key in ranked[:top_k]]
+
+
+# One lexical index per namespace, shared by every VectorDBWrapper in the process
+_indexes: Dict[str, BM25Index] = {}
+
+
+def get_index(namespace: str) -> BM25Index:
+    index = _indexes.get(namespace)
+    if index is None:
+        index = _indexes[namespace] = BM25Index()
+    return index
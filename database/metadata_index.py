@@ -0,0 +1,211 @@
+import logging
+import sys
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from data.data_sources import CONTENT_CHUNKING_STRATEGY
+from database.lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Filterable fields and their vocabularies (confidence_score is a number, not a facet)
+METADATA_FIELDS: Dict[str, List[str]] = {
+    field: values
+    for field, values in CONTENT_CHUNKING_STRATEGY["metadata_extraction"].items()
+    if isinstance(values, list)
+}
+# Fields that may be inferred from chunk text when the metadata doesn't set them;
+# funnel_stage only comes from explicit metadata
+INFERRED_FIELDS = ("product_category", "topic", "concern")
+# Whole words in chunk text that tag a vocabulary value besides the value itself
+# ("leak-proof" -> leakage); prefixes are not matched ("discount" is not discomfort)
+TERM_FORMS = {
+    "pads": ("pad",),
+    "wipes": ("wipe",),
+    "patches": ("patch",),
+    "panties": ("panty", "underwear"),
+    "comfort": ("comfortable", "comfy"),
+    "safety": ("safe",),
+    "hygiene": ("hygienic",),
+    "health": ("healthy",),
+    "sustainability": ("sustainable", "eco"),
+    "discomfort": ("uncomfortable",),
+    "irritation": ("irritated", "irritating", "irritant", "rash", "rashes"),
+    "leakage": ("leak", "leaks", "leaking", "leaky", "leakproof"),
+    "odor": ("odors", "odour", "odours", "smell", "smells"),
+    "confidence": ("confident",),
+}
+_TERM_FORMS = {
+    value: frozenset((value,) + TERM_FORMS.get(value, ()))
+    for vocabulary in METADATA_FIELDS.values() for value in vocabulary
+}
+
+
+def filter_from_classification(classification: Dict) -> Optional[Dict]:
+    """Retrieval filter from the classifier's concerns and funnel stage"""
+    metadata_filter = {}
+    concerns = [c for c in classification.get("concerns") or [] if c in METADATA_FIELDS["concern"]]
+    if concerns:
+        metadata_filter["concern"] = {"$in": concerns}
+    funnel_stage = classification.get("funnel_stage")
+    if funnel_stage in METADATA_FIELDS["funnel_stage"]:
+        metadata_filter["funnel_stage"] = {"$eq": funnel_stage}
+    return metadata_filter or None
+
+
+def _as_list(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return [str(v).lower() for v in value]
+    return [str(value).lower()]
+
+
+def _set_bits(bits: int, count: int) -> List[int]:
+    """Positions of the set bits, ascending: skips empty 64-bit words, then walks only set bits"""
+    positions = []
+    words = array("Q", bits.to_bytes(((count + 63) // 64) * 8, "little"))
+    if sys.byteorder == "big":
+        words.byteswap()
+    for index, word in enumerate(words):
+        base = index * 64
+        while word:
+            low = word & -word
+            positions.append(base + low.bit_length() - 1)
+            word ^= low
+    return positions
+
+
+def _condition_values(condition: Any) -> List[str]:
+    if isinstance(condition, dict):
+        return _as_list(condition.get("$in") or condition.get("$eq"))
+    return _as_list(condition)
+
+
+class MetadataIndex:
+    """
+    Index over the metadata facets of one namespace. Each value keeps a
+    sorted array of document positions (and each field the positions that
+    don't tag it), appended to in O(1) per document. Filters run on bitsets
+    (Python ints, bit i = position i) built from those arrays on first use
+    after an ingest, so a filter is a handful of ANDs/ORs in C and only the
+    matching bits are walked. A document not tagged for a field is not
+    excluded by a filter on that field.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.postings: Dict[str, Dict[str, array]] = {field: {} for field in METADATA_FIELDS}
+        self.untagged: Dict[str, array] = {field: array("I") for field in METADATA_FIELDS}
+        self._bitsets: Dict[Tuple[str, Optional[str]], int] = {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, documents: Iterable[Document]):
+        """Documents must be added in the same order as the lexical/vector indexes"""
+        self._bitsets.clear()
+        for doc in documents:
+            position = self.count
+            self.count += 1
+            facets = self._facets(doc)
+            for field in METADATA_FIELDS:
+                values = facets.get(field)
+                if not values:
+                    self.untagged[field].append(position)
+                    continue
+                for value in values:
+                    postings = self.postings[field].get(value)
+                    if postings is None:
+                        postings = self.postings[field][value] = array("I")
+                    postings.append(position)
+
+    def _facets(self, doc: Document) -> Dict[str, List[str]]:
+        metadata = doc.metadata or {}
+        tokens = None
+        facets = {}
+        for field, vocabulary in METADATA_FIELDS.items():
+            values = [v for v in dict.fromkeys(_as_list(metadata.get(field))) if v in vocabulary]
+            if not values and field in INFERRED_FIELDS:
+                if tokens is None:
+                    tokens = set(tokenize(doc.page_content))
+                values = [v for v in vocabulary if not tokens.isdisjoint(_TERM_FORMS[v])]
+            if values:
+                facets[field] = values
+        return facets
+
+    def _bitset(self, field: str, value: Optional[str]) -> int:
+        """Bitset of a value's positions (value None: the field's untagged positions)"""
+        key = (field, value)
+        bits = self._bitsets.get(key)
+        if bits is None:
+            positions = self.untagged[field] if value is None else self.postings[field].get(value, ())
+            buffer = bytearray((self.count + 7) // 8)
+            for position in positions:
+                buffer[position >> 3] |= 1 << (position & 7)
+            bits = self._bitsets[key] = int.from_bytes(buffer, "little")
+        return bits
+
+    def match(self, metadata_filter: Optional[Dict]) -> Optional[int]:
+        """Bitset of matching positions, or None when the filter doesn't restrict anything"""
+        if not metadata_filter:
+            return None
+        result = (1 << self.count) - 1
+        restricted = False
+        for field, condition in metadata_filter.items():
+            if field not in self.postings:
+                logger.debug(f"Field '{field}' is not indexed; ignoring it locally")
+                continue
+            selected = self._bitset(field, None)
+            for value in dict.fromkeys(_condition_values(condition)):
+                selected |= self._bitset(field, value)
+            result &= selected
+            restricted = True
+        return result if restricted else None
+
+    def positions(self, metadata_filter: Optional[Dict]) -> Optional[List[int]]:
+        """Matching positions in ascending order (None = no restriction)"""
+        bits = self.match(metadata_filter)
+        if bits is None:
+            return None
+        return _set_bits(bits, self.count)
+
+    def split_filter(self, metadata_filter: Optional[Dict]) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        (conditions a remote store can apply as-is, conditions to check per
+        document with accepts()). A remote $eq/$in drops documents missing
+        the field, so only fields every indexed document tags go remote;
+        fields this index doesn't know about always do.
+        """
+        if not metadata_filter:
+            return None, None
+        remote, local = {}, {}
+        for field, condition in metadata_filter.items():
+            if field not in self.untagged or (self.count and not self.untagged[field]):
+                remote[field] = condition
+            else:
+                local[field] = condition
+        return remote or None, local or None
+
+    def accepts(self, doc: Document, metadata_filter: Optional[Dict]) -> bool:
+        """Same semantics as positions() for one document, indexed or not"""
+        if not metadata_filter:
+            return True
+        facets = self._facets(doc)
+        for field, condition in metadata_filter.items():
+            if field in facets and not set(facets[field]) & set(_condition_values(condition)):
+                return False
+        return True
+
+
+# One metadata index per namespace, aligned with lexical_index.get_index(namespace)
+_indexes: Dict[str, MetadataIndex] = {}
+
+
+def get_metadata_index(namespace: str) -> MetadataIndex:
+    index = _indexes.get(namespace)
+    if index is None:
+        index = _indexes[namespace] = MetadataIndex()
+    return index
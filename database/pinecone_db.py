@@ -1,25 +1,89 @@
+import asyncio
 import os
+import hashlib
+import importlib.util
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import json
 from langchain.schema import Document
+from data.data_sources import EMBEDDING_CONFIG
+from database.lexical_index import get_index, reciprocal_rank_fusion, tokenize, with_score
+from database.metadata_index import get_metadata_index
+from database.vector_index import LOCAL_VECTOR_INDEX, get_vector_index
+from utils.llm import EMBEDDING_BACKEND
+from utils.shared_cache import SharedCache
 
-# Optional imports for lightweight mode
-try:
-    from langchain_openai import OpenAIEmbeddings
+# Optional dependencies for the real backend. They are only checked for here
+# and imported on first use, so mock mode never pays for loading them.
+HAS_PINECONE = all(importlib.util.find_spec(name) is not None for name in ("langchain_openai", "pinecone"))
+
+
+def _load_pinecone():
     import pinecone
-    # Try importing old or new pinecone integration
+    # Try importing new or old pinecone integration
     try:
-        from langchain_pinecone import PineconeVectorStore
+        from langchain_pinecone import PineconeVectorStore as Pinecone
     except ImportError:
         from langchain.vectorstores import Pinecone
-        
-    HAS_PINECONE = True
-except ImportError:
-    HAS_PINECONE = False
+    return pinecone, Pinecone
 
 logger = logging.getLogger(__name__)
 
+# Past this, a search is answered from the local lexical index alone
+VECTOR_SEARCH_TIMEOUT = float(os.getenv("NUA_VECTOR_SEARCH_TIMEOUT", "1.5"))
+# Chunks per namespace read back from Pinecone at start-up into the local BM25
+# and metadata indexes. With 0 (or a client that can't list vectors) a
+# namespace's retrieval is vector-only until ingest() adds documents to it.
+LEXICAL_WARM_UP_LIMIT = int(os.getenv("NUA_LEXICAL_WARM_UP_LIMIT", "50000"))
+
+# Demo documents served (through the lexical index) when no vector DB is configured
+MOCK_CORPUS = {
+    "products": [
+        Document(page_content="Nua Sanitary Pads are designed with a wider back for leak-proof nights. They are super soft and rash-free.", metadata={"name": "Nua Sanitary Pads", "price": "Affordable"}),
+        Document(page_content="Nua Cramp Comfort Heat Patches provide up to 8 hours of relief from period pain without any medication.", metadata={"name": "Cramp Comfort Patches", "price": "Premium"}),
+        Document(page_content="Nua Intimate Wash is balanced for vaginal pH and contains no harsh chemicals.", metadata={"name": "Intimate Wash", "price": "Standard"})
+    ],
+    "education": [
+        Document(page_content="Period blood color can vary from bright red to dark brown. Brown blood is usually just older blood oxidizing.", metadata={"topic": "Health"}),
+        Document(page_content="Irregular periods (PCOS) affect 1 in 5 women. Symptoms include weight gain, acne, and missed periods.", metadata={"topic": "PCOS"}),
+        Document(page_content="Menstrual hygiene is crucial. Change pads every 4-6 hours to prevent infection and odor.", metadata={"topic": "Hygiene"})
+    ],
+    "reassurance": [
+        Document(page_content="It is completely normal to feel tired and emotional during your period. Your body is doing hard work.", metadata={"tone": "supportive"}),
+        Document(page_content="You are not alone in feeling anxious about leaks. It happens to almost everyone at some point.", metadata={"tone": "validating"})
+    ]
+}
+
+# Query embeddings are deterministic per model, so every worker can reuse them
+EMBEDDING_CACHE_TTL = int(os.getenv("NUA_EMBEDDING_CACHE_TTL", "86400"))
+# Search results are keyed on the namespace's index version, so the TTL only bounds staleness
+# from changes made outside ingest()
+RETRIEVAL_CACHE_TTL = int(os.getenv("NUA_RETRIEVAL_CACHE_TTL", "3600"))
+
+# Index generation per namespace, shared across workers; ingest() bumps it
+index_versions = SharedCache("index_version", ttl=10 * 365 * 86400)
+# One cache per namespace so hit rates are reported per namespace
+_retrieval_caches: Dict[str, SharedCache] = {}
+
+
+# Start-up loads of the local indexes from Pinecone, one per namespace however
+# many wrappers connect (the indexes themselves are per namespace, see get_index)
+_local_index_loaders: Dict[str, asyncio.Task] = {}
+
+
+def _retrieval_cache(namespace: str) -> SharedCache:
+    cache = _retrieval_caches.get(namespace)
+    if cache is None:
+        cache = _retrieval_caches[namespace] = SharedCache(f"retrieval_{namespace}", ttl=RETRIEVAL_CACHE_TTL)
+    return cache
+
+
+def _retrieval_key(query: str, namespace: str, top_k: int, metadata_filter: Optional[Dict]) -> str:
+    version = index_versions.get(namespace) or 0
+    normalized = " ".join(tokenize(query))
+    raw = json.dumps([normalized, namespace, top_k, metadata_filter, version], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
 class VectorDBWrapper:
     """
     Wrapper for Vector Database (Pinecone) with fallback to in-memory mock for demo/testing
@@ -31,28 +95,40 @@ class VectorDBWrapper:
         self.index_name = "nua-rag-knowledge"
         self.use_mock = not self.api_key or not HAS_PINECONE
         
-        # Only init embeddings if we have the library
-        if HAS_PINECONE and os.getenv("OPENAI_API_KEY"):
-             try:
-                self.embeddings = OpenAIEmbeddings(model="text-embedding-3-small") 
-             except:
-                self.embeddings = None
-        else:
-             self.embeddings = None
-             
+        self._embeddings = None
+        self._embeddings_loaded = False
         self.vectorstore = None
+        self.embedding_cache = SharedCache("embeddings", ttl=EMBEDDING_CACHE_TTL)
+
+    @property
+    def embeddings(self):
+        """Embeddings client, built on first use"""
+        if not self._embeddings_loaded:
+            self._embeddings_loaded = True
+            # Only init embeddings if we have the library
+            if EMBEDDING_BACKEND == "stub":
+                from benchmarks.stubs import StubEmbeddings
+                self._embeddings = StubEmbeddings()
+            elif HAS_PINECONE and os.getenv("OPENAI_API_KEY"):
+                try:
+                    from langchain_openai import OpenAIEmbeddings
+                    self._embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+                except Exception:
+                    self._embeddings = None
+        return self._embeddings
 
     async def initialize(self):
         """Initialize connection to Pinecone or setup mock"""
         if self.use_mock:
             logger.warning("⚠️ No valid Pinecone API Key found or Lib missing. Using MOCK Vector DB mode.")
+            for namespace, documents in MOCK_CORPUS.items():
+                if not len(get_index(namespace)):
+                    await self.ingest(namespace, documents)
             return
 
         try:
-            # Code handles legacy vs new pinecone implicitly via imports above
             # For simplicity in this demo patch, we assume mock if fail
-            if HAS_PINECONE:
-                 pass # Real init would go here
+            pinecone, Pinecone = _load_pinecone()
             if self.index_name not in pinecone.list_indexes():
                 logger.warning(f"Index {self.index_name} does not exist. Please create it.")
                 self.use_mock = True
@@ -62,52 +138,202 @@ class VectorDBWrapper:
                     embedding=self.embeddings
                 )
                 logger.info("✓ Connected to Pinecone Vector DB")
+                # Searches are vector-only until this fills the local indexes
+                self._start_local_index_loaders()
         except Exception as e:
             logger.error(f"Failed to connect to Pinecone: {str(e)}. Falling back to mock.")
             self.use_mock = True
 
-    async def search(self, query: str, namespace: str, top_k: int = 3, metadata_filter: Dict = None) -> List[Document]:
+    def _start_local_index_loaders(self):
+        """Load each namespace's local indexes once per process, whichever wrapper connects first"""
+        if LEXICAL_WARM_UP_LIMIT <= 0:
+            logger.warning("NUA_LEXICAL_WARM_UP_LIMIT is 0: hybrid retrieval is vector-only until ingest()")
+            return
+        for namespace in MOCK_CORPUS:
+            if namespace not in _local_index_loaders:
+                _local_index_loaders[namespace] = asyncio.create_task(self._load_local_indexes(namespace))
+
+    async def _load_local_indexes(self, namespace: str):
+        """Build the namespace's local BM25 and metadata indexes from the chunk text stored in Pinecone"""
+        if len(get_index(namespace)):
+            return
+        try:
+            documents = await asyncio.to_thread(self._fetch_namespace_documents, namespace, LEXICAL_WARM_UP_LIMIT)
+        except Exception as e:
+            logger.warning(f"Reading '{namespace}' back from Pinecone failed: {str(e)}")
+            documents = None
+        if documents is None:
+            logger.warning(f"No local lexical index for '{namespace}': its retrieval is vector-only until ingest()")
+            return
+        # Lexical and metadata indexes share positions: add to both without yielding in between
+        added = get_index(namespace).add(documents)
+        get_metadata_index(namespace).add(added)
+        if len(documents) >= LEXICAL_WARM_UP_LIMIT:
+            logger.warning(f"'{namespace}' has more than {LEXICAL_WARM_UP_LIMIT} chunks; BM25 covers only those loaded")
+        logger.info(f"Loaded {len(added)} '{namespace}' chunks from Pinecone into the local lexical index")
+
+    def _fetch_namespace_documents(self, namespace: str, limit: int) -> Optional[List[Document]]:
+        """Stored chunks of a namespace (blocking); None when the Pinecone client can't list vector ids"""
+        index = getattr(self.vectorstore, "_index", None)
+        text_key = getattr(self.vectorstore, "_text_key", "text")
+        if index is None or not hasattr(index, "list"):
+            return None
+        documents = []
+        for ids in index.list(namespace=namespace):
+            fetched = index.fetch(ids=list(ids), namespace=namespace)
+            for vector in fetched.vectors.values():
+                metadata = dict((vector.get("metadata") if isinstance(vector, dict) else vector.metadata) or {})
+                text = metadata.pop(text_key, None)
+                if text:
+                    documents.append(Document(page_content=text, metadata=metadata))
+            if len(documents) >= limit:
+                break
+        return documents[:limit]
+
+    async def search(self, query: str, namespace: str, top_k: int = 3, metadata_filter: Dict = None, query_vector: List[float] = None) -> List[Document]:
         """
-        Search for documents relevant to query
+        Hybrid search: vector similarity fused with local BM25 by reciprocal rank.
+        With Pinecone, the local BM25 index is loaded from the namespace's
+        stored chunks at start-up (see LEXICAL_WARM_UP_LIMIT); until then, or
+        if that fails, results are vector-only. Pass query_vector to reuse an embedding computed in a batch.
+        If the vector backend errors or takes longer than VECTOR_SEARCH_TIMEOUT,
+        the lexical results are returned on their own. A metadata_filter narrows
+        the local candidates through the bitmap index before scoring; if
+        nothing matches it, the search is repeated unfiltered.
         """
+        results = await self._search(query, namespace, top_k, metadata_filter, query_vector)
+        if not results and metadata_filter:
+            logger.info(f"No '{namespace}' results for filter {metadata_filter}, searching unfiltered")
+            results = await self._search(query, namespace, top_k, None, query_vector)
+        return results
+
+    async def _search(self, query: str, namespace: str, top_k: int, metadata_filter: Optional[Dict], query_vector: Optional[List[float]]) -> List[Document]:
+        positions = get_metadata_index(namespace).positions(metadata_filter)
+        candidates = set(positions) if positions is not None else None
+
         if self.use_mock:
-            return self._mock_search(query, namespace, top_k)
-            
+            logger.info(f"Returning MOCK results for query: '{query}' in namespace: '{namespace}'")
+            lexical_results = self._lexical_search(query, namespace, top_k, candidates)
+            if not self._uses_local_vectors(namespace) or not lexical_results:
+                return lexical_results
+            vector_results = await self._local_vector_search(query, namespace, top_k, query_vector, positions)
+            return reciprocal_rank_fusion([vector_results, lexical_results], top_k)
+
+        cache = _retrieval_cache(namespace)
+        cache_key = _retrieval_key(query, namespace, top_k, metadata_filter)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return [Document(page_content=item["page_content"], metadata=item["metadata"]) for item in cached]
+
         try:
-            # Real search
-            return self.vectorstore.similarity_search(
-                query, 
-                k=top_k, 
-                namespace=namespace,
-                filter=metadata_filter
+            vector_results = await asyncio.wait_for(
+                self._vector_search(query, namespace, top_k, metadata_filter, query_vector),
+                timeout=VECTOR_SEARCH_TIMEOUT
             )
+        except asyncio.TimeoutError:
+            logger.warning(f"Vector search exceeded {VECTOR_SEARCH_TIMEOUT}s, serving lexical results")
+            return self._lexical_search(query, namespace, top_k, candidates)
         except Exception as e:
             logger.error(f"Search failed: {str(e)}")
-            return self._mock_search(query, namespace, top_k)
+            return self._lexical_search(query, namespace, top_k, candidates)
 
-    def _mock_search(self, query: str, namespace: str, top_k: int) -> List[Document]:
-        """Return dummy data for demo purposes based on namespace"""
-        logger.info(f"Returning MOCK results for query: '{query}' in namespace: '{namespace}'")
-        
-        mock_data = {
-            "products": [
-                Document(page_content="Nua Sanitary Pads are designed with a wider back for leak-proof nights. They are super soft and rash-free.", metadata={"name": "Nua Sanitary Pads", "price": "Affordable"}),
-                Document(page_content="Nua Cramp Comfort Heat Patches provide up to 8 hours of relief from period pain without any medication.", metadata={"name": "Cramp Comfort Patches", "price": "Premium"}),
-                Document(page_content="Nua Intimate Wash is balanced for vaginal pH and contains no harsh chemicals.", metadata={"name": "Intimate Wash", "price": "Standard"})
-            ],
-            "education": [
-                Document(page_content="Period blood color can vary from bright red to dark brown. Brown blood is usually just older blood oxidizing.", metadata={"topic": "Health"}),
-                Document(page_content="Irregular periods (PCOS) affect 1 in 5 women. Symptoms include weight gain, acne, and missed periods.", metadata={"topic": "PCOS"}),
-                Document(page_content="Menstrual hygiene is crucial. Change pads every 4-6 hours to prevent infection and odor.", metadata={"topic": "Hygiene"})
-            ],
-            "reassurance": [
-                Document(page_content="It is completely normal to feel tired and emotional during your period. Your body is doing hard work.", metadata={"tone": "supportive"}),
-                Document(page_content="You are not alone in feeling anxious about leaks. It happens to almost everyone at some point.", metadata={"tone": "validating"})
-            ]
-        }
-        
-        # Simple keyword matching for better mock experience
-        candidates = mock_data.get(namespace, [])
-        results = [doc for doc in candidates if any(word in doc.page_content.lower() for word in query.lower().split())]
-        
-        return results[:top_k] if results else candidates[:top_k]
+        if not len(get_index(namespace)):
+            results = vector_results
+        else:
+            lexical_results = get_index(namespace).search_documents(query, top_k * 2, candidates)
+            results = reciprocal_rank_fusion([vector_results, lexical_results], top_k)
+        # Only complete results are cached; lexical-only fallbacks above are not
+        cache.set(cache_key, [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in results])
+        return results
+
+    async def _vector_search(self, query: str, namespace: str, top_k: int, metadata_filter: Dict, query_vector: List[float]) -> List[Document]:
+        """
+        Pinecone only gets the filter conditions it evaluates like the local
+        bitmap index (where untagged chunks match); the rest are checked on
+        the results, so both retrievers agree on what a filter selects.
+        """
+        metadata_index = get_metadata_index(namespace)
+        remote_filter, local_filter = metadata_index.split_filter(metadata_filter)
+        k = top_k * 2 if local_filter else top_k
+        if query_vector is None and self.embeddings:
+            query_vector = (await self.embed_queries([query]))[0]
+        # The vector store client is synchronous; keep it off the event loop
+        if query_vector is not None:
+            scored = await asyncio.to_thread(
+                self.vectorstore.similarity_search_by_vector_with_score,
+                query_vector,
+                k=k,
+                namespace=namespace,
+                filter=remote_filter
+            )
+        else:
+            scored = await asyncio.to_thread(
+                self.vectorstore.similarity_search_with_score,
+                query,
+                k=k,
+                namespace=namespace,
+                filter=remote_filter
+            )
+        results = [with_score(doc, score) for doc, score in scored]
+        if local_filter:
+            results = [doc for doc in results if metadata_index.accepts(doc, local_filter)][:top_k]
+        return results
+
+    def _uses_local_vectors(self, namespace: str) -> bool:
+        return LOCAL_VECTOR_INDEX != "off" and self.embeddings is not None and \
+            len(get_vector_index(namespace, EMBEDDING_CONFIG["dimension"])) > 0
+
+    async def _local_vector_search(self, query: str, namespace: str, top_k: int, query_vector: List[float] = None, positions: Optional[List[int]] = None) -> List[Document]:
+        """Quantized first pass + exact rescoring over the in-process index (optionally only `positions`)"""
+        if query_vector is None:
+            query_vector = (await self.embed_queries([query]))[0]
+        index = get_vector_index(namespace, EMBEDDING_CONFIG["dimension"])
+        return [
+            with_score(index.payloads[position], score)
+            for position, score in index.search(query_vector, top_k, candidates=positions)
+        ]
+
+    async def ingest(self, namespace: str, documents: List[Document]):
+        """
+        Add documents to the namespace: the local BM25 index is built here,
+        and the vector store is updated too when connected. Without a vector
+        store, NUA_LOCAL_VECTOR_INDEX=float|int8|binary embeds them into the
+        local quantized index instead.
+        """
+        # Local indexes share document positions, so they all get the same new documents in order
+        added = get_index(namespace).add(documents)
+        get_metadata_index(namespace).add(added)
+        if not self.use_mock and self.vectorstore is not None:
+            await asyncio.to_thread(self.vectorstore.add_documents, documents, namespace=namespace)
+        elif LOCAL_VECTOR_INDEX != "off" and self.embeddings is not None and added:
+            vectors = await self.embeddings.aembed_documents([doc.page_content for doc in added])
+            get_vector_index(namespace, EMBEDDING_CONFIG["dimension"]).add(vectors, payloads=added)
+        # Cached searches for this namespace are keyed on the old version and stop matching
+        index_versions.incr(namespace)
+        logger.info(f"Ingested {len(documents)} documents into '{namespace}'")
+
+    async def embed_queries(self, queries: List[str]) -> Optional[List[List[float]]]:
+        """Embed many queries in a single call; None when searches won't use vectors"""
+        if not self.embeddings or (self.use_mock and LOCAL_VECTOR_INDEX == "off"):
+            return None
+        vectors = [self.embedding_cache.get(query) for query in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = await self.embeddings.aembed_documents([queries[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+                self.embedding_cache.set(queries[i], vector)
+        return vectors
+
+    def _lexical_search(self, query: str, namespace: str, top_k: int, candidates: Optional[set] = None) -> List[Document]:
+        """BM25 over the locally ingested documents (the mock corpus in mock mode)"""
+        index = get_index(namespace)
+        if not len(index):
+            # Nothing ingested yet: keep answering with the demo documents
+            return MOCK_CORPUS.get(namespace, [])[:top_k]
+        results = index.search_documents(query, top_k, candidates)
+        if results:
+            return results
+        if candidates is None:
+            return index.documents[:top_k]
+        return [index.documents[position] for position in sorted(candidates)[:top_k]]
@@ -1,7 +1,16 @@
 import os
+import asyncio
+import gzip
+import json
 import logging
-from datetime import datetime, timedelta
-from typing import List, Dict, Any
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+
+from utils.metrics import metrics
+from utils.usage import usage_ledger, usage_row
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +22,116 @@ except ImportError:
     HAS_POSTGRES = False
     logger.warning("⚠️ asyncpg not installed. Running in Mock Mode only.")
 
+POOL_CONFIG = {
+    "min_size": int(os.getenv("NUA_DB_POOL_MIN_SIZE", "2")),
+    "max_size": int(os.getenv("NUA_DB_POOL_MAX_SIZE", "10")),
+    # Server-side cap on any one statement (maintenance jobs lift it locally)
+    "statement_timeout_ms": int(os.getenv("NUA_DB_STATEMENT_TIMEOUT_MS", "5000")),
+    "command_timeout": float(os.getenv("NUA_DB_COMMAND_TIMEOUT", "10")),
+    "statement_cache_size": int(os.getenv("NUA_DB_STATEMENT_CACHE_SIZE", "256")),
+    "max_inactive_connection_lifetime": float(os.getenv("NUA_DB_MAX_IDLE_SECONDS", "300")),
+}
+
+POOL_ACQUIRE_WAIT = metrics.histogram(
+    "nua_db_pool_acquire_seconds", "Time spent waiting for a pooled database connection"
+)
+POOL_CONNECTIONS = metrics.gauge(
+    "nua_db_pool_connections", "Pooled database connections by state (active/idle)", labels=("state",)
+)
+QUERY_LATENCY = metrics.histogram(
+    "nua_db_query_duration_seconds", "Database operation latency by query", labels=("query",)
+)
+QUERY_ERRORS = metrics.counter(
+    "nua_db_query_errors_total", "Failed database operations by query", labels=("query",)
+)
+
+# Hot statements: fixed text, so asyncpg's statement cache prepares each one
+# once per connection and every later call reuses it
+LOG_INTERACTION_SQL = """
+INSERT INTO interactions
+(interaction_id, user_id, session_id, query, response, classification, ab_variant, llm_usage, timestamp)
+VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+ON CONFLICT (interaction_id, timestamp) DO NOTHING
+"""
+USER_HISTORY_SQL = """
+SELECT query, response, timestamp
+FROM interactions
+WHERE user_id = $1
+ORDER BY timestamp DESC
+LIMIT $2
+"""
+TOP_CONCERNS_SQL = """
+SELECT
+    query_type,
+    COUNT(*) as frequency,
+    AVG(CAST(emotional_trigger->>'intensity' AS FLOAT)) as emotional_intensity
+FROM insights
+WHERE timestamp > NOW() - make_interval(days => $2::int)
+GROUP BY query_type
+ORDER BY frequency DESC
+LIMIT $1
+"""
+FEEDBACK_UPDATE_SQL = """
+UPDATE interactions AS i
+SET feedback_rating = f.rating
+FROM unnest($1::uuid[], $2::int[], $3::varchar[]) AS f(interaction_id, rating, user_id)
+WHERE i.interaction_id = f.interaction_id AND i.user_id = f.user_id
+RETURNING i.interaction_id
+"""
+# Adds a flush's per-day totals onto what earlier flushes (from any worker) wrote
+LLM_USAGE_UPSERT_SQL = """
+INSERT INTO llm_usage_daily AS u (day, user_id, agent, model, calls, prompt_tokens, completion_tokens, cost_usd)
+SELECT * FROM unnest($1::date[], $2::varchar[], $3::varchar[], $4::varchar[],
+                     $5::bigint[], $6::bigint[], $7::bigint[], $8::float8[])
+ON CONFLICT (day, user_id, agent, model) DO UPDATE SET
+    calls = u.calls + excluded.calls,
+    prompt_tokens = u.prompt_tokens + excluded.prompt_tokens,
+    completion_tokens = u.completion_tokens + excluded.completion_tokens,
+    cost_usd = u.cost_usd + excluded.cost_usd
+"""
+
+# Tables and columns /api/v1/analytics/export may stream
+EXPORT_COLUMNS = {
+    "interactions": ["interaction_id", "user_id", "session_id", "query", "response", "classification",
+                     "ab_variant", "feedback_rating", "llm_usage", "timestamp"],
+    "insights": ["id", "user_id", "query_type", "emotional_trigger", "product_interest", "funnel_signal", "timestamp"],
+}
+EXPORT_BATCH_SIZE = int(os.getenv("NUA_EXPORT_BATCH_SIZE", "5000"))
+
+# Ratings are buffered and written with one UPDATE per flush
+FEEDBACK_BATCH_SIZE = int(os.getenv("NUA_FEEDBACK_BATCH_SIZE", "200"))
+FEEDBACK_FLUSH_INTERVAL = float(os.getenv("NUA_FEEDBACK_FLUSH_INTERVAL", "5"))
+# A rating whose flush keeps failing, or whose interaction row hasn't been
+# written (yet: logging is queued), is dropped after this many attempts
+FEEDBACK_MAX_ATTEMPTS = int(os.getenv("NUA_FEEDBACK_MAX_ATTEMPTS", "5"))
+
+# LLM usage totals accumulate in utils.usage.usage_ledger and are written this often
+USAGE_FLUSH_INTERVAL = float(os.getenv("NUA_USAGE_FLUSH_INTERVAL", "60"))
+USAGE_GROUP_COLUMNS = {"day": None, "user": "user_id", "agent": "agent", "model": "model"}
+
+# interactions is range-partitioned by month. Archiving is opt-in: with a
+# retention (months) and an archive directory both set, older months are
+# copied to gzipped CSV files there and dropped; otherwise everything is kept
+PARTITION_CONFIG = {
+    "months_ahead": int(os.getenv("NUA_PARTITION_MONTHS_AHEAD", "2")),
+    "retention_months": int(os.getenv("NUA_INTERACTIONS_RETENTION_MONTHS", "0")),
+    "archive_dir": os.getenv("NUA_ARCHIVE_DIR", ""),
+    "maintenance_interval": float(os.getenv("NUA_PARTITION_MAINTENANCE_INTERVAL", "86400")),
+}
+# Serializes schema setup and partition maintenance across workers
+PARTITION_MAINTENANCE_LOCK = 7301
+# COPY output is handed to the gzip writer thread in pieces of about this size
+ARCHIVE_WRITE_BYTES = 1 << 20
+
+
+def _add_months(month_start: datetime, months: int) -> datetime:
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month_start: datetime) -> str:
+    return f"interactions_y{month_start.year}m{month_start.month:02d}"
+
 class PostgresDB:
     """
     PostgreSQL database connection and operations
@@ -21,40 +140,110 @@ class PostgresDB:
     def __init__(self):
         self.db_url = os.getenv("DATABASE_URL")
         self.pool = None
+        # interaction_id -> (rating, rater's user_id)
+        self._pending_feedback: Dict[str, Tuple[int, str]] = {}
+        self._feedback_attempts: Dict[str, int] = {}
+        self._feedback_flusher = None
+        self._usage_flusher = None
+        self._partition_maintainer = None
     
     async def initialize(self):
-        """Create connection pool"""
+        """Create the connection pool shared by everything in this process"""
+        if self.pool:
+            return
         if self.db_url and HAS_POSTGRES:
             try:
-                self.pool = await asyncpg.create_pool(self.db_url)
+                self.pool = await asyncpg.create_pool(
+                    self.db_url,
+                    min_size=POOL_CONFIG["min_size"],
+                    max_size=POOL_CONFIG["max_size"],
+                    command_timeout=POOL_CONFIG["command_timeout"],
+                    statement_cache_size=POOL_CONFIG["statement_cache_size"],
+                    max_inactive_connection_lifetime=POOL_CONFIG["max_inactive_connection_lifetime"],
+                    server_settings={"statement_timeout": str(POOL_CONFIG["statement_timeout_ms"])},
+                    init=self._init_connection
+                )
                 await self._create_tables()
+                self._feedback_flusher = asyncio.create_task(self._flush_feedback_periodically())
+                self._usage_flusher = asyncio.create_task(self._flush_usage_periodically())
+                self._partition_maintainer = asyncio.create_task(self._maintain_partitions_periodically())
                 logger.info("✓ Database initialized")
             except Exception as e:
                 logger.error(f"DB Init Failed: {e}. Switching to Mock Mode.")
+                # Half-initialized (no flushers, maybe no schema): run fully in memory instead
+                pool, self.pool = self.pool, None
+                if pool:
+                    try:
+                        await pool.close()
+                    except Exception as close_error:
+                        logger.warning(f"Closing the pool after a failed init failed: {close_error}")
         else:
             logger.warning("DATABASE_URL not set or driver missing, running in memory-only mode")
     
     async def close(self):
         """Close connection pool"""
+        for task in (self._feedback_flusher, self._usage_flusher, self._partition_maintainer):
+            if task:
+                task.cancel()
         if self.pool:
+            await self.flush_feedback()
+            await self.flush_llm_usage()
             await self.pool.close()
     
-    async def _create_tables(self):
-        """Create tables if they don't exist"""
+    async def _init_connection(self, conn):
+        """Per-connection setup: JSON(B) columns take and return Python objects"""
+        for type_name in ("json", "jsonb"):
+            await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+    
+    @asynccontextmanager
+    async def _connection(self):
+        """Acquire from the pool, recording the wait and the active/idle split"""
+        started = time.perf_counter()
         async with self.pool.acquire() as conn:
+            POOL_ACQUIRE_WAIT.observe(value=time.perf_counter() - started)
+            self._record_pool_size()
+            try:
+                yield conn
+            finally:
+                self._record_pool_size(released=1)
+    
+    def _record_pool_size(self, released: int = 0):
+        idle = self.pool.get_idle_size() + released
+        POOL_CONNECTIONS.set("active", value=self.pool.get_size() - idle)
+        POOL_CONNECTIONS.set("idle", value=idle)
+    
+    @asynccontextmanager
+    async def _timed(self, query: str):
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            QUERY_ERRORS.inc(query)
+            raise
+        finally:
+            QUERY_LATENCY.observe(query, value=time.perf_counter() - started)
+    
+    def pool_stats(self) -> Dict:
+        if not self.pool:
+            return {"connected": False}
+        return {
+            "connected": True,
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "min_size": POOL_CONFIG["min_size"],
+            "max_size": POOL_CONFIG["max_size"],
+        }
+    
+    async def _create_tables(self):
+        """
+        Create tables if they don't exist. One transaction under an advisory
+        lock, so workers starting together don't race on the same DDL.
+        """
+        async with self._connection() as conn, conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", PARTITION_MAINTENANCE_LOCK)
+            await self._create_interactions_table(conn)
             await conn.execute("""
-            CREATE TABLE IF NOT EXISTS interactions (
-                id SERIAL PRIMARY KEY,
-                interaction_id UUID UNIQUE,
-                user_id VARCHAR(255),
-                session_id UUID,
-                query TEXT,
-                response TEXT,
-                classification JSONB,
-                ab_variant VARCHAR(50),
-                feedback_rating INT,
-                timestamp TIMESTAMP DEFAULT NOW()
-            );
+            ALTER TABLE interactions ADD COLUMN IF NOT EXISTS llm_usage JSONB;
             
             CREATE TABLE IF NOT EXISTS insights (
                 id SERIAL PRIMARY KEY,
@@ -83,20 +272,196 @@ class PostgresDB:
                 UNIQUE(test_id, user_id)
             );
             
-            CREATE INDEX IF NOT EXISTS idx_interactions_user ON interactions(user_id);
-            CREATE INDEX IF NOT EXISTS idx_interactions_timestamp ON interactions(timestamp);
+            CREATE TABLE IF NOT EXISTS conversation_summaries (
+                user_id VARCHAR(255) PRIMARY KEY,
+                summary TEXT,
+                turns INT,
+                updated_at TIMESTAMP DEFAULT NOW()
+            );
+            
+            CREATE TABLE IF NOT EXISTS llm_usage_daily (
+                day DATE,
+                user_id VARCHAR(255),
+                agent VARCHAR(50),
+                model VARCHAR(100),
+                calls BIGINT,
+                prompt_tokens BIGINT,
+                completion_tokens BIGINT,
+                cost_usd DOUBLE PRECISION,
+                PRIMARY KEY (day, user_id, agent, model)
+            );
+            
             CREATE INDEX IF NOT EXISTS idx_insights_user ON insights(user_id);
+            CREATE INDEX IF NOT EXISTS idx_insights_timestamp_brin ON insights USING BRIN (timestamp);
+            """)
+            await self._ensure_partitions(conn)
+    
+    async def _create_interactions_table(self, conn):
+        """
+        Monthly range partitions on timestamp. Rows arrive in time order, so a
+        BRIN index covers range scans at a fraction of a B-tree's size; user
+        history reads use the (user_id, timestamp DESC) index. Unique keys on
+        a partitioned table must include the partition key.
+        """
+        relkind = await conn.fetchval("SELECT relkind FROM pg_class WHERE relname = 'interactions' AND relkind IN ('r', 'p')")
+        if relkind == "p":
+            return
+        async with conn.transaction():
+            # Copying a large legacy table can outlast the per-statement cap
+            await conn.execute("SET LOCAL statement_timeout = 0")
+            if relkind == "r":
+                logger.info("Migrating interactions to a partitioned table (old heap kept as interactions_legacy)")
+                await conn.execute("""
+                ALTER TABLE interactions RENAME TO interactions_legacy;
+                ALTER SEQUENCE IF EXISTS interactions_id_seq RENAME TO interactions_legacy_id_seq;
+                ALTER INDEX IF EXISTS interactions_pkey RENAME TO interactions_legacy_pkey;
+                ALTER INDEX IF EXISTS interactions_interaction_id_key RENAME TO interactions_legacy_interaction_id_key;
+                """)
+            await conn.execute("""
+            CREATE TABLE interactions (
+                id SERIAL,
+                interaction_id UUID,
+                user_id VARCHAR(255),
+                session_id UUID,
+                query TEXT,
+                response TEXT,
+                classification JSONB,
+                ab_variant VARCHAR(50),
+                feedback_rating INT,
+                llm_usage JSONB,
+                timestamp TIMESTAMP NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (interaction_id, timestamp)
+            ) PARTITION BY RANGE (timestamp);
+            
+            CREATE TABLE interactions_default PARTITION OF interactions DEFAULT;
+            CREATE INDEX idx_interactions_user_time ON interactions (user_id, timestamp DESC);
+            CREATE INDEX idx_interactions_timestamp_brin ON interactions USING BRIN (timestamp);
             """)
+            if relkind == "r":
+                bounds = await conn.fetchrow("SELECT MIN(timestamp) AS first, MAX(timestamp) AS last FROM interactions_legacy")
+                if bounds["first"]:
+                    await self._create_partitions(conn, bounds["first"], bounds["last"])
+                await conn.execute("""
+                INSERT INTO interactions
+                (interaction_id, user_id, session_id, query, response, classification, ab_variant, feedback_rating, timestamp)
+                SELECT interaction_id, user_id, session_id, query, response, classification, ab_variant, feedback_rating,
+                       COALESCE(timestamp, NOW())
+                FROM interactions_legacy
+                """)
+    
+    async def _create_partitions(self, conn, first: datetime, last: datetime):
+        """One partition per month; a month that fails is logged and the rest still get created"""
+        month = datetime(first.year, first.month, 1)
+        while month <= last:
+            upper = _add_months(month, 1)
+            name = _partition_name(month)
+            try:
+                # A savepoint inside an outer transaction, so one failure doesn't abort it
+                async with conn.transaction():
+                    await conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {name} PARTITION OF interactions
+                    FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')
+                    """)
+            except Exception as e:
+                # e.g. rows for that month already landed in the default partition
+                logger.error(f"Creating partition {name} failed: {e}")
+            month = upper
+    
+    async def ensure_partitions(self):
+        """Create this month's partition and the next few"""
+        if not self.pool: return
+        async with self._connection() as conn:
+            await self._ensure_partitions(conn)
+    
+    async def _ensure_partitions(self, conn):
+        now = datetime.now()
+        await self._create_partitions(conn, now, _add_months(datetime(now.year, now.month, 1), PARTITION_CONFIG["months_ahead"]))
+    
+    async def archive_partitions(self, retention_months: int = None) -> List[str]:
+        """
+        Copy monthly partitions older than the retention window to gzipped CSV
+        files, then detach and drop them. Returns the archive paths written.
+        """
+        if not self.pool: return []
+        retention_months = PARTITION_CONFIG["retention_months"] if retention_months is None else retention_months
+        if retention_months <= 0: return []
+        archive_dir = PARTITION_CONFIG["archive_dir"]
+        if not archive_dir:
+            logger.error("Interactions retention is set but NUA_ARCHIVE_DIR is not; keeping every partition")
+            return []
+        now = datetime.now()
+        cutoff = _add_months(datetime(now.year, now.month, 1), -retention_months)
+        os.makedirs(archive_dir, exist_ok=True)
+        
+        archived = []
+        async with self._connection() as conn:
+            partitions = await conn.fetch("""
+            SELECT child.relname AS name
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = 'interactions' AND child.relname LIKE 'interactions_y%'
+            ORDER BY child.relname
+            """)
+            for row in partitions:
+                name = row["name"]
+                month = datetime(int(name[len("interactions_y"):][:4]), int(name[-2:]), 1)
+                if _add_months(month, 1) > cutoff:
+                    continue
+                path = os.path.join(archive_dir, f"{name}.csv.gz")
+                await self._export_partition(conn, name, path)
+                async with conn.transaction():
+                    await conn.execute(f"ALTER TABLE interactions DETACH PARTITION {name}")
+                    await conn.execute(f"DROP TABLE {name}")
+                logger.info(f"Archived {name} to {path}")
+                archived.append(path)
+        return archived
+    
+    async def _export_partition(self, conn, name: str, path: str):
+        """
+        COPY a partition out through gzip; written to a temp name and renamed
+        when complete. Compression and file I/O run in a worker thread.
+        """
+        partial = path + ".partial"
+        f = await asyncio.to_thread(gzip.open, partial, "wb")
+        buffer = bytearray()
+        try:
+            async def write(chunk):
+                buffer.extend(chunk)
+                if len(buffer) >= ARCHIVE_WRITE_BYTES:
+                    data = bytes(buffer)
+                    buffer.clear()
+                    await asyncio.to_thread(f.write, data)
+            async with conn.transaction():
+                await conn.execute("SET LOCAL statement_timeout = 0")
+                await conn.copy_from_table(name, output=write, format="csv", header=True)
+            if buffer:
+                await asyncio.to_thread(f.write, bytes(buffer))
+        finally:
+            await asyncio.to_thread(f.close)
+        os.replace(partial, path)
+    
+    async def _maintain_partitions_periodically(self):
+        while True:
+            try:
+                # Advisory locks are per session: hold this connection until unlocking
+                async with self._connection() as conn:
+                    if await conn.fetchval("SELECT pg_try_advisory_lock($1)", PARTITION_MAINTENANCE_LOCK):
+                        try:
+                            await self.ensure_partitions()
+                            await self.archive_partitions()
+                        finally:
+                            await conn.execute("SELECT pg_advisory_unlock($1)", PARTITION_MAINTENANCE_LOCK)
+            except Exception as e:
+                logger.error(f"Partition maintenance failed: {e}")
+            await asyncio.sleep(PARTITION_CONFIG["maintenance_interval"])
     
     async def log_interaction(self, data: Dict):
-        """Log chat interaction"""
+        """Log chat interaction; a retried write of the same interaction is a no-op"""
         if not self.pool: return
-        async with self.pool.acquire() as conn:
-            await conn.execute("""
-            INSERT INTO interactions 
-            (interaction_id, user_id, session_id, query, response, classification, ab_variant, timestamp)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-            """, 
+        async with self._connection() as conn, self._timed("log_interaction"):
+            await conn.execute(
+            LOG_INTERACTION_SQL,
             data.get("interaction_id"),
             data.get("user_id"),
             data.get("session_id"),
@@ -104,40 +469,75 @@ class PostgresDB:
             data.get("response"),
             data.get("classification"),
             data.get("ab_variant"),
+            data.get("llm_usage"),
             data.get("timestamp", datetime.now())
             )
     
     async def get_user_history(self, user_id: str, limit: int = 5) -> List[Dict]:
         """Get recent interactions for user"""
         if not self.pool: return []
-        async with self.pool.acquire() as conn:
-            rows = await conn.fetch("""
-            SELECT query, response, timestamp
-            FROM interactions
-            WHERE user_id = $1
-            ORDER BY timestamp DESC
-            LIMIT $2
-            """, user_id, limit)
+        async with self._connection() as conn, self._timed("get_user_history"):
+            rows = await conn.fetch(USER_HISTORY_SQL, user_id, limit)
             
             return [dict(row) for row in rows]
     
+    async def stream_rows(
+        self,
+        table: str,
+        start: datetime,
+        end: datetime,
+        batch_size: int = EXPORT_BATCH_SIZE
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Rows of an export table in [start, end), oldest first, read through a
+        server-side cursor one batch at a time so memory stays flat
+        """
+        if table not in EXPORT_COLUMNS:
+            raise ValueError(f"Unknown export table: {table}")
+        if not self.pool: return
+        columns = ", ".join(EXPORT_COLUMNS[table])
+        async with self._connection() as conn:
+            # Cursors live inside a transaction; a long export may outlast the statement cap
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                await conn.execute("SET LOCAL statement_timeout = 0")
+                cursor = await conn.cursor(f"""
+                SELECT {columns} FROM {table}
+                WHERE timestamp >= $1 AND timestamp < $2
+                ORDER BY timestamp
+                """, start, end)
+                while True:
+                    async with self._timed(f"export_{table}"):
+                        rows = await cursor.fetch(batch_size)
+                    if not rows:
+                        break
+                    yield [dict(row) for row in rows]
+    
+    async def get_conversation_summary(self, user_id: str) -> Optional[Dict]:
+        """Rolling summary of the user's conversation, if one has been written"""
+        if not self.pool: return None
+        async with self._connection() as conn, self._timed("get_conversation_summary"):
+            row = await conn.fetchrow(
+                "SELECT summary, turns, updated_at FROM conversation_summaries WHERE user_id = $1", user_id
+            )
+        return dict(row) if row else None
+    
+    async def save_conversation_summary(self, user_id: str, summary: str, turns: int):
+        if not self.pool: return
+        async with self._connection() as conn, self._timed("save_conversation_summary"):
+            await conn.execute("""
+            INSERT INTO conversation_summaries (user_id, summary, turns, updated_at)
+            VALUES ($1, $2, $3, NOW())
+            ON CONFLICT (user_id) DO UPDATE
+            SET summary = excluded.summary, turns = excluded.turns, updated_at = excluded.updated_at
+            """, user_id, summary, turns)
+    
     async def get_top_concerns(self, period: str = "weekly", limit: int = 10) -> List[Dict]:
         """Get top customer concerns"""
         if not self.pool: return []
         days = 7 if period == "weekly" else 30
         
-        async with self.pool.acquire() as conn:
-            rows = await conn.fetch(f"""
-            SELECT 
-                query_type,
-                COUNT(*) as frequency,
-                AVG(CAST(emotional_trigger->>'intensity' AS FLOAT)) as emotional_intensity
-            FROM insights
-            WHERE timestamp > NOW() - INTERVAL '{days} days'
-            GROUP BY query_type
-            ORDER BY frequency DESC
-            LIMIT $1
-            """, limit)
+        async with self._connection() as conn, self._timed("get_top_concerns"):
+            rows = await conn.fetch(TOP_CONCERNS_SQL, limit, days)
             
             return [dict(row) for row in rows]
             
@@ -151,4 +551,99 @@ class PostgresDB:
         return {"interactions": 100, "insights": 50}
 
     async def log_feedback(self, feedback: Dict):
-        pass # Placeholder
+        """Buffer a rating; written with the next flush (immediately once the batch is full)"""
+        if not self.pool: return
+        try:
+            interaction_id = str(uuid.UUID(str(feedback["interaction_id"])))
+            rating = int(feedback["rating"])
+            user_id = str(feedback["user_id"])
+        except (KeyError, TypeError, ValueError):
+            logger.warning(f"Dropping malformed feedback: {feedback!r}")
+            return
+        if not 1 <= rating <= 5:
+            logger.warning(f"Dropping out-of-range rating {rating} for {interaction_id}")
+            return
+        # The latest rating for an interaction wins; only the owner's is applied
+        self._pending_feedback[interaction_id] = (rating, user_id)
+        if len(self._pending_feedback) >= FEEDBACK_BATCH_SIZE:
+            await self.flush_feedback()
+    
+    async def flush_feedback(self) -> int:
+        """Write buffered ratings in a single UPDATE ... FROM unnest; returns rows updated (owners' ratings only)"""
+        if not self.pool or not self._pending_feedback: return 0
+        pending, self._pending_feedback = self._pending_feedback, {}
+        try:
+            async with self._connection() as conn, self._timed("flush_feedback"):
+                ratings, raters = zip(*pending.values())
+                rows = await conn.fetch(FEEDBACK_UPDATE_SQL, list(pending.keys()), list(ratings), list(raters))
+        except Exception as e:
+            logger.error(f"Feedback flush failed: {e}")
+            self._retry_feedback(pending)
+            return 0
+        applied = {str(row["interaction_id"]) for row in rows}
+        for interaction_id in applied:
+            self._feedback_attempts.pop(interaction_id, None)
+        # Not matched: the interaction isn't logged yet, or the rater isn't its owner
+        self._retry_feedback({k: v for k, v in pending.items() if k not in applied})
+        return len(applied)
+    
+    def _retry_feedback(self, pending: Dict[str, Tuple[int, str]]):
+        """Keep ratings for the next flush (unless newer ones arrived), up to FEEDBACK_MAX_ATTEMPTS"""
+        dropped = 0
+        for interaction_id, entry in pending.items():
+            attempts = self._feedback_attempts.get(interaction_id, 0) + 1
+            if attempts >= FEEDBACK_MAX_ATTEMPTS:
+                self._feedback_attempts.pop(interaction_id, None)
+                dropped += 1
+                continue
+            self._feedback_attempts[interaction_id] = attempts
+            self._pending_feedback.setdefault(interaction_id, entry)
+        if dropped:
+            logger.warning(f"Dropped {dropped} ratings after {FEEDBACK_MAX_ATTEMPTS} flush attempts")
+    
+    async def _flush_feedback_periodically(self):
+        while True:
+            await asyncio.sleep(FEEDBACK_FLUSH_INTERVAL)
+            await self.flush_feedback()
+    
+    async def flush_llm_usage(self) -> int:
+        """Write this worker's unflushed LLM usage totals in one upsert; returns rows written"""
+        if not self.pool: return 0
+        rows = usage_ledger.drain()
+        if not rows: return 0
+        columns = list(zip(*rows))
+        try:
+            async with self._connection() as conn, self._timed("flush_llm_usage"):
+                await conn.execute(LLM_USAGE_UPSERT_SQL, [date.fromisoformat(day) for day in columns[0]], *columns[1:])
+        except Exception as e:
+            logger.error(f"LLM usage flush failed: {e}")
+            usage_ledger.restore(rows)
+            return 0
+        return len(rows)
+    
+    async def _flush_usage_periodically(self):
+        while True:
+            await asyncio.sleep(USAGE_FLUSH_INTERVAL)
+            await self.flush_llm_usage()
+    
+    async def get_llm_usage(self, since: date, group_by: str = "agent", user_id: Optional[str] = None) -> List[Dict]:
+        """Flushed LLM usage per day and `group_by` (day/user/agent/model), newest day first"""
+        if group_by not in USAGE_GROUP_COLUMNS:
+            raise ValueError(f"Unknown usage grouping: {group_by}")
+        if not self.pool: return []
+        column = USAGE_GROUP_COLUMNS[group_by]
+        select = f"day, {column}" if column else "day"
+        async with self._connection() as conn, self._timed("get_llm_usage"):
+            rows = await conn.fetch(f"""
+            SELECT {select}, SUM(calls) AS calls, SUM(prompt_tokens) AS prompt_tokens,
+                   SUM(completion_tokens) AS completion_tokens, SUM(cost_usd) AS cost_usd
+            FROM llm_usage_daily
+            WHERE day >= $1 AND ($2::varchar IS NULL OR user_id = $2)
+            GROUP BY {select}
+            ORDER BY day DESC, cost_usd DESC
+            """, since, user_id)
+        return [
+            usage_row(row["day"], group_by, row[column] if column else None, row["calls"], row["prompt_tokens"],
+                      row["completion_tokens"], row["cost_usd"])
+            for row in rows
+        ]
@@ -0,0 +1,169 @@
+import atexit
+import logging
+import os
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# numpy ships with langchain; the local index is unavailable without it
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+# "off" (remote vector store only), "float", "int8" or "binary"
+LOCAL_VECTOR_INDEX = os.getenv("NUA_LOCAL_VECTOR_INDEX", "off").lower()
+VECTOR_INDEX_DIR = os.getenv("NUA_VECTOR_INDEX_DIR", os.path.join(tempfile.gettempdir(), "nua-vector-index"))
+# Shortlist size for exact rescoring, as a multiple of top_k. Sign bits are a
+# much coarser first pass than int8, so binary mode needs a longer shortlist.
+RESCORE_FACTORS = {
+    "int8": int(os.getenv("NUA_VECTOR_RESCORE_FACTOR_INT8", "4")),
+    "binary": int(os.getenv("NUA_VECTOR_RESCORE_FACTOR_BINARY", "10")),
+}
+
+QUANTIZATION_MODES = ("float", "int8", "binary")
+# Rows widened to float32 at a time during the int8 first pass
+_BLOCK_ROWS = 4096
+
+# Set bits per byte value, for Hamming distance over packed sign bits
+_POPCOUNT = None
+
+
+def _popcount_table():
+    global _POPCOUNT
+    if _POPCOUNT is None:
+        _POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+    return _POPCOUNT
+
+
+class QuantizedVectorIndex:
+    """
+    Local cosine-similarity index. Quantized codes stay in RAM for the
+    first pass (int8 dot product or Hamming distance over sign bits); the
+    float32 vectors live in a file that is memory-mapped and only touched
+    to rescore the shortlist exactly. Mode "float" scores the mmap directly.
+    """
+
+    def __init__(self, name: str, dimension: int, mode: str = "int8", directory: str = VECTOR_INDEX_DIR):
+        if not HAS_NUMPY:
+            raise RuntimeError("numpy is required for the local vector index")
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode: {mode}")
+        self.name = name
+        self.dimension = dimension
+        self.mode = mode
+        # Per-process file: every worker builds and maps its own
+        self.path = os.path.join(directory, f"{name}-{os.getpid()}.f32")
+        os.makedirs(directory, exist_ok=True)
+        self.count = 0
+        self.codes = None
+        self.scale = None
+        self.vectors = None
+        self.payloads: List[Any] = []
+        open(self.path, "wb").close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, vectors: Sequence[Sequence[float]], payloads: Optional[Sequence[Any]] = None) -> List[int]:
+        """Append vectors (and the objects they stand for); returns their positions"""
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+        with open(self.path, "ab") as f:
+            f.write(matrix.tobytes())
+
+        start = self.count
+        self.count += len(matrix)
+        self.payloads.extend(payloads if payloads is not None else [None] * len(matrix))
+        self.vectors = np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.count, self.dimension))
+        if self.mode == "int8":
+            self._add_int8(matrix)
+        elif self.mode == "binary":
+            codes = np.packbits(matrix > 0, axis=1)
+            self.codes = codes if self.codes is None else np.vstack([self.codes, codes])
+        return list(range(start, self.count))
+
+    def _add_int8(self, matrix):
+        # One symmetric scale for the whole index; re-quantize if new vectors widen the range
+        peak = float(np.abs(matrix).max()) if len(matrix) else 0.0
+        if self.scale is None or peak > self.scale:
+            self.scale = peak or 1.0
+            self.codes = self._quantize_int8(np.asarray(self.vectors))
+        else:
+            codes = self._quantize_int8(matrix)
+            self.codes = np.vstack([self.codes, codes])
+
+    def _quantize_int8(self, matrix):
+        return np.clip(np.rint(matrix / self.scale * 127), -127, 127).astype(np.int8)
+
+    def search(
+        self,
+        query: Sequence[float],
+        top_k: int,
+        candidates: Optional[Sequence[int]] = None,
+        rescore_factor: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """(position, cosine similarity) pairs, best first. `candidates` restricts the search."""
+        if not self.count:
+            return []
+        q = np.asarray(query, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        rows = np.arange(self.count) if candidates is None else np.asarray(sorted(candidates), dtype=np.int64)
+        if not len(rows):
+            return []
+
+        if self.mode == "float":
+            shortlist = rows
+        else:
+            approx = self._approximate_scores(q, rows)
+            factor = rescore_factor or RESCORE_FACTORS[self.mode]
+            size = min(len(rows), top_k * max(1, factor))
+            best = np.argpartition(-approx, size - 1)[:size]
+            shortlist = rows[best]
+
+        exact = np.asarray(self.vectors[shortlist]) @ q
+        order = np.argsort(-exact)[:top_k]
+        return [(int(shortlist[i]), float(exact[i])) for i in order]
+
+    def _approximate_scores(self, q, rows):
+        if self.mode == "int8":
+            # numpy has no int8 GEMM; widen in blocks to keep the temporary small
+            q_codes = self._quantize_int8(q).astype(np.float32)
+            scores = np.empty(len(rows), dtype=np.float32)
+            for start in range(0, len(rows), _BLOCK_ROWS):
+                block = self.codes[rows[start:start + _BLOCK_ROWS]]
+                scores[start:start + len(block)] = block.astype(np.float32) @ q_codes
+            return scores
+        q_bits = np.packbits(q > 0)
+        distances = _popcount_table()[np.bitwise_xor(self.codes[rows], q_bits)].sum(axis=1)
+        return -distances.astype(np.int32)
+
+    def close(self):
+        """Drop the mapping and delete the backing file"""
+        self.vectors = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def memory_bytes(self) -> dict:
+        """Resident bytes (quantized codes) vs bytes kept on disk behind the mmap"""
+        return {
+            "resident": int(self.codes.nbytes) if self.codes is not None else 0,
+            "mmap_float32": self.count * self.dimension * 4,
+        }
+
+
+# One local index per namespace (only used when NUA_LOCAL_VECTOR_INDEX is set)
+_indexes: Dict[str, QuantizedVectorIndex] = {}
+
+
+def get_vector_index(namespace: str, dimension: int) -> QuantizedVectorIndex:
+    index = _indexes.get(namespace)
+    if index is None:
+        index = _indexes[namespace] = QuantizedVectorIndex(namespace, dimension, mode=LOCAL_VECTOR_INDEX)
+        atexit.register(index.close)
+    return index
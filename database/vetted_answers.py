@@ -0,0 +1,219 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import re
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from utils.metrics import metrics
+from utils.shared_cache import SharedCache
+
+# numpy is only needed for paraphrase matching; imported on first use so
+# main (which records ratings) doesn't pay for it at startup
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+logger = logging.getLogger(__name__)
+
+VETTED_ANSWERS_CONFIG = {
+    "enabled": os.getenv("NUA_VETTED_ANSWERS", "true").lower() in ("1", "true", "yes"),
+    # Ratings at or above this from `min_raters` distinct users promote an
+    # answer; a rating at or below `evict_rating` evicts it
+    "promote_rating": int(os.getenv("NUA_VETTED_PROMOTE_RATING", "5")),
+    "min_raters": int(os.getenv("NUA_VETTED_MIN_RATERS", "3")),
+    "evict_rating": int(os.getenv("NUA_VETTED_EVICT_RATING", "2")),
+    # Entries whose mean rating drops below this are evicted as well
+    "min_mean_rating": float(os.getenv("NUA_VETTED_MIN_MEAN_RATING", "4.0")),
+    # Cosine similarity for serving a paraphrase of a vetted query
+    "similarity": float(os.getenv("NUA_VETTED_SIMILARITY", "0.95")),
+    "ttl": float(os.getenv("NUA_VETTED_TTL", str(30 * 24 * 3600))),
+}
+
+VETTED_EVENTS = metrics.counter(
+    "nua_vetted_answers_total", "Vetted answer store lookups and updates", labels=("event",)
+)
+
+Embedder = Callable[[List[str]], Awaitable[Optional[List[List[float]]]]]
+
+# Rater ids remembered per entry (each user's rating counts once)
+MAX_RATERS = 200
+
+# Same tokens as database.lexical_index, without importing langchain here
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(TOKEN_PATTERN.findall(query.lower()))
+
+
+class VettedAnswerStore:
+    """
+    Answers users rated highly, served again for the same (or a closely
+    paraphrased) question without any LLM call. Entries live in the shared
+    cache tier keyed by normalized query so every worker sees them; each
+    process keeps its own embedding matrix, refreshed in the background
+    (embedding only new entries) when the store's version counter moves.
+
+    Vetted answers are served to everyone, so only answers generated without
+    the asker's history or summary are eligible, and promotion takes high
+    ratings from several distinct users of the same question (candidates).
+    """
+
+    def __init__(self, config: Dict = None):
+        self.config = config or VETTED_ANSWERS_CONFIG
+        self.enabled = self.config["enabled"]
+        self.entries = SharedCache("vetted_answers", ttl=self.config["ttl"])
+        self.candidates = SharedCache("vetted_candidates", ttl=self.config["ttl"])
+        self.versions = SharedCache("vetted_version")
+        self._loaded_version = -1
+        self._keys: List[str] = []
+        self._matrix = None
+        # Normalized embedding per vetted query, so a refresh embeds only new entries
+        self._vectors: Dict[str, object] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def record_rating(self, interaction: Dict, rating: int, rater_id: str) -> Optional[str]:
+        """
+        Fold the owner's rating of an interaction into the store; returns
+        "promoted", "evicted", "rated", "candidate" or None
+        """
+        if not self.enabled or not interaction.get("query") or not interaction.get("response"):
+            return None
+        # Only the user who got the answer may rate it
+        if rater_id != interaction.get("user_id"):
+            return None
+        classification = interaction.get("classification") or {}
+        # Templated fast-path answers are already free
+        if classification.get("source") == "fast_path":
+            return None
+        # Answers built from the asker's own history must never reach other users
+        if interaction.get("personalized", True):
+            return None
+        key = classification.get("vetted_key") or normalize_query(interaction["query"])
+        entry = self.entries.get(key)
+
+        if rating <= self.config["evict_rating"]:
+            self.candidates.delete(key)
+            if entry is None:
+                return None
+            return self._evict(key)
+
+        if entry is not None and entry["response"] == interaction["response"]:
+            if rater_id in entry["raters"]:
+                return None
+            entry["raters"] = (entry["raters"] + [rater_id])[-MAX_RATERS:]
+            entry["rating_sum"] += rating
+            entry["rating_count"] += 1
+            if entry["rating_sum"] / entry["rating_count"] < self.config["min_mean_rating"]:
+                return self._evict(key)
+            self.entries.set(key, entry)
+            VETTED_EVENTS.inc("rated")
+            return "rated"
+
+        if rating < self.config["promote_rating"]:
+            return None
+        candidate = self.candidates.get(key) or {
+            "query": interaction["query"],
+            "response": interaction["response"],
+            "classification": {k: v for k, v in classification.items() if k not in ("source", "vetted_key")},
+            "raters": [],
+            "rating_sum": 0,
+        }
+        if rater_id in candidate["raters"]:
+            return None
+        candidate["raters"].append(rater_id)
+        candidate["rating_sum"] += rating
+        if len(candidate["raters"]) < self.config["min_raters"]:
+            self.candidates.set(key, candidate)
+            VETTED_EVENTS.inc("candidate")
+            return "candidate"
+
+        # Enough distinct users rated answers to this question highly: the
+        # first of those answers becomes the vetted one
+        self.candidates.delete(key)
+        self.entries.set(key, {
+            "query": candidate["query"],
+            "response": candidate["response"],
+            "classification": candidate["classification"],
+            "raters": candidate["raters"],
+            "rating_sum": candidate["rating_sum"],
+            "rating_count": len(candidate["raters"]),
+        })
+        self.versions.incr("vetted_answers", ttl=self.config["ttl"])
+        VETTED_EVENTS.inc("promoted")
+        return "promoted"
+
+    def _evict(self, key: str) -> str:
+        self.entries.delete(key)
+        self.versions.incr("vetted_answers", ttl=self.config["ttl"])
+        VETTED_EVENTS.inc("evicted")
+        return "evicted"
+
+    async def lookup(
+        self,
+        query: str,
+        embed: Optional[Embedder] = None
+    ) -> Tuple[Optional[Tuple[Dict, str]], Optional[List[float]]]:
+        """
+        ((classification, answer) or None, the query embedding if one was
+        computed). The embedding is handed back so retrieval can reuse it.
+        Paraphrases are matched against the last refreshed matrix; a newer
+        store version only schedules a background refresh.
+        """
+        if not self.enabled:
+            return None, None
+        key = normalize_query(query)
+        entry = self.entries.get(key)
+        query_vector = None
+        if entry is None and embed is not None and HAS_NUMPY:
+            self._schedule_refresh(embed)
+            if self._keys:
+                vectors = await embed([query])
+                if vectors:
+                    query_vector = vectors[0]
+                    key = self._nearest(query_vector)
+                    entry = self.entries.get(key) if key else None
+        if entry is None:
+            VETTED_EVENTS.inc("miss")
+            return None, query_vector
+        VETTED_EVENTS.inc("hit")
+        classification = dict(entry["classification"], source="vetted", vetted_key=key)
+        return (classification, entry["response"]), query_vector
+
+    def _schedule_refresh(self, embed: Embedder):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        version = self.versions.get("vetted_answers") or 0
+        if version != self._loaded_version:
+            self._refresh_task = asyncio.create_task(self._refresh(embed, version))
+
+    async def _refresh(self, embed: Embedder, version: int):
+        try:
+            items = self.entries.items()
+            new = [(key, entry["query"]) for key, entry in items if key not in self._vectors]
+            if new:
+                vectors = await embed([query for _, query in new])
+                if not vectors:
+                    return
+                import numpy as np
+                for (key, _), vector in zip(new, vectors):
+                    vector = np.asarray(vector, dtype=np.float32)
+                    self._vectors[key] = vector / max(float(np.linalg.norm(vector)), 1e-12)
+            live = {key for key, _ in items}
+            self._vectors = {key: vector for key, vector in self._vectors.items() if key in live}
+            if self._vectors:
+                import numpy as np
+                self._keys = list(self._vectors)
+                self._matrix = np.stack([self._vectors[key] for key in self._keys])
+            else:
+                self._matrix, self._keys = None, []
+            self._loaded_version = version
+        except Exception as e:
+            logger.warning(f"Vetted answer index refresh failed: {e}")
+
+    def _nearest(self, query_vector: List[float]) -> Optional[str]:
+        import numpy as np
+        q = np.asarray(query_vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        scores = self._matrix @ q
+        best = int(np.argmax(scores))
+        return self._keys[best] if scores[best] >= self.config["similarity"] else None
@@ -1,19 +1,34 @@
 from fastapi import FastAPI, HTTPException, WebSocket, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from contextlib import asynccontextmanager
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List, Optional
 import asyncio
+import importlib
 import logging
+import os
+import time
 import uuid
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import json
 
 # Import custom modules
-from agents.orchestrator import NuaOrchestrator
 from analytics.engine import NuaAnalyticsEngine
+from analytics.export import EXPORT_FORMATS, csv_stream, ndjson_stream, write_parquet
 from testing.ab_test_engine import ABTestEngine
-from database.postgres_db import PostgresDB
+from database.postgres_db import EXPORT_COLUMNS, USAGE_GROUP_COLUMNS, PostgresDB
+from database.vetted_answers import VettedAnswerStore
+from agents.safety_agent import is_emergency
+from utils.admission import AdmissionRejected, Priority, llm_admission, set_request_priority
+from utils.http_cache import HTTP_CACHE_CONFIG, ConditionalGetMiddleware, FastJSONResponse, bump_version
 from utils.logger import setup_logger
+from utils.metrics import metrics
+from utils.pipeline import Stage, StageGraph
+from utils.profiler import ProfilingMiddleware, request_profiler
+from utils.shared_cache import SharedCache
+from utils.task_queue import BackgroundTaskQueue
+from utils.usage import BUDGET_NORMAL, budget_mode, budget_status, track_request_usage, usage_ledger
 
 # Setup logging
 logger = setup_logger(__name__)
@@ -22,22 +37,72 @@ logger = setup_logger(__name__)
 # LIFESPAN MANAGEMENT
 # ============================================
 
+# How long a chat request waits for warm-up before answering 503
+READINESS_TIMEOUT = float(os.getenv("NUA_READINESS_TIMEOUT", "30"))
+
+async def _warm_up(app: FastAPI):
+    """Import and initialize the agent stack and DB pool without holding up the liveness probe"""
+    started = time.perf_counter()
+    try:
+        # langchain, openai and pinecone are imported here, off the event loop
+        module = await asyncio.to_thread(importlib.import_module, "agents.orchestrator")
+        imported = time.perf_counter()
+        orchestrator = module.NuaOrchestrator()
+        # One pool for the process, opened alongside the agents
+        await asyncio.gather(orchestrator.initialize(), app.state.db.initialize())
+    except Exception as e:
+        logger.error(f"Warm-up failed: {str(e)}", exc_info=True)
+        raise
+    app.state.orchestrator = orchestrator
+    app.state.startup.update({
+        "import_seconds": round(imported - started, 3),
+        "warm_up_seconds": round(time.perf_counter() - started, 3),
+        "ready_at": datetime.now().isoformat()
+    })
+    logger.info(f"✓ Ready after {app.state.startup['warm_up_seconds']}s warm-up")
+
+def _is_ready() -> bool:
+    warm_up = app.state.warm_up
+    return warm_up.done() and not warm_up.cancelled() and warm_up.exception() is None
+
+async def wait_until_ready() -> bool:
+    """Wait (up to READINESS_TIMEOUT) for warm-up; False if it failed or is still running"""
+    warm_up = app.state.warm_up
+    if not warm_up.done():
+        try:
+            await asyncio.wait_for(asyncio.shield(warm_up), timeout=READINESS_TIMEOUT)
+        except Exception:
+            return False
+    return _is_ready()
+
+async def require_ready():
+    if not await wait_until_ready():
+        raise HTTPException(status_code=503, detail="Service is warming up", headers={"Retry-After": "5"})
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Nua RAG Backend...")
-    app.state.orchestrator = NuaOrchestrator()
-    app.state.analytics_engine = NuaAnalyticsEngine()
-    app.state.ab_test_engine = ABTestEngine()
     app.state.db = PostgresDB()
+    app.state.analytics_engine = NuaAnalyticsEngine(db=app.state.db)
+    app.state.ab_test_engine = ABTestEngine()
+    app.state.vetted_answers = VettedAnswerStore()
+    app.state.task_queue = BackgroundTaskQueue()
+    await app.state.task_queue.start()
     
-    # Initialize vector DB
-    await app.state.orchestrator.initialize()
+    # Agents, LLM clients and the vector DB load in the background; the app
+    # answers liveness probes right away and /api/v1/admin/ready once warm
+    app.state.startup = {"started_at": datetime.now().isoformat()}
+    app.state.warm_up = asyncio.create_task(_warm_up(app))
     
     yield
     
     # Shutdown
     logger.info("Shutting down gracefully...")
+    if not app.state.warm_up.done():
+        app.state.warm_up.cancel()
+    # Let queued side effects (logging, analytics) finish before closing the DB
+    await app.state.task_queue.drain()
     await app.state.db.close()
 
 app = FastAPI(
@@ -47,6 +112,19 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Reports are recomputed only when the tables they aggregate change (or their
+# time window rolls over); polls of an unchanged report get a 304 or a cached,
+# compressed body
+app.add_middleware(ConditionalGetMiddleware, routes={
+    # Reports not backed by a table yet (ad-copy, faq-gaps, funnel, segments,
+    # sentiment-trends, admin stats) only roll over with the time bucket
+    "/api/v1/analytics/": ((), HTTP_CACHE_CONFIG["window_bucket"]),
+    "/api/v1/admin/stats": ((), HTTP_CACHE_CONFIG["window_bucket"]),
+    # Windows relative to now roll over hourly even without new writes
+    "/api/v1/analytics/insights": (("insights",), HTTP_CACHE_CONFIG["window_bucket"]),
+    "/api/v1/analytics/concerns": (("insights",), HTTP_CACHE_CONFIG["window_bucket"]),
+}, exclude=("/api/v1/analytics/export",))
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -56,6 +134,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in profiling of a fraction of chat requests (off by default; see utils.profiler)
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler, prefixes=("/api/v1/chat",))
+
 # ============================================
 # PYDANTIC MODELS
 # ============================================
@@ -66,6 +147,11 @@ class ChatMessage(BaseModel):
     session_id: str
     metadata: dict = {}
 
+class BatchChatRequest(BaseModel):
+    messages: List[ChatMessage]
+    max_concurrency: int = 8
+    classify_only: bool = False  # Backfill classifications without generating answers
+
 class AnalyticsRequest(BaseModel):
     time_period: str = "weekly"
 
@@ -76,85 +162,210 @@ class ABTestConfig(BaseModel):
     treatment_template: str
     sample_size: int = 1000
 
+class ProfilerSettings(BaseModel):
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = None
+    mode: Optional[str] = None  # "sample" | "cprofile"
+    allow_header: Optional[bool] = None
+
 class FeedbackMessage(BaseModel):
-    interaction_id: str
-    rating: int  # 1-5
+    interaction_id: uuid.UUID
+    user_id: str  # must be the user the answer was given to
+    rating: int = Field(ge=1, le=5)
     feedback_text: str = ""
 
+# ============================================
+# CHAT PIPELINE
+# ============================================
+# user_context and ab_assign are independent; the orchestrator needs both.
+# Logging, analytics and A/B tracking only need its result, so they are
+# handed to the background task queue once the response is ready.
+
+async def _user_context_stage(ctx):
+    return await get_user_context(ctx["message"].user_id, app.state.db)
+
+async def _ab_assign_stage(ctx):
+    ab_test = await app.state.ab_test_engine.get_active_test(ctx["message"].user_id)
+    variant = None
+    if ab_test:
+        variant = await app.state.ab_test_engine.assign_variant(
+            ab_test["id"], 
+            ctx["message"].user_id
+        )
+    return {"test": ab_test, "variant": variant}
+
+async def _orchestrator_stage(ctx, user_context, ab_assign):
+    user_context["ab_variant"] = ab_assign["variant"]
+    return await app.state.orchestrator.process_query(
+        ctx["message"].message, 
+        user_context
+    )
+
+async def _db_log_stage(ctx, ab_assign, orchestrator):
+    message = ctx["message"]
+    await log_interaction(app.state.db, {
+        "interaction_id": ctx["interaction_id"],
+        "user_id": message.user_id,
+        "session_id": message.session_id,
+        "query": message.message,
+        "response": orchestrator["response"],
+        "classification": orchestrator["classification"],
+        "ab_variant": ab_assign["variant"],
+        "llm_usage": orchestrator.get("usage"),
+        "personalized": orchestrator.get("personalized", True),
+        "timestamp": datetime.now()
+    })
+
+async def _analytics_stage(ctx, orchestrator):
+    # Computed for the response only: nothing is written, so no report version changes
+    return await app.state.analytics_engine.extract_insights(
+        user_id=ctx["message"].user_id,
+        query=ctx["message"].message,
+        response=orchestrator["response"],
+        classification=orchestrator["classification"]
+    )
+
+async def _ab_track_stage(ctx, ab_assign, orchestrator):
+    # Track A/B test outcome if applicable
+    if ab_assign["test"]:
+        await app.state.ab_test_engine.track_outcome(
+            test_id=ab_assign["test"]["id"],
+            user_id=ctx["message"].user_id,
+            outcome_metric="response_generated",
+            value=1
+        )
+
+async def _summary_stage(ctx, orchestrator):
+    message = ctx["message"]
+    await update_conversation_summary(app.state.db, message.user_id, message.message, orchestrator["response"])
+
+CHAT_PIPELINE = StageGraph([
+    Stage("user_context", _user_context_stage),
+    Stage("ab_assign", _ab_assign_stage),
+    Stage("orchestrator", _orchestrator_stage, depends_on=["user_context", "ab_assign"]),
+    Stage("db_log", _db_log_stage, depends_on=["ab_assign", "orchestrator"], critical=False),
+    Stage("summary", _summary_stage, depends_on=["orchestrator"], critical=False),
+    Stage("analytics", _analytics_stage, depends_on=["orchestrator"], critical=False),
+    Stage("ab_track", _ab_track_stage, depends_on=["ab_assign", "orchestrator"], critical=False),
+])
+
 # ============================================
 # CHAT ENDPOINTS
 # ============================================
 
-@app.post("/api/v1/chat")
+def _admit(priority: Priority):
+    """Shed early under overload, otherwise tag the request's LLM calls with its priority"""
+    try:
+        llm_admission.check(priority)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    set_request_priority(priority)
+
+def _message_priority(text: str) -> Priority:
+    return Priority.EMERGENCY if is_emergency(text) else Priority.NORMAL
+
+@app.post("/api/v1/chat", dependencies=[Depends(require_ready)])
 async def handle_chat(message: ChatMessage):
     """
     Main chat endpoint with full RAG pipeline
     """
+    _admit(_message_priority(message.message))
     try:
         logger.info(f"Chat received from user {message.user_id}")
         
-        # Get user context
-        user_context = await get_user_context(message.user_id, app.state.db)
-        
-        # Check active A/B test
-        ab_test = await app.state.ab_test_engine.get_active_test(message.user_id)
-        if ab_test:
-            variant = await app.state.ab_test_engine.assign_variant(
-                ab_test["id"], 
-                message.user_id
-            )
-            user_context["ab_variant"] = variant
-        else:
-            user_context["ab_variant"] = None
-        
-        # Process through orchestrator
-        result = await app.state.orchestrator.process_query(
-            message.message, 
-            user_context
+        interaction_id = str(uuid.uuid4())
+        run = await CHAT_PIPELINE.run(
+            {"message": message, "interaction_id": interaction_id},
+            queue=app.state.task_queue
         )
+        result = run.results["orchestrator"]
+        remember_interaction(interaction_id, message.user_id, message.message, result)
         
-        # Log to database
+        return {
+            "success": True,
+            "interaction_id": interaction_id,
+            "response": result["response"],
+            "timestamp": datetime.now().isoformat(),
+            "ab_variant": run.results["ab_assign"]["variant"],
+            "insights_tracked": True
+        }
+    
+    except Exception as e:
+        logger.error(f"Chat error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+MAX_BATCH_SIZE = 1000
+
+@app.post("/api/v1/chat/batch", dependencies=[Depends(require_ready)])
+async def handle_chat_batch(batch: BatchChatRequest):
+    """
+    Bulk chat for offline jobs. Classifies in grouped prompts, embeds all
+    queries in one call and streams NDJSON results as they complete.
+    """
+    if not batch.messages or len(batch.messages) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch must contain 1-{MAX_BATCH_SIZE} messages")
+    # Bulk traffic is the first to wait and the first to be shed
+    _admit(Priority.LOW)
+    
+    return StreamingResponse(_stream_batch(batch), media_type="application/x-ndjson")
+
+async def _stream_batch(batch: BatchChatRequest):
+    # Admitted above: its LLM calls queue behind interactive traffic but don't time out there
+    set_request_priority(Priority.LOW, admitted=True)
+    orchestrator = app.state.orchestrator
+    messages = batch.messages
+    
+    if batch.classify_only:
+        classifications = await orchestrator.classify_batch([m.message for m in messages])
+        for index, (message, classification) in enumerate(zip(messages, classifications)):
+            line = {
+                "index": index,
+                "user_id": message.user_id,
+                "classification": classification
+            }
+            # Placeholder classifications ("source": "fallback") say why
+            if "error" in classification:
+                line["error"] = classification.pop("error")
+            yield json.dumps(line) + "\n"
+        return
+    
+    contexts = await asyncio.gather(*(get_user_context(m.user_id, app.state.db) for m in messages))
+    for user_context in contexts:
+        user_context["ab_variant"] = None
+    
+    items = [(m.message, ctx) for m, ctx in zip(messages, contexts)]
+    async for index, result in orchestrator.process_batch(items, max_concurrency=max(1, batch.max_concurrency)):
+        message = messages[index]
         interaction_id = str(uuid.uuid4())
-        await app.state.db.log_interaction({
+        app.state.task_queue.enqueue("db_log", log_interaction, app.state.db, {
             "interaction_id": interaction_id,
             "user_id": message.user_id,
             "session_id": message.session_id,
             "query": message.message,
             "response": result["response"],
             "classification": result["classification"],
-            "ab_variant": user_context.get("ab_variant"),
+            "ab_variant": None,
+            "llm_usage": result.get("usage"),
+            "personalized": result.get("personalized", True),
             "timestamp": datetime.now()
         })
-        
-        # Extract and log insights
-        insights = await app.state.analytics_engine.extract_insights(
-            user_id=message.user_id,
-            query=message.message,
-            response=result["response"],
-            classification=result["classification"]
+        app.state.task_queue.enqueue(
+            "summary", update_conversation_summary, app.state.db, message.user_id, message.message, result["response"]
         )
+        remember_interaction(interaction_id, message.user_id, message.message, result)
         
-        # Track A/B test outcome if applicable
-        if ab_test:
-            await app.state.ab_test_engine.track_outcome(
-                test_id=ab_test["id"],
-                user_id=message.user_id,
-                outcome_metric="response_generated",
-                value=1
-            )
-        
-        return {
-            "success": True,
+        degraded = result.get("degraded_stages", [])
+        yield json.dumps({
+            "index": index,
+            # Degraded items carry a fallback classification or retrieval-only answer
+            "success": not degraded,
+            "degraded": degraded,
             "interaction_id": interaction_id,
+            "user_id": message.user_id,
             "response": result["response"],
-            "timestamp": datetime.now().isoformat(),
-            "ab_variant": user_context.get("ab_variant"),
-            "insights_tracked": True
-        }
-    
-    except Exception as e:
-        logger.error(f"Chat error: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+            "classification": result["classification"],
+            "timestamp": datetime.now().isoformat()
+        }, default=str) + "\n"
 
 @app.websocket("/ws/chat/{user_id}")
 async def websocket_chat(websocket: WebSocket, user_id: str):
@@ -163,10 +374,15 @@ async def websocket_chat(websocket: WebSocket, user_id: str):
     """
     await websocket.accept()
     session_id = str(uuid.uuid4())
+    if not await wait_until_ready():
+        # 1013: try again later
+        await websocket.close(code=1013)
+        return
     
     try:
         while True:
             data = await websocket.receive_text()
+            set_request_priority(_message_priority(data))
             
             user_context = await get_user_context(user_id, app.state.db)
             result = await app.state.orchestrator.process_query(data, user_context)
@@ -187,13 +403,20 @@ async def submit_feedback(feedback: FeedbackMessage):
     """
     Log user feedback on responses
     """
+    interaction = recent_interactions.get(str(feedback.interaction_id))
+    if interaction and interaction.get("user_id") != feedback.user_id:
+        raise HTTPException(status_code=403, detail="Only the user who received an answer can rate it")
     try:
         await app.state.db.log_feedback({
-            "interaction_id": feedback.interaction_id,
+            "interaction_id": str(feedback.interaction_id),
+            "user_id": feedback.user_id,
             "rating": feedback.rating,
             "feedback_text": feedback.feedback_text,
             "timestamp": datetime.now()
         })
+        bump_version("interactions")
+        if interaction:
+            app.state.vetted_answers.record_rating(interaction, feedback.rating, feedback.user_id)
         
         return {
             "success": True,
@@ -208,7 +431,7 @@ async def submit_feedback(feedback: FeedbackMessage):
 # ANALYTICS ENDPOINTS
 # ============================================
 
-@app.get("/api/v1/analytics/insights")
+@app.get("/api/v1/analytics/insights", response_class=FastJSONResponse)
 async def get_insights(period: str = "weekly"):
     """
     Get comprehensive business intelligence
@@ -218,17 +441,17 @@ async def get_insights(period: str = "weekly"):
             time_period=period
         )
         
-        return {
+        return FastJSONResponse({
             "period": period,
             "generated_at": datetime.now().isoformat(),
             "insights": insights
-        }
+        })
     
     except Exception as e:
         logger.error(f"Insights error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/v1/analytics/concerns")
+@app.get("/api/v1/analytics/concerns", response_class=FastJSONResponse)
 async def get_top_concerns(limit: int = 10, period: str = "weekly"):
     """
     Top customer concerns by frequency and emotion
@@ -238,71 +461,118 @@ async def get_top_concerns(limit: int = 10, period: str = "weekly"):
             period=period,
             limit=limit
         )
-        return {"concerns": concerns}
+        return FastJSONResponse({"concerns": concerns})
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/v1/analytics/ad-copy")
+@app.get("/api/v1/analytics/ad-copy", response_class=FastJSONResponse)
 async def get_ad_copy():
     """
     Suggested ad copy from real customer language
     """
     try:
         suggestions = await app.state.analytics_engine.generate_ad_copy()
-        return {"suggestions": suggestions}
+        return FastJSONResponse({"suggestions": suggestions})
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/v1/analytics/faq-gaps")
+@app.get("/api/v1/analytics/faq-gaps", response_class=FastJSONResponse)
 async def get_faq_gaps():
     """
     Identify FAQ gaps
     """
     try:
         gaps = await app.state.analytics_engine.identify_faq_gaps()
-        return {"gaps": gaps}
+        return FastJSONResponse({"gaps": gaps})
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/v1/analytics/funnel")
+@app.get("/api/v1/analytics/funnel", response_class=FastJSONResponse)
 async def get_funnel_analysis():
     """
     Customer journey funnel analysis
     """
     try:
         analysis = await app.state.analytics_engine.analyze_funnel()
-        return {"funnel": analysis}
+        return FastJSONResponse({"funnel": analysis})
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/v1/analytics/sentiment-trends")
+@app.get("/api/v1/analytics/sentiment-trends", response_class=FastJSONResponse)
 async def get_sentiment_trends(days: int = 7):
     """
     Sentiment trends over time
     """
     try:
         trends = await app.state.analytics_engine.get_sentiment_trends(days=days)
-        return {"trends": trends}
+        return FastJSONResponse({"trends": trends})
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/v1/analytics/customer-segments")
+@app.get("/api/v1/analytics/customer-segments", response_class=FastJSONResponse)
 async def get_customer_segments():
     """
     Segmentation of customers
     """
     try:
         segments = await app.state.analytics_engine.segment_customers()
-        return {"segments": segments}
+        return FastJSONResponse({"segments": segments})
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _local_naive(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+@app.get("/api/v1/analytics/export/{table}")
+async def export_table(
+    table: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    format: str = "ndjson"
+):
+    """
+    Stream interactions or insights in [start, end) (default: the last 7
+    days) as NDJSON or CSV, read in fixed-size batches from a server-side
+    cursor. format=parquet writes a local file instead and returns its path.
+    """
+    if table not in EXPORT_COLUMNS:
+        raise HTTPException(status_code=404, detail=f"Unknown table '{table}'")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    # Timestamps are stored as naive local time; aware bounds are converted to it
+    start, end = (_local_naive(value) for value in (start, end))
+    end = end or datetime.now()
+    start = start or end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    batches = app.state.db.stream_rows(table, start, end)
+    filename = f"{table}_{start:%Y%m%dT%H%M%S}_{end:%Y%m%dT%H%M%S}"
+    if format == "parquet":
+        try:
+            return await write_parquet(table, batches, start, end)
+        except RuntimeError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+    if format == "csv":
+        return StreamingResponse(
+            csv_stream(table, batches),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.csv"'}
+        )
+    return StreamingResponse(
+        ndjson_stream(batches),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}.ndjson"'}
+    )
+
 # ============================================
 # A/B TESTING ENDPOINTS
 # ============================================
@@ -355,23 +625,110 @@ async def get_test_results(test_id: str):
 
 @app.get("/api/v1/admin/health")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness probe: answers as soon as the process is up"""
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
+        "worker_pid": os.getpid(),
         "components": {
-            "orchestrator": "ready",
+            "orchestrator": "ready" if _is_ready() else "warming_up",
             "analytics": "ready",
-            "database": "ready"
+            "database": app.state.db.pool_stats()
         }
     }
 
-@app.get("/api/v1/admin/stats")
+@app.get("/api/v1/admin/ready")
+async def readiness_check():
+    """Readiness probe: 200 once agents and clients are warmed up, 503 before"""
+    ready = _is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "worker_pid": os.getpid(), "startup": app.state.startup}
+    )
+
+@app.get("/api/v1/admin/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus-format pipeline metrics (stage latency, in-flight, cache hits, tokens)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/v1/admin/tasks")
+async def get_task_queue_status():
+    """Background task queue depth and recent dead-lettered tasks"""
+    queue = app.state.task_queue
+    return {
+        **queue.stats(),
+        "recent_dead_letters": list(queue.dead_letters)[-20:]
+    }
+
+@app.get("/api/v1/admin/admission")
+async def admission_stats():
+    """LLM admission control: slots in use and queued calls by priority"""
+    return llm_admission.stats()
+
+@app.get("/api/v1/admin/usage")
+async def get_llm_usage(days: int = 7, group_by: str = "agent", user_id: Optional[str] = None):
+    """LLM tokens and estimated cost per day, grouped by agent, user or model, with today's budget status"""
+    if group_by not in USAGE_GROUP_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(USAGE_GROUP_COLUMNS)}")
+    if not 1 <= days <= 366:
+        raise HTTPException(status_code=400, detail="days must be between 1 and 366")
+    since = date.today() - timedelta(days=days - 1)
+    db = app.state.db
+    if db.pool:
+        # Include this worker's unflushed totals; other workers flush on their own interval
+        await db.flush_llm_usage()
+        rows = await db.get_llm_usage(since, group_by, user_id)
+    else:
+        rows = usage_ledger.report(since, group_by, user_id)
+    return {
+        "since": since.isoformat(),
+        "group_by": group_by,
+        "usage": rows,
+        "budget": {**budget_status(user_id), "mode": budget_mode(user_id)},
+    }
+
+@app.get("/api/v1/admin/profiler")
+async def get_profiler_status():
+    """This worker's profiler settings and captured profiles (ring buffer, newest last)"""
+    return request_profiler.status()
+
+@app.post("/api/v1/admin/profiler")
+async def configure_profiler(settings: ProfilerSettings):
+    """Turn request profiling on or off for this worker, or change its rate and mode"""
+    try:
+        return request_profiler.configure(**settings.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/v1/admin/profiler/collapsed", response_class=PlainTextResponse)
+async def get_collapsed_stacks():
+    """Every captured stack-sample profile merged as collapsed stacks (flamegraph.pl / speedscope input)"""
+    profiles = [profile for profile in request_profiler.profiles if profile["mode"] == "sample"]
+    return PlainTextResponse(request_profiler.collapsed(profiles))
+
+@app.get("/api/v1/admin/profiler/profiles/{profile_id}")
+async def download_profile(profile_id: int, format: Optional[str] = None):
+    """One profile as collapsed stacks (sample mode) or a pstats file (cprofile mode)"""
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"No profile {profile_id} on this worker")
+    expected = "collapsed" if profile["mode"] == "sample" else "pstats"
+    if format not in (None, expected):
+        raise HTTPException(status_code=400, detail=f"A {profile['mode']} profile is only available as {expected}")
+    if expected == "pstats":
+        return Response(
+            request_profiler.pstats_bytes(profile),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.pstats"'}
+        )
+    return PlainTextResponse(request_profiler.collapsed([profile]))
+
+@app.get("/api/v1/admin/stats", response_class=FastJSONResponse)
 async def get_system_stats():
     """Get system statistics"""
     try:
         stats = await app.state.db.get_system_stats()
-        return stats
+        return FastJSONResponse(stats)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -380,15 +737,87 @@ async def get_system_stats():
 # HELPER FUNCTIONS
 # ============================================
 
+# Shared by all workers; dropped whenever the user's history changes
+user_context_cache = SharedCache("user_context", ttl=int(os.getenv("NUA_USER_CONTEXT_TTL", "60")))
+# Rolling per-user conversation summaries (durable copy in Postgres)
+conversation_summaries = SharedCache("conversation_summary", ttl=int(os.getenv("NUA_SUMMARY_TTL", str(7 * 24 * 3600))))
+# Agents see the summary plus only this many verbatim turns
+RECENT_TURNS = int(os.getenv("NUA_HISTORY_RECENT_TURNS", "2"))
+# Summary updates for one user are serialized (per worker) so turns aren't lost
+_SUMMARY_LOCKS = [asyncio.Lock() for _ in range(64)]
+# Recent answers by interaction_id, for as long as feedback on them is accepted
+recent_interactions = SharedCache("recent_interactions", ttl=int(os.getenv("NUA_FEEDBACK_WINDOW", "86400")))
+
 async def get_user_context(user_id: str, db: PostgresDB):
-    """Get user context from database"""
-    return {
+    """Get user context from the shared cache, falling back to the database"""
+    cached = user_context_cache.get(user_id)
+    if cached is not None:
+        return cached
+    summary = await get_conversation_summary(user_id, db)
+    user_context = {
         "user_id": user_id,
-        "previous_interactions": await db.get_user_history(user_id, limit=5),
+        "previous_interactions": await db.get_user_history(user_id, limit=RECENT_TURNS),
+        "conversation_summary": summary["summary"] if summary else None,
         "user_segment": await db.get_user_segment(user_id),
         "conversation_stage": await db.get_conversation_stage(user_id)
     }
+    user_context_cache.set(user_id, user_context)
+    return user_context
+
+async def get_conversation_summary(user_id: str, db: PostgresDB):
+    cached = conversation_summaries.get(user_id)
+    if cached is not None:
+        return cached
+    summary = await db.get_conversation_summary(user_id)
+    if summary:
+        summary = {"summary": summary["summary"], "turns": summary["turns"]}
+        conversation_summaries.set(user_id, summary)
+    return summary
+
+async def update_conversation_summary(db: PostgresDB, user_id: str, query: str, response: str):
+    """Fold a finished turn into the user's rolling summary (background, low priority)"""
+    set_request_priority(Priority.LOW)
+    # Summaries are a nicety; users over budget keep their previous one
+    if budget_mode(user_id) != BUDGET_NORMAL:
+        return
+    async with _SUMMARY_LOCKS[hash(user_id) % len(_SUMMARY_LOCKS)]:
+        previous = await get_conversation_summary(user_id, db) or {"summary": "", "turns": 0}
+        summarizer = app.state.orchestrator.agents["summarizer"]
+        with track_request_usage(user_id):
+            text = await summarizer.summarize(previous["summary"], query, response)
+        summary = {"summary": text, "turns": previous["turns"] + 1}
+        # Cache only what was saved: a retry after a failed save must start
+        # from the stored summary, not count this turn twice
+        await db.save_conversation_summary(user_id, text, summary["turns"])
+        conversation_summaries.set(user_id, summary)
+    user_context_cache.delete(user_id)
+
+async def log_interaction(db: PostgresDB, interaction: dict):
+    """Persist an interaction and invalidate the user's cached context"""
+    await db.log_interaction(interaction)
+    user_context_cache.delete(interaction["user_id"])
+    bump_version("interactions")
+
+def remember_interaction(interaction_id: str, user_id: str, query: str, result: dict):
+    """
+    Kept so a later rating can promote or evict the answer. Runs before the
+    response (and so the interaction_id) goes out, so no rating can beat it.
+    """
+    recent_interactions.set(interaction_id, {
+        "user_id": user_id,
+        "personalized": result.get("personalized", True),
+        "query": query,
+        "response": result["response"],
+        "classification": result["classification"],
+    })
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    # WEB_CONCURRENCY > 1 runs that many worker processes (caches are shared
+    # through utils.shared_cache); a single worker keeps auto-reload for development
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    port = int(os.getenv("PORT", "8000"))
+    if workers > 1:
+        uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers)
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
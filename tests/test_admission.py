@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from utils.admission import (
+    AdmissionController, AdmissionRejected, Priority, current_priority, escalate_request_priority,
+    request_admitted, set_request_priority
+)
+
+
+def _controller(max_concurrency=1, max_queue=8, shed_depth=2, low_wait=0.05):
+    return AdmissionController({
+        "max_concurrency": max_concurrency,
+        "max_queue": max_queue,
+        "shed_depth": shed_depth,
+        "max_wait": {Priority.NORMAL: 1.0, Priority.LOW: low_wait},
+        "retry_after": 3,
+    })
+
+
+async def _hold(controller, priority, order, release):
+    async with controller.slot(priority):
+        order.append(priority)
+        await release.wait()
+
+
+async def _queue(controller, priorities, release):
+    """Occupy the only slot, then queue `priorities` behind it (in that order)"""
+    order = []
+    holder = asyncio.ensure_future(_hold(controller, Priority.NORMAL, order, release))
+    await asyncio.sleep(0)
+    waiters = []
+    for priority in priorities:
+        waiters.append(asyncio.ensure_future(_hold(controller, priority, order, release)))
+        await asyncio.sleep(0)
+    return order, [holder] + waiters
+
+
+def test_check_sheds_low_priority_first():
+    async def scenario():
+        controller = _controller(shed_depth=2, max_queue=3)
+        release = asyncio.Event()
+        _, tasks = await _queue(controller, [Priority.HIGH, Priority.HIGH], release)
+        with pytest.raises(AdmissionRejected) as rejected:
+            controller.check(Priority.LOW)
+        assert rejected.value.retry_after == 3
+        controller.check(Priority.NORMAL)
+        tasks.append(asyncio.ensure_future(_hold(controller, Priority.HIGH, [], release)))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            controller.check(Priority.NORMAL)
+        controller.check(Priority.HIGH)
+        controller.check(Priority.EMERGENCY)
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+
+def test_freed_slots_go_to_the_highest_priority_waiter():
+    async def scenario():
+        controller = _controller(max_queue=8)
+        release = asyncio.Event()
+        order, tasks = await _queue(
+            controller, [Priority.LOW, Priority.NORMAL, Priority.EMERGENCY, Priority.NORMAL], release
+        )
+        assert controller.stats()["waiting_by_priority"] == {"low": 1, "normal": 2, "emergency": 1}
+        release.set()
+        await asyncio.gather(*tasks)
+        assert order == [Priority.NORMAL, Priority.EMERGENCY, Priority.NORMAL, Priority.NORMAL, Priority.LOW]
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_displaces_the_lowest_priority_waiter():
+    async def scenario():
+        controller = _controller(max_queue=1, low_wait=None)
+        release = asyncio.Event()
+        _, tasks = await _queue(controller, [Priority.LOW], release)
+        tasks.append(asyncio.ensure_future(_hold(controller, Priority.HIGH, [], release)))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected, match="Displaced"):
+            await tasks[1]
+        release.set()
+        await asyncio.gather(tasks[0], tasks[2])
+
+    asyncio.run(scenario())
+
+
+def test_max_wait_rejects_and_frees_the_queue():
+    async def scenario():
+        controller = _controller(low_wait=0.05)
+        release = asyncio.Event()
+        _, tasks = await _queue(controller, [], release)
+        with pytest.raises(AdmissionRejected, match="Waited"):
+            async with controller.slot(Priority.LOW):
+                pass
+        assert controller.depth == 0
+        release.set()
+        await asyncio.gather(*tasks)
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_admitted_work_waits_past_its_priority_max_wait():
+    async def scenario():
+        controller = _controller(low_wait=0.05)
+        release = asyncio.Event()
+        _, tasks = await _queue(controller, [], release)
+
+        async def admitted_call():
+            set_request_priority(Priority.LOW, admitted=True)
+            assert request_admitted()
+            async with controller.slot():
+                return "served"
+
+        call = asyncio.ensure_future(admitted_call())
+        await asyncio.sleep(0.15)
+        assert not call.done()
+        release.set()
+        assert await call == "served"
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+
+def test_request_priority_is_shared_and_only_escalates():
+    async def scenario():
+        assert current_priority() == Priority.LOW
+        assert not request_admitted()
+        set_request_priority(Priority.NORMAL)
+
+        async def stage():
+            escalate_request_priority(Priority.HIGH)
+
+        await asyncio.ensure_future(stage())
+        assert current_priority() == Priority.HIGH
+        escalate_request_priority(Priority.LOW)
+        assert current_priority() == Priority.HIGH
+
+    asyncio.run(scenario())
@@ -0,0 +1,86 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from main import _local_naive
+
+
+@pytest.fixture
+def local_tz():
+    """Run as if the server's local time were UTC+05:30"""
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = "IST-05:30"
+    time.tzset()
+    yield
+    if previous is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = previous
+    time.tzset()
+
+
+class FakeDB:
+    def __init__(self):
+        self.calls = []
+
+    async def stream_rows(self, table, start, end):
+        self.calls.append((table, start, end))
+        yield [{"interaction_id": "a", "timestamp": start}]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(main.app.state, "db", db, raising=False)
+    return db
+
+
+@pytest.fixture
+def client():
+    # No lifespan: the export route only needs app.state.db
+    return TestClient(main.app)
+
+
+def test_local_naive_converts_aware_values_to_server_local_time(local_tz):
+    aware = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+    assert _local_naive(aware) == datetime(2026, 3, 1, 17, 30)
+    offset = datetime(2026, 3, 1, 12, 0, tzinfo=timezone(timedelta(hours=-4)))
+    assert _local_naive(offset) == datetime(2026, 3, 1, 21, 30)
+
+
+def test_local_naive_keeps_naive_values_and_none():
+    naive = datetime(2026, 3, 1, 12, 0)
+    assert _local_naive(naive) is naive
+    assert _local_naive(None) is None
+
+
+def test_export_compares_aware_bounds_as_local_time(local_tz, db, client):
+    response = client.get(
+        "/api/v1/analytics/export/interactions",
+        params={"start": "2026-03-01T00:00:00+00:00", "end": "2026-03-01T06:00:00+05:30"}
+    )
+    assert response.status_code == 200
+    ((table, start, end),) = db.calls
+    assert (table, start, end) == ("interactions", datetime(2026, 3, 1, 5, 30), datetime(2026, 3, 1, 6, 0))
+    assert "interactions_20260301T053000_20260301T060000.ndjson" in response.headers["content-disposition"]
+    assert json.loads(response.text.splitlines()[0])["interaction_id"] == "a"
+
+
+def test_export_defaults_to_the_last_week(db, client):
+    assert client.get("/api/v1/analytics/export/insights").status_code == 200
+    ((_, start, end),) = db.calls
+    assert end - start == timedelta(days=7)
+    assert start.tzinfo is None and end.tzinfo is None
+
+
+def test_export_rejects_bad_requests(db, client):
+    assert client.get("/api/v1/analytics/export/users").status_code == 404
+    assert client.get("/api/v1/analytics/export/interactions", params={"format": "xml"}).status_code == 400
+    reversed_window = {"start": "2026-03-02T00:00:00Z", "end": "2026-03-01T00:00:00Z"}
+    assert client.get("/api/v1/analytics/export/interactions", params=reversed_window).status_code == 400
+    assert db.calls == []
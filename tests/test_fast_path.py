@@ -0,0 +1,52 @@
+import pytest
+
+from agents.fast_path import KnowledgeFastPath
+
+
+@pytest.fixture
+def fast_path():
+    fast_path = KnowledgeFastPath()
+    fast_path.enabled = True
+    return fast_path
+
+
+@pytest.mark.parametrize("query", [
+    "I am soaking through a pad every hour and leaking everywhere, help",
+    "can a leak cause infection? please help",
+    "do your pads cause rashes?",
+    "are your pads safe for sensitive skin with a rash?",
+    "which pads are best for heavy bleeding",
+    "I'm leaking, help",
+])
+def test_declines_symptom_and_causal_questions(fast_path, query):
+    assert fast_path.answer(query) is None
+
+
+def test_answers_product_question_for_one_concern(fast_path):
+    classification, answer = fast_path.answer("which pads are best for leaks")
+    assert classification["source"] == "fast_path"
+    assert classification["concerns"] == ["leakage"]
+    assert "Nua Sanitary Pads" in answer
+
+
+def test_declines_product_question_for_several_concerns(fast_path):
+    assert fast_path.answer("which pads are best for leaks and rashes") is None
+
+
+@pytest.mark.parametrize("query, agent", [
+    ("which pads would you recommend for leaks", "product"),
+    ("why is my period blood brown", "education"),
+    ("does stress cause a late period", "education"),
+    ("I feel so embarrassed about it", "reassurance"),
+])
+def test_classify_routes_on_keywords(fast_path, query, agent):
+    classification = fast_path.classify(query)
+    assert classification["primary_agent"] == agent
+    assert classification["source"] == "keywords"
+
+
+def test_classify_ignores_the_enabled_flag(fast_path):
+    fast_path.enabled = False
+    classification = fast_path.classify("which pads are best for leaks")
+    assert classification["primary_agent"] == "product"
+    assert classification["concerns"] == ["leakage"]
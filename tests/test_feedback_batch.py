@@ -0,0 +1,142 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+
+from database import postgres_db
+from database.postgres_db import FEEDBACK_UPDATE_SQL, PostgresDB
+
+
+class FakeConnection:
+    """Applies the batched feedback UPDATE to an in-memory interactions table"""
+
+    def __init__(self, owners):
+        self.owners = owners
+        self.ratings = {}
+        self.batches = []
+        self.fail = False
+
+    async def fetch(self, sql, ids, ratings, raters):
+        assert sql == FEEDBACK_UPDATE_SQL
+        if self.fail:
+            raise ConnectionError("connection reset")
+        self.batches.append(list(ids))
+        rows = []
+        for interaction_id, rating, rater in zip(ids, ratings, raters):
+            if self.owners.get(interaction_id) == rater:
+                self.ratings[interaction_id] = rating
+                rows.append({"interaction_id": uuid.UUID(interaction_id)})
+        return rows
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+    def get_size(self):
+        return 1
+
+    def get_idle_size(self):
+        return 0
+
+
+@pytest.fixture
+def ids():
+    return [str(uuid.uuid4()) for _ in range(3)]
+
+
+@pytest.fixture
+def conn(ids):
+    return FakeConnection({ids[0]: "alice", ids[1]: "bob"})
+
+
+@pytest.fixture
+def db(conn):
+    db = PostgresDB()
+    db.pool = FakePool(conn)
+    return db
+
+
+def test_ratings_are_written_in_one_batch(db, conn, ids):
+    async def scenario():
+        await db.log_feedback({"interaction_id": ids[0], "rating": 5, "user_id": "alice"})
+        await db.log_feedback({"interaction_id": ids[1], "rating": 2, "user_id": "bob"})
+        # The latest rating for an interaction wins
+        await db.log_feedback({"interaction_id": ids[1], "rating": 3, "user_id": "bob"})
+        assert conn.batches == []
+        assert await db.flush_feedback() == 2
+        assert conn.batches == [[ids[0], ids[1]]]
+        assert conn.ratings == {ids[0]: 5, ids[1]: 3}
+        assert await db.flush_feedback() == 0
+
+    asyncio.run(scenario())
+
+
+def test_a_full_batch_flushes_immediately(db, conn, ids, monkeypatch):
+    monkeypatch.setattr(postgres_db, "FEEDBACK_BATCH_SIZE", 2)
+
+    async def scenario():
+        await db.log_feedback({"interaction_id": ids[0], "rating": 4, "user_id": "alice"})
+        await db.log_feedback({"interaction_id": ids[1], "rating": 4, "user_id": "bob"})
+        assert conn.ratings == {ids[0]: 4, ids[1]: 4}
+
+    asyncio.run(scenario())
+
+
+def test_malformed_and_out_of_range_ratings_are_dropped(db, ids):
+    async def scenario():
+        await db.log_feedback({"interaction_id": "not-a-uuid", "rating": 5, "user_id": "alice"})
+        await db.log_feedback({"interaction_id": ids[0], "rating": 9, "user_id": "alice"})
+        await db.log_feedback({"interaction_id": ids[0], "user_id": "alice"})
+        assert db._pending_feedback == {}
+
+    asyncio.run(scenario())
+
+
+def test_failed_flush_keeps_ratings_for_the_next_one(db, conn, ids):
+    async def scenario():
+        await db.log_feedback({"interaction_id": ids[0], "rating": 5, "user_id": "alice"})
+        conn.fail = True
+        assert await db.flush_feedback() == 0
+        # A newer rating that arrived meanwhile is not overwritten by the retry
+        await db.log_feedback({"interaction_id": ids[0], "rating": 1, "user_id": "alice"})
+        conn.fail = False
+        assert await db.flush_feedback() == 1
+        assert conn.ratings == {ids[0]: 1}
+        assert db._feedback_attempts == {}
+
+    asyncio.run(scenario())
+
+
+def test_unmatched_ratings_are_retried_then_dropped(db, conn, ids, monkeypatch):
+    monkeypatch.setattr(postgres_db, "FEEDBACK_MAX_ATTEMPTS", 3)
+
+    async def scenario():
+        # ids[2] isn't logged yet; ids[1] is rated by someone other than its owner
+        await db.log_feedback({"interaction_id": ids[2], "rating": 5, "user_id": "carol"})
+        await db.log_feedback({"interaction_id": ids[1], "rating": 5, "user_id": "mallory"})
+        await db.flush_feedback()
+        assert set(db._pending_feedback) == {ids[1], ids[2]}
+        # The interaction row lands before the next flush
+        conn.owners[ids[2]] = "carol"
+        assert await db.flush_feedback() == 1
+        assert set(db._pending_feedback) == {ids[1]}
+        await db.flush_feedback()
+        assert db._pending_feedback == {}
+        assert conn.ratings == {ids[2]: 5}
+
+    asyncio.run(scenario())
+
+
+def test_without_a_pool_feedback_is_ignored(ids):
+    async def scenario():
+        db = PostgresDB()
+        await db.log_feedback({"interaction_id": ids[0], "rating": 5, "user_id": "alice"})
+        assert await db.flush_feedback() == 0
+
+    asyncio.run(scenario())
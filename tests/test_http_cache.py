@@ -0,0 +1,129 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from utils import http_cache
+from utils.http_cache import ConditionalGetMiddleware, bump_version
+
+CONFIG = {"max_age": 5, "compress_min_bytes": 100, "max_bodies": 8, "window_bucket": 60}
+
+
+@pytest.fixture(autouse=True)
+def local_versions(monkeypatch):
+    """Versions counted in this process, without touching the host-wide cache file"""
+    monkeypatch.setattr(http_cache._versions, "enabled", False)
+    monkeypatch.setattr(http_cache, "_local_modified", {})
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def client(calls):
+    app = FastAPI()
+
+    @app.get("/reports/small")
+    async def small():
+        calls.append("small")
+        return {"count": len(calls)}
+
+    @app.get("/reports/large")
+    async def large():
+        calls.append("large")
+        return {"rows": ["row"] * 100}
+
+    @app.get("/reports/windowed")
+    async def windowed():
+        calls.append("windowed")
+        return {"ok": True}
+
+    @app.get("/reports/missing")
+    async def missing():
+        calls.append("missing")
+        raise HTTPException(status_code=404)
+
+    @app.get("/reports/stream")
+    async def stream():
+        calls.append("stream")
+        return {"ok": True}
+
+    app.add_middleware(
+        ConditionalGetMiddleware,
+        routes={"/reports/": (("test_interactions",), 0), "/reports/windowed": ((), 60)},
+        exclude=("/reports/stream",),
+        config=CONFIG,
+    )
+    return TestClient(app)
+
+
+def test_matching_etag_gets_304_without_running_the_endpoint(client, calls):
+    first = client.get("/reports/small")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, max-age=5, must-revalidate"
+    assert "last-modified" in first.headers
+
+    revalidated = client.get("/reports/small", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+    assert client.get("/reports/small", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert calls == ["small"]
+
+
+def test_unchanged_report_is_served_from_the_body_cache(client, calls):
+    first = client.get("/reports/small")
+    second = client.get("/reports/small")
+    assert first.json() == second.json() == {"count": 1}
+    assert calls == ["small"]
+
+
+def test_bumping_an_aggregate_changes_the_etag(client, calls):
+    etag = client.get("/reports/small").headers["etag"]
+    bump_version("test_other_table")
+    assert client.get("/reports/small", headers={"If-None-Match": etag}).status_code == 304
+    bump_version("test_interactions")
+    changed = client.get("/reports/small", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json() == {"count": 2}
+
+
+def test_if_modified_since(client):
+    first = client.get("/reports/small")
+    assert client.get("/reports/small", headers={"If-Modified-Since": first.headers["last-modified"]}).status_code == 304
+    assert client.get("/reports/small", headers={"If-Modified-Since": "not a date"}).status_code == 200
+
+
+def test_windowed_reports_roll_over_with_the_time_bucket(client, monkeypatch):
+    monkeypatch.setattr(http_cache.time, "time", lambda: 6000.0)
+    etag = client.get("/reports/windowed").headers["etag"]
+    monkeypatch.setattr(http_cache.time, "time", lambda: 6059.0)
+    assert client.get("/reports/windowed", headers={"If-None-Match": etag}).status_code == 304
+    monkeypatch.setattr(http_cache.time, "time", lambda: 6060.0)
+    assert client.get("/reports/windowed", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_large_bodies_are_compressed(client):
+    response = client.get("/reports/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == {"rows": ["row"] * 100}
+    raw = client.get("/reports/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert len(gzip.compress(raw.content)) < len(raw.content)
+
+
+def test_errors_and_excluded_routes_are_not_cached(client, calls):
+    assert client.get("/reports/missing").status_code == 404
+    assert client.get("/reports/missing").status_code == 404
+    stream = client.get("/reports/stream")
+    assert "etag" not in stream.headers
+    client.get("/reports/stream")
+    assert calls == ["missing", "missing", "stream", "stream"]
+
+
+def test_non_get_requests_pass_through(client):
+    assert "etag" not in client.post("/reports/small").headers
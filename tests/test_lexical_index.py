@@ -0,0 +1,68 @@
+import pytest
+from langchain.schema import Document
+
+from database.lexical_index import BM25Index, RRF_K, document_id, reciprocal_rank_fusion
+
+
+def _doc(text, **metadata):
+    return Document(page_content=text, metadata=metadata)
+
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    index.add([
+        _doc("leak proof pads for heavy nights"),
+        _doc("rash free pads with a soft cotton top sheet"),
+        _doc("heat patches for cramps"),
+        _doc("pads pads pads"),
+    ])
+    return index
+
+
+def test_add_skips_documents_already_indexed(index):
+    added = index.add([_doc("heat patches for cramps"), _doc("intimate wash for odor")])
+    assert [doc.page_content for doc in added] == ["intimate wash for odor"]
+    assert len(index) == 5
+
+
+def test_rarer_terms_score_higher(index):
+    # "leak" is in one document, "pads" in three
+    results = dict(index.search("leak pads", top_k=4))
+    assert max(results, key=results.get) == 0
+    assert 2 not in results
+
+
+def test_term_frequency_saturates(index):
+    results = dict(index.search("pads", top_k=4))
+    # Three times the term frequency in a shorter document helps, but far less than 3x
+    assert results[3] > results[0]
+    assert results[3] < 3 * results[0]
+
+
+def test_candidates_restrict_scoring(index):
+    assert [position for position, _ in index.search("pads", top_k=4, candidates={1, 2})] == [1]
+    assert index.search("pads", top_k=4, candidates=set()) == []
+
+
+def test_search_documents_carries_the_score_without_touching_the_index(index):
+    (doc,) = index.search_documents("cramps", top_k=1)
+    assert doc.metadata["score"] == pytest.approx(index.search("cramps", top_k=1)[0][1])
+    assert "score" not in index.documents[2].metadata
+
+
+def test_rrf_sums_reciprocal_ranks_across_lists():
+    a, b, c = _doc("a"), _doc("b"), _doc("c")
+    fused = reciprocal_rank_fusion([[a, b], [b, c]], top_k=3)
+    assert [doc.page_content for doc in fused] == ["b", "a", "c"]
+    assert fused[0].metadata["score"] == pytest.approx(1 / (RRF_K + 2) + 1 / (RRF_K + 1))
+    assert fused[2].metadata["score"] == pytest.approx(1 / (RRF_K + 2))
+
+
+def test_rrf_fuses_on_explicit_ids_and_truncates():
+    first = _doc("same chunk, first wording", id="chunk-1")
+    second = _doc("same chunk, second wording", id="chunk-1")
+    assert document_id(first) == document_id(second)
+    fused = reciprocal_rank_fusion([[first, _doc("x")], [second]], top_k=1)
+    assert len(fused) == 1
+    assert fused[0].page_content == "same chunk, first wording"
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+from langchain.schema import Document
+
+from database.metadata_index import MetadataIndex, _set_bits, filter_from_classification
+
+
+def _doc(text, **metadata):
+    return Document(page_content=text, metadata=metadata)
+
+
+DOCUMENTS = [
+    _doc("Overnight protection", concern="leakage", funnel_stage="purchase"),
+    _doc("Soft cotton top sheet", concern=["irritation", "discomfort"], funnel_stage="consideration"),
+    _doc("A discount for confident first-time buyers"),
+    _doc("Our pads stop leaks and smells"),
+    _doc("Period myths explained", funnel_stage="awareness"),
+]
+
+
+@pytest.fixture
+def index():
+    index = MetadataIndex()
+    index.add(DOCUMENTS)
+    return index
+
+
+def test_explicit_metadata_and_untagged_documents(index):
+    # Untagged documents are not excluded by a filter on the field
+    assert index.positions({"funnel_stage": {"$eq": "purchase"}}) == [0, 2, 3]
+    assert index.positions({"funnel_stage": "awareness"}) == [2, 3, 4]
+
+
+def test_concerns_are_inferred_from_whole_words(index):
+    # "leaks", "smells" and "confident" tag leakage, odor and confidence;
+    # "discount" is not discomfort
+    assert index.positions({"concern": {"$in": ["odor"]}}) == [3, 4]
+    assert index.positions({"concern": {"$in": ["discomfort"]}}) == [1, 4]
+    assert index.positions({"concern": {"$in": ["leakage", "confidence"]}}) == [0, 2, 3, 4]
+
+
+def test_conditions_on_several_fields_intersect(index):
+    metadata_filter = {"concern": {"$in": ["leakage", "irritation"]}, "funnel_stage": {"$eq": "consideration"}}
+    assert index.positions(metadata_filter) == [1, 3]
+
+
+def test_unrestricted_filters(index):
+    assert index.positions(None) is None
+    assert index.positions({}) is None
+    assert index.positions({"unknown_field": "x"}) is None
+
+
+def test_positions_match_accepts(index):
+    filters = [
+        {"concern": {"$in": ["leakage"]}},
+        {"concern": {"$in": ["odor", "discomfort"]}, "funnel_stage": "purchase"},
+        {"funnel_stage": {"$eq": "consideration"}},
+        {"concern": "safety"},
+    ]
+    for metadata_filter in filters:
+        expected = [i for i, doc in enumerate(DOCUMENTS) if index.accepts(doc, metadata_filter)]
+        assert index.positions(metadata_filter) == expected
+
+
+def test_bitsets_are_rebuilt_after_add(index):
+    assert index.positions({"funnel_stage": "purchase"}) == [0, 2, 3]
+    index.add([_doc("Reusable panties", funnel_stage="purchase"), _doc("x", funnel_stage="awareness")])
+    assert index.positions({"funnel_stage": "purchase"}) == [0, 2, 3, 5]
+
+
+def test_split_filter_sends_only_fully_tagged_fields_remote():
+    index = MetadataIndex()
+    index.add([_doc("a", funnel_stage="purchase"), _doc("b", funnel_stage="awareness", concern="odor")])
+    metadata_filter = {"funnel_stage": "purchase", "concern": {"$in": ["odor"]}, "brand": "nua"}
+    remote, local = index.split_filter(metadata_filter)
+    assert remote == {"funnel_stage": "purchase", "brand": "nua"}
+    assert local == {"concern": {"$in": ["odor"]}}
+    assert index.split_filter(None) == (None, None)
+
+
+def test_set_bits_walks_sparse_and_dense_bitsets():
+    rng = random.Random(7)
+    count = 1000
+    expected = sorted(rng.sample(range(count), 150)) + [count - 1]
+    bits = 0
+    for position in expected:
+        bits |= 1 << position
+    assert _set_bits(bits, count) == sorted(set(expected))
+    assert _set_bits(0, count) == []
+    assert _set_bits((1 << 130) - 1, 130) == list(range(130))
+
+
+def test_filter_from_classification_keeps_known_values():
+    classification = {"concerns": ["leakage", "made-up"], "funnel_stage": "purchase"}
+    assert filter_from_classification(classification) == {
+        "concern": {"$in": ["leakage"]},
+        "funnel_stage": {"$eq": "purchase"},
+    }
+    assert filter_from_classification({"concerns": [], "funnel_stage": "nowhere"}) is None
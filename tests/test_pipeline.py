@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from utils.pipeline import Stage, StageGraph
+
+
+def _stage(name, log, depends_on=(), critical=True, result=None, delay=0.0, error=None):
+    async def func(ctx, **inputs):
+        log.append(("start", name, sorted(inputs)))
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        log.append(("end", name))
+        return result if result is not None else name
+
+    return Stage(name, func, depends_on=depends_on, critical=critical)
+
+
+def test_stages_get_their_dependencies_results():
+    async def scenario():
+        log = []
+        graph = StageGraph([
+            _stage("a", log, result=1),
+            _stage("b", log, depends_on=["a"], result=2),
+            _stage("c", log, depends_on=["a", "b"]),
+        ])
+        run = await graph.run({})
+        assert run.results == {"a": 1, "b": 2, "c": "c"}
+        assert ("start", "c", ["a", "b"]) in log
+        assert log.index(("end", "b")) < log.index(("start", "c", ["a", "b"]))
+
+    asyncio.run(scenario())
+
+
+def test_independent_stages_run_concurrently():
+    async def scenario():
+        log = []
+        graph = StageGraph([
+            _stage("root", log),
+            _stage("slow", log, depends_on=["root"], delay=0.05),
+            _stage("fast", log, depends_on=["root"]),
+        ])
+        await graph.run({})
+        assert log.index(("end", "fast")) < log.index(("end", "slow"))
+
+    asyncio.run(scenario())
+
+
+def test_background_stages_do_not_gate_the_result():
+    async def scenario():
+        log = []
+        graph = StageGraph([
+            _stage("answer", log),
+            _stage("side_effect", log, depends_on=["answer"], critical=False, delay=0.05),
+        ])
+        context = {"stage_timings": {}}
+        run = await graph.run(context)
+        assert "side_effect" not in run.results
+        results = await run.wait_background()
+        assert results["side_effect"] == "side_effect"
+        assert set(context["stage_timings"]) == {"answer", "side_effect"}
+
+    asyncio.run(scenario())
+
+
+def test_background_failures_are_contained_and_dependents_skipped():
+    async def scenario():
+        log = []
+        graph = StageGraph([
+            _stage("answer", log),
+            _stage("broken", log, depends_on=["answer"], critical=False, error=RuntimeError("db down")),
+            _stage("after_broken", log, depends_on=["broken"], critical=False),
+        ])
+        run = await graph.run({})
+        results = await run.wait_background()
+        assert results == {"answer": "answer"}
+        assert not any(entry[1] == "after_broken" for entry in log)
+
+    asyncio.run(scenario())
+
+
+def test_critical_failure_raises():
+    async def scenario():
+        graph = StageGraph([
+            _stage("classify", [], error=ValueError("bad output")),
+            _stage("answer", [], depends_on=["classify"]),
+        ])
+        with pytest.raises(ValueError, match="bad output"):
+            await graph.run({})
+
+    asyncio.run(scenario())
+
+
+def test_queued_background_stages_run_after_the_critical_path():
+    class RecordingQueue:
+        def __init__(self):
+            self.jobs = []
+
+        def enqueue(self, name, func, *args):
+            self.jobs.append((name, func, args))
+
+    async def scenario():
+        log = []
+        queue = RecordingQueue()
+        graph = StageGraph([
+            _stage("answer", log, result="ok"),
+            _stage("log", log, depends_on=["answer"], critical=False),
+        ])
+        run = await graph.run({}, queue=queue)
+        assert run.results == {"answer": "ok"}
+        assert [name for name, _, _ in queue.jobs] == ["log"]
+        _, func, args = queue.jobs[0]
+        assert await func(*args) == "log"
+        assert ("start", "log", ["answer"]) in log
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("stages, message", [
+    ([Stage("a", None, depends_on=["b"]), Stage("b", None, depends_on=["a"])], "cycle"),
+    ([Stage("a", None, depends_on=["missing"])], "unknown stage"),
+    ([Stage("bg", None, critical=False), Stage("a", None, depends_on=["bg"])], "cannot depend on background"),
+])
+def test_invalid_graphs_are_rejected(stages, message):
+    with pytest.raises(ValueError, match=message):
+        StageGraph(stages)
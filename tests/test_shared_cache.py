@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+
+from utils import shared_cache
+from utils.shared_cache import SharedCache
+
+
+@pytest.fixture
+def disabled():
+    cache = SharedCache("test_disabled", ttl=60)
+    cache.enabled = False
+    return cache
+
+
+@pytest.fixture
+def enabled(tmp_path, monkeypatch):
+    """Cache backed by a fresh SQLite file (the module keeps one connection per process)"""
+    monkeypatch.setitem(shared_cache.SHARED_CACHE_CONFIG, "path", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(shared_cache, "_connection", None)
+    yield SharedCache("test_enabled", ttl=60)
+    if shared_cache._connection is not None:
+        shared_cache._connection.close()
+
+
+@pytest.fixture(autouse=True)
+def local_counters(monkeypatch):
+    monkeypatch.setattr(shared_cache, "_local_counters", {})
+
+
+def test_disabled_cache_stores_nothing_but_still_counts(disabled):
+    disabled.set("key", {"value": 1})
+    assert disabled.items() == []
+    assert disabled.get("counter") is None
+    assert disabled.incr("counter") == 1
+    assert disabled.incr("counter", 5) == 6
+    assert disabled.get("counter") == 6
+    disabled.delete("counter")
+    assert disabled.get("counter") is None
+
+
+def test_disabled_counters_expire(disabled):
+    assert disabled.incr("counter", ttl=-1) == 1
+    assert disabled.get("counter") is None
+    assert disabled.incr("counter", ttl=-1) == 1
+
+
+def test_disabled_counters_are_namespaced(disabled):
+    other = SharedCache("test_other")
+    other.enabled = False
+    disabled.incr("counter")
+    assert other.get("counter") is None
+
+
+def test_enabled_cache_round_trip(enabled):
+    enabled.set("a", {"x": [1, 2]})
+    enabled.set("b", "text")
+    assert enabled.get("a") == {"x": [1, 2]}
+    assert sorted(enabled.items()) == [("a", {"x": [1, 2]}), ("b", "text")]
+    enabled.set("a", None, ttl=-1)
+    assert enabled.get("a") is None
+    assert enabled.incr("counter") == 1
+    assert enabled.incr("counter", 2) == 3
+
+
+def test_incr_degrades_to_a_local_count_while_the_file_is_locked(enabled, monkeypatch):
+    monkeypatch.setitem(shared_cache.SHARED_CACHE_CONFIG, "busy_timeout_ms", 10)
+    assert enabled.incr("counter") == 1
+    other = sqlite3.connect(shared_cache.SHARED_CACHE_CONFIG["path"], isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        # Counted in this process instead of raising sqlite3.OperationalError
+        assert enabled.incr("counter") == 1
+        enabled.set("key", "value")
+        assert enabled.get("counter") == 1
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert enabled.incr("counter") == 2
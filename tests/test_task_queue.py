@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from utils.task_queue import BackgroundTaskQueue
+
+
+@pytest.fixture
+def config():
+    return {
+        "max_size": 2,
+        "workers": 1,
+        "max_attempts": 3,
+        "retry_backoff": 0.001,
+        "dead_letter_size": 10,
+        "drain_timeout": 1.0,
+    }
+
+
+def _flaky(failures, calls):
+    async def job(value):
+        calls.append(value)
+        if len(calls) <= failures:
+            raise RuntimeError(f"attempt {len(calls)} failed")
+
+    return job
+
+
+def test_failed_jobs_are_retried_until_they_succeed(config):
+    async def scenario():
+        queue = BackgroundTaskQueue(config)
+        await queue.start()
+        calls = []
+        assert queue.enqueue("flaky", _flaky(2, calls), "x")
+        await queue.drain()
+        assert calls == ["x", "x", "x"]
+        assert not queue.dead_letters
+
+    asyncio.run(scenario())
+
+
+def test_jobs_that_keep_failing_are_dead_lettered(config):
+    async def scenario():
+        queue = BackgroundTaskQueue(config)
+        await queue.start()
+        calls = []
+        queue.enqueue("broken", _flaky(10, calls), "x")
+        await queue.drain()
+        assert len(calls) == config["max_attempts"]
+        (dead,) = queue.dead_letters
+        assert dead["task"] == "broken"
+        assert dead["attempts"] == config["max_attempts"]
+        assert dead["reason"] == "attempt 3 failed"
+
+    asyncio.run(scenario())
+
+
+def test_enqueue_never_blocks_when_full_or_stopped(config):
+    async def scenario():
+        queue = BackgroundTaskQueue(config)
+
+        async def noop():
+            pass
+
+        assert not queue.enqueue("early", noop)
+        queue.accepting = True
+        assert queue.enqueue("a", noop) and queue.enqueue("b", noop)
+        assert not queue.enqueue("c", noop)
+        assert [dead["reason"] for dead in queue.dead_letters] == ["queue not accepting work", "queue full"]
+        await queue.start()
+        await queue.drain()
+        assert queue.stats()["depth"] == 0
+        assert not queue.enqueue("late", noop)
+
+    asyncio.run(scenario())
@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+
+import pytest
+
+from utils import shared_cache, usage
+from utils.usage import (
+    BUDGET_ECONOMY, BUDGET_MINIMAL, BUDGET_NORMAL, UNATTRIBUTED_USER, UsageLedger, budget_mode, token_cost,
+    track_request_usage
+)
+
+
+@pytest.fixture(autouse=True)
+def local_counters(monkeypatch):
+    """Budget counters kept in this process, starting from zero"""
+    monkeypatch.setattr(usage._budget_counters, "enabled", False)
+    monkeypatch.setattr(shared_cache, "_local_counters", {})
+
+
+@pytest.fixture
+def config(monkeypatch):
+    config = dict(usage.USAGE_CONFIG, user_daily_tokens=1000, global_daily_cost=0.01, retention_days=7)
+    monkeypatch.setattr(usage, "USAGE_CONFIG", config)
+    return config
+
+
+@pytest.fixture
+def ledger(config):
+    return UsageLedger(config)
+
+
+def test_token_cost_uses_per_1k_prices():
+    assert token_cost("gpt-4o", 1000, 1000) == pytest.approx(0.005 + 0.015)
+    assert token_cost("unpriced-model", 1000, 1000) == 0.0
+
+
+def test_calls_are_attributed_to_the_request_and_its_user(ledger):
+    with track_request_usage("alice") as request:
+        ledger.record("product", "gpt-4o", 100, 50)
+        ledger.record("tone_guardian", "gpt-4o-mini", 10, 5)
+    ledger.record("summarizer", "gpt-4o-mini", 20, 10)
+
+    totals = request.to_dict()
+    assert totals["calls"] == 2
+    assert totals["total_tokens"] == 165
+    assert set(totals["by_agent"]) == {"product", "tone_guardian"}
+    users = {row[1] for row in ledger.drain()}
+    assert users == {"alice", UNATTRIBUTED_USER}
+
+
+def test_drain_takes_rows_and_restore_merges_them_back(ledger):
+    with track_request_usage("alice"):
+        ledger.record("product", "gpt-4o", 100, 50)
+    rows = ledger.drain()
+    assert ledger.drain() == []
+    with track_request_usage("alice"):
+        ledger.record("product", "gpt-4o", 10, 5)
+    ledger.restore(rows)
+    ((day, user, agent, model, calls, prompt, completion, cost),) = ledger.drain()
+    assert (user, agent, model, calls, prompt, completion) == ("alice", "product", "gpt-4o", 2, 110, 55)
+    assert cost == pytest.approx(token_cost("gpt-4o", 110, 55))
+
+
+def test_report_groups_unflushed_rows(ledger):
+    for user, agent in [("alice", "product"), ("bob", "product"), ("alice", "education")]:
+        with track_request_usage(user):
+            ledger.record(agent, "gpt-4o", 100, 0)
+    today = date.today()
+    by_agent = {row["agent"]: row["calls"] for row in ledger.report(today, "agent")}
+    assert by_agent == {"education": 1, "product": 2}
+    (alice,) = ledger.report(today, "day", user_id="alice")
+    assert alice["calls"] == 2 and alice["prompt_tokens"] == 200
+    assert ledger.report(today + timedelta(days=1), "user") == []
+
+
+def test_old_days_are_pruned_when_the_day_changes(ledger):
+    stale_day = (date.today() - timedelta(days=30)).isoformat()
+    ledger.restore([(stale_day, "alice", "product", "gpt-4o", 1, 10, 10, 0.0)])
+    ledger._day = date.today() - timedelta(days=1)
+    ledger.record("product", "gpt-4o", 1, 1)
+    assert [row[0] for row in ledger.drain()] == [date.today().isoformat()]
+
+
+def test_budget_modes(ledger):
+    assert budget_mode("alice") == BUDGET_NORMAL
+    with track_request_usage("alice"):
+        ledger.record("product", "gpt-3.5-turbo", 900, 100)
+    assert budget_mode("alice") == BUDGET_ECONOMY
+    assert budget_mode("bob") == BUDGET_NORMAL
+    # $0.01 global budget: 1000 prompt tokens of gpt-4-turbo cost exactly that
+    with track_request_usage("bob"):
+        ledger.record("product", "gpt-4-turbo", 1000, 0)
+    assert budget_mode("bob") == BUDGET_MINIMAL
+    assert budget_mode() == BUDGET_MINIMAL
+
+
+def test_unlimited_budgets_never_degrade(ledger, config):
+    config.update(user_daily_tokens=0, global_daily_cost=0)
+    with track_request_usage("alice"):
+        ledger.record("product", "gpt-4-turbo", 10 ** 6, 10 ** 6)
+    assert budget_mode("alice") == BUDGET_NORMAL
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from database.vector_index import QuantizedVectorIndex
+
+DIMENSION = 64
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((500, DIMENSION)).astype(np.float32)
+
+
+@pytest.fixture
+def make_index(tmp_path):
+    """Builds indexes backed by tmp_path and closes them after the test"""
+    indexes = []
+
+    def make(mode, vectors):
+        index = QuantizedVectorIndex("test", DIMENSION, mode=mode, directory=str(tmp_path))
+        indexes.append(index)
+        index.add(vectors)
+        return index
+
+    yield make
+    for index in indexes:
+        index.close()
+
+
+def _exact_top(vectors, query, k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return set(np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:k])
+
+
+@pytest.mark.parametrize("mode", ["float", "int8", "binary"])
+def test_finds_a_stored_vector_first(make_index, vectors, mode):
+    index = make_index(mode, vectors)
+    position, score = index.search(vectors[42], 5)[0]
+    assert position == 42
+    assert score == pytest.approx(1.0, abs=1e-5)
+
+
+# Mean recall@10 against exact search; uniformly random vectors are the
+# worst case for sign bits, real embeddings cluster and do better
+@pytest.mark.parametrize("mode, min_recall", [("int8", 0.95), ("binary", 0.7)])
+def test_rescoring_recovers_the_exact_ranking(make_index, vectors, mode, min_recall):
+    index = make_index(mode, vectors)
+    rng = np.random.default_rng(1)
+    recalls = []
+    for query in rng.standard_normal((20, DIMENSION)).astype(np.float32):
+        found = {position for position, _ in index.search(query, 10)}
+        recalls.append(len(found & _exact_top(vectors, query, 10)) / 10)
+    assert sum(recalls) / len(recalls) >= min_recall
+
+
+def test_scores_are_exact_cosine_best_first(make_index, vectors):
+    index = make_index("int8", vectors)
+    query = vectors[7] + vectors[8]
+    results = index.search(query, 5)
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+    position, score = results[0]
+    expected = vectors[position] @ query / (np.linalg.norm(vectors[position]) * np.linalg.norm(query))
+    assert score == pytest.approx(float(expected), abs=1e-5)
+
+
+def test_candidates_restrict_the_search(make_index, vectors):
+    index = make_index("binary", vectors)
+    results = index.search(vectors[42], 3, candidates=[1, 2, 3, 4])
+    assert {position for position, _ in results} <= {1, 2, 3, 4}
+    assert index.search(vectors[42], 3, candidates=[]) == []
+
+
+def test_int8_requantizes_when_new_vectors_widen_the_range(make_index, vectors):
+    index = make_index("int8", vectors[:100])
+    # A unit vector on one axis peaks above every normalized random vector
+    spike = np.zeros((1, DIMENSION), dtype=np.float32)
+    spike[0, 0] = 1.0
+    assert index.add(spike, payloads=["spike"]) == [100]
+    assert np.abs(index.codes).max() == 127
+    assert index.search(spike[0], 1)[0][0] == 100
+    assert index.payloads[100] == "spike"
+
+
+def test_memory_split_and_close(tmp_path, make_index, vectors):
+    index = make_index("binary", vectors)
+    memory = index.memory_bytes()
+    assert memory["resident"] == len(vectors) * DIMENSION // 8
+    assert memory["mmap_float32"] == len(vectors) * DIMENSION * 4
+    index.close()
+    assert not list(tmp_path.iterdir())
+
+
+def test_rejects_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        QuantizedVectorIndex("test", DIMENSION, mode="pq", directory=str(tmp_path))
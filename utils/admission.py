@@ -0,0 +1,210 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Dict, Optional
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Lower value is served first"""
+    EMERGENCY = 0
+    HIGH = 1
+    NORMAL = 2
+    LOW = 3
+
+
+ADMISSION_CONFIG = {
+    # Concurrent LLM calls across the whole process
+    "max_concurrency": int(os.getenv("NUA_LLM_MAX_CONCURRENCY", "32")),
+    # Calls allowed to wait for a slot; beyond this the lowest priority is rejected
+    "max_queue": int(os.getenv("NUA_ADMISSION_QUEUE_SIZE", "256")),
+    # Queue depth at which new low-priority requests are shed before they start
+    "shed_depth": int(os.getenv("NUA_ADMISSION_SHED_DEPTH", "64")),
+    # Longest a call may wait for a slot; emergency/high wait for as long as their stage budget allows
+    "max_wait": {
+        Priority.NORMAL: float(os.getenv("NUA_ADMISSION_MAX_WAIT", "10")),
+        Priority.LOW: float(os.getenv("NUA_ADMISSION_LOW_MAX_WAIT", "5")),
+    },
+    "retry_after": int(os.getenv("NUA_ADMISSION_RETRY_AFTER", "5")),
+}
+
+WAIT_TIME = metrics.histogram(
+    "nua_admission_wait_seconds", "Time LLM calls waited for an admission slot", labels=("priority",)
+)
+REJECTED = metrics.counter(
+    "nua_admission_rejected_total", "Work rejected by admission control", labels=("priority", "reason")
+)
+IN_FLIGHT = metrics.gauge("nua_admission_in_flight", "LLM calls holding an admission slot")
+QUEUE_DEPTH = metrics.gauge("nua_admission_queue_depth", "LLM calls waiting for an admission slot")
+
+
+class AdmissionRejected(Exception):
+    """Raised when work is shed; `retry_after` is a hint in seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _RequestPriority:
+    """Mutable so an escalation made in one pipeline stage is seen by the others"""
+    __slots__ = ("level", "admitted")
+
+    def __init__(self, level: Priority, admitted: bool = False):
+        self.level = level
+        self.admitted = admitted
+
+
+_request_priority: contextvars.ContextVar = contextvars.ContextVar("nua_request_priority", default=None)
+
+
+def set_request_priority(level: Priority, admitted: bool = False):
+    """
+    Tag the current request; tasks it spawns afterwards share the tag.
+    `admitted` work (e.g. a batch accepted by check()) queues for slots
+    without its priority's max_wait.
+    """
+    _request_priority.set(_RequestPriority(level, admitted))
+
+
+def escalate_request_priority(level: Priority):
+    """Raise (never lower) the current request's priority, e.g. after classification"""
+    holder = _request_priority.get()
+    if holder is not None and level < holder.level:
+        holder.level = level
+
+
+def current_priority() -> Priority:
+    """Work outside any request (background tasks, warm-up) counts as low priority"""
+    holder = _request_priority.get()
+    return holder.level if holder is not None else Priority.LOW
+
+
+def request_admitted() -> bool:
+    holder = _request_priority.get()
+    return holder is not None and holder.admitted
+
+
+class AdmissionController:
+    """
+    Bounded concurrency with a priority queue. Freed slots go to the
+    highest-priority waiter (FIFO within a priority); when the queue is full
+    the lowest-priority waiter is rejected to make room.
+    """
+
+    def __init__(self, config: Dict = None):
+        config = config or ADMISSION_CONFIG
+        self.max_concurrency = config["max_concurrency"]
+        self.max_queue = config["max_queue"]
+        self.shed_depth = config["shed_depth"]
+        self.max_wait = config["max_wait"]
+        self.retry_after = config["retry_after"]
+        self.in_flight = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    @property
+    def depth(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def check(self, priority: Priority):
+        """Shed a request up front instead of letting it queue behind the backlog"""
+        depth = self.depth
+        if (priority >= Priority.LOW and depth >= self.shed_depth) or \
+                (priority > Priority.HIGH and depth >= self.max_queue):
+            REJECTED.inc(priority.name.lower(), "shed")
+            raise AdmissionRejected("Server is overloaded, try again later", self.retry_after)
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[Priority] = None):
+        if priority is None:
+            priority = current_priority()
+            max_wait = None if request_admitted() else self.max_wait.get(priority)
+        else:
+            max_wait = self.max_wait.get(priority)
+        await self._acquire(priority, max_wait)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: Priority, max_wait: Optional[float]):
+        label = priority.name.lower()
+        if self.in_flight < self.max_concurrency and not self.depth:
+            self.in_flight += 1
+            IN_FLIGHT.set(value=self.in_flight)
+            WAIT_TIME.observe(label, value=0.0)
+            return
+
+        if self.depth >= self.max_queue:
+            self._evict_lowest(priority)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (int(priority), next(self._sequence), future)
+        heapq.heappush(self._waiters, entry)
+        QUEUE_DEPTH.set(value=self.depth)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=max_wait)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Granted just as the wait expired; hand the slot on
+                self._release()
+            future.cancel()
+            REJECTED.inc(label, "timeout")
+            raise AdmissionRejected(f"Waited {time.monotonic() - started:.1f}s for an LLM slot", self.retry_after)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._release()
+            future.cancel()
+            raise
+        finally:
+            QUEUE_DEPTH.set(value=self.depth)
+        WAIT_TIME.observe(label, value=time.monotonic() - started)
+
+    def _evict_lowest(self, priority: Priority):
+        pending = [entry for entry in self._waiters if not entry[2].done()]
+        # Worst priority, newest first among equals
+        lowest = max(pending, key=lambda entry: (entry[0], entry[1]), default=None)
+        if lowest is None or lowest[0] <= priority:
+            REJECTED.inc(priority.name.lower(), "queue_full")
+            raise AdmissionRejected("Admission queue is full", self.retry_after)
+        lowest[2].set_exception(AdmissionRejected("Displaced by higher-priority work", self.retry_after))
+        REJECTED.inc(Priority(lowest[0]).name.lower(), "displaced")
+
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # The slot passes straight to the waiter; in_flight is unchanged
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+        IN_FLIGHT.set(value=self.in_flight)
+
+    def stats(self) -> Dict:
+        waiting = {}
+        for level, _, future in self._waiters:
+            if not future.done():
+                name = Priority(level).name.lower()
+                waiting[name] = waiting.get(name, 0) + 1
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": sum(waiting.values()),
+            "max_queue": self.max_queue,
+            "waiting_by_priority": waiting,
+        }
+
+
+# Shared by every LLMClient in the process
+llm_admission = AdmissionController()
@@ -0,0 +1,41 @@
+import os
+import time
+from typing import Dict, Optional
+
+# End-to-end request deadline and the per-stage slices of it (seconds).
+# A stage never gets more than what is left of the overall deadline.
+DEFAULT_STAGE_BUDGETS = {
+    "classify": float(os.getenv("NUA_BUDGET_CLASSIFY", "4")),
+    "retrieve": float(os.getenv("NUA_BUDGET_RETRIEVE", "2")),
+    "generate": float(os.getenv("NUA_BUDGET_GENERATE", "12")),
+    "validate": float(os.getenv("NUA_BUDGET_VALIDATE", "2")),
+}
+DEFAULT_TOTAL_BUDGET = float(os.getenv("NUA_DEADLINE_SECONDS", "20"))
+
+
+class Deadline:
+    """
+    Tracks an end-to-end deadline and hands out per-stage timeouts
+    """
+
+    def __init__(self, total: float = DEFAULT_TOTAL_BUDGET, stage_budgets: Optional[Dict[str, float]] = None):
+        self.total = total
+        self.stage_budgets = stage_budgets or DEFAULT_STAGE_BUDGETS
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + total
+
+    def remaining(self) -> float:
+        """Seconds left before the overall deadline"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def budget(self, stage: str) -> float:
+        """Timeout for a stage: its own budget, capped by what is left overall"""
+        stage_budget = self.stage_budgets.get(stage, self.total)
+        return min(stage_budget, self.remaining())
@@ -0,0 +1,211 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+from utils.metrics import metrics
+from utils.shared_cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+# Optional accelerators: orjson for encoding, brotli for "br" compression
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+HTTP_CACHE_CONFIG = {
+    # Clients may reuse a report this long before revalidating
+    "max_age": int(os.getenv("NUA_REPORT_MAX_AGE", "5")),
+    # Smaller payloads aren't worth compressing
+    "compress_min_bytes": int(os.getenv("NUA_COMPRESS_MIN_BYTES", "1024")),
+    # Encoded (and compressed) report bodies kept per process
+    "max_bodies": int(os.getenv("NUA_REPORT_CACHE_SIZE", "128")),
+    # Reports over windows relative to now get a new ETag at least this often (seconds)
+    "window_bucket": int(os.getenv("NUA_REPORT_WINDOW_BUCKET", "3600")),
+}
+
+REPORT_REQUESTS = metrics.counter(
+    "nua_report_requests_total", "Conditional-GET report requests by outcome", labels=("outcome",)
+)
+
+_versions = SharedCache("aggregate_version", ttl=30 * 24 * 3600)
+_process_started = time.time()
+# This process's own bumps, for when the shared tier is disabled
+_local_modified: Dict[str, float] = {}
+
+
+def dumps_json(content: Any) -> bytes:
+    """Compact JSON bytes; orjson when available, anything unknown via str()"""
+    if HAS_ORJSON:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=str, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson when available. Return it directly to skip jsonable_encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+def bump_version(aggregate: str):
+    """Mark an aggregate as changed; reports derived from it get a new ETag"""
+    now = time.time()
+    _versions.incr(aggregate)
+    _versions.set(f"{aggregate}:modified", now)
+    _local_modified[aggregate] = now
+
+
+def aggregate_version(aggregate: str) -> Tuple[int, float]:
+    """(version, last modified epoch seconds) of an aggregate"""
+    version = _versions.get(aggregate) or 0
+    modified = _versions.get(f"{aggregate}:modified") or _local_modified.get(aggregate) or _process_started
+    return int(version), float(modified)
+
+
+class ConditionalGetMiddleware:
+    """
+    ETag / Last-Modified / Cache-Control for read-only report routes, keyed
+    on the versions of the aggregates (tables) each route reads. Reports
+    over windows relative to now also change with the time bucket, so they
+    roll over even without new writes. A matching If-None-Match (or
+    If-Modified-Since) gets a 304 before the endpoint runs; otherwise the
+    encoded body is kept per (ETag, encoding) so repeat polls of an
+    unchanged report skip both computation and compression.
+    """
+
+    def __init__(self, app, routes: Dict[str, Tuple[Tuple[str, ...], int]], exclude: Tuple[str, ...] = (),
+                 config: Dict = None):
+        self.app = app
+        # path prefix -> (aggregates read, time bucket in seconds or 0); longest prefix wins
+        self.routes = dict(sorted(routes.items(), key=lambda item: len(item[0]), reverse=True))
+        # Prefixes passed straight through (streamed responses can't be buffered)
+        self.exclude = tuple(exclude)
+        self.config = config or HTTP_CACHE_CONFIG
+        self._bodies: "OrderedDict[Tuple[str, str], Tuple[int, List[Tuple[bytes, bytes]], bytes]]" = OrderedDict()
+
+    def _route_for(self, path: str) -> Optional[Tuple[Tuple[str, ...], int]]:
+        if path.startswith(self.exclude):
+            return None
+        for prefix, route in self.routes.items():
+            if path.startswith(prefix):
+                return route
+        return None
+
+    async def __call__(self, scope, receive, send):
+        route = self._route_for(scope["path"]) if scope["type"] == "http" and scope["method"] == "GET" else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        aggregates, bucket_seconds = route
+        parts, modified = [], _process_started
+        for aggregate in aggregates:
+            version, aggregate_modified = aggregate_version(aggregate)
+            parts.append(f"{aggregate}:{version}")
+            modified = max(modified, aggregate_modified)
+        if bucket_seconds:
+            bucket = int(time.time() // bucket_seconds)
+            parts.append(f"bucket:{bucket}")
+            modified = max(modified, bucket * bucket_seconds)
+        identity = f"{scope['path']}?{scope.get('query_string', b'').decode('latin-1')}|{'|'.join(parts)}"
+        etag = '"%s"' % hashlib.sha1(identity.encode("utf-8")).hexdigest()[:20]
+        validators = [
+            (b"etag", etag.encode("latin-1")),
+            (b"last-modified", formatdate(modified, usegmt=True).encode("latin-1")),
+            (b"cache-control", f"private, max-age={self.config['max_age']}, must-revalidate".encode("latin-1")),
+            (b"vary", b"Accept-Encoding"),
+        ]
+
+        if self._not_modified(request_headers, etag, modified):
+            REPORT_REQUESTS.inc("not_modified")
+            await send({"type": "http.response.start", "status": 304, "headers": validators})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        encoding = self._pick_encoding(request_headers.get("accept-encoding", ""))
+        cached = self._bodies.get((etag, encoding))
+        if cached is not None:
+            self._bodies.move_to_end((etag, encoding))
+            REPORT_REQUESTS.inc("cached")
+            await self._send(send, *cached)
+            return
+
+        status, headers, body = await self._capture(scope, receive)
+        if status != 200:
+            REPORT_REQUESTS.inc("uncacheable")
+            await self._send(send, status, headers, body)
+            return
+        headers = [(k, v) for k, v in headers if k.lower() not in (b"content-length", b"etag", b"cache-control")]
+        headers.extend(validators)
+        if encoding != "identity" and len(body) >= self.config["compress_min_bytes"]:
+            body = brotli.compress(body, quality=5) if encoding == "br" else gzip.compress(body, compresslevel=6)
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+        # Keyed by what the client accepts, whether or not the body ended up compressed
+        self._remember((etag, encoding), (status, headers, body))
+        REPORT_REQUESTS.inc("computed")
+        await self._send(send, status, headers, body)
+
+    @staticmethod
+    def _not_modified(request_headers: Dict[str, str], etag: str, modified: float) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags or f"W/{etag}" in tags
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _pick_encoding(accept_encoding: str) -> str:
+        offered = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+        if HAS_BROTLI and "br" in offered:
+            return "br"
+        if "gzip" in offered:
+            return "gzip"
+        return "identity"
+
+    async def _capture(self, scope, receive) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+        response = {"status": 500, "headers": [], "body": []}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        return response["status"], response["headers"], b"".join(response["body"])
+
+    def _remember(self, key: Tuple[str, str], entry):
+        self._bodies[key] = entry
+        while len(self._bodies) > self.config["max_bodies"]:
+            self._bodies.popitem(last=False)
+
+    @staticmethod
+    async def _send(send, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import List, Optional, Tuple
+
+from langchain.schema import BaseMessage
+
+from utils.admission import llm_admission
+from utils.metrics import record_tokens
+from utils.usage import usage_ledger
+
+logger = logging.getLogger(__name__)
+
+# "openai" for real calls, "stub" for the offline benchmark backends
+LLM_BACKEND = os.getenv("NUA_LLM_BACKEND", "openai")
+EMBEDDING_BACKEND = os.getenv("NUA_EMBEDDING_BACKEND", LLM_BACKEND)
+
+# Hedged requests: if a call is still running the observed p95 latency after
+# it got its admission slot, fire a duplicate and take whichever answers
+# first. No hedge is sent while other calls are waiting for slots.
+HEDGE_ENABLED = os.getenv("NUA_LLM_HEDGE", "false").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("NUA_LLM_HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_SAMPLES = 20
+
+
+def token_usage(message: BaseMessage) -> Tuple[int, int]:
+    """(prompt_tokens, completion_tokens) reported by the provider, if any"""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    metadata = getattr(message, "response_metadata", None) or {}
+    usage = metadata.get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+class LatencyWindow:
+    """
+    Rolling window of recent call latencies used to pick the hedge delay
+    """
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(p * len(ordered)))
+        return ordered[index]
+
+
+class LLMClient:
+    """
+    Thin wrapper around ChatOpenAI that records latency and token usage (under
+    `agent`) and optionally hedges calls. The underlying client (and the
+    openai SDK import) is created on first use.
+    """
+
+    def __init__(self, temperature: float, model: str = "gpt-4-turbo", hedge: Optional[bool] = None, agent: str = "default"):
+        self.temperature = temperature
+        self.model = model
+        self.agent = agent
+        self.hedge = HEDGE_ENABLED if hedge is None else hedge
+        self.latency = LatencyWindow()
+        self._llm = None
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            if LLM_BACKEND == "stub":
+                from benchmarks.stubs import StubChatModel
+                self._llm = StubChatModel()
+            else:
+                try:
+                    from langchain_openai import ChatOpenAI
+                except ImportError:
+                    from langchain.chat_models import ChatOpenAI
+                self._llm = ChatOpenAI(temperature=self.temperature, model=self.model)
+        return self._llm
+
+    async def apredict_messages(self, messages: List[BaseMessage]) -> BaseMessage:
+        """
+        Run a chat completion. Timeouts are the caller's job (asyncio.wait_for)
+        """
+        hedge_after = self.latency.percentile(HEDGE_PERCENTILE) if self.hedge else None
+        if hedge_after is None:
+            return await self._timed_call(messages)
+        return await self._hedged_call(messages, hedge_after)
+
+    async def _timed_call(self, messages: List[BaseMessage], admitted: Optional[asyncio.Event] = None) -> BaseMessage:
+        # Waits for a slot at the current request's priority (see utils.admission)
+        async with llm_admission.slot():
+            if admitted is not None:
+                admitted.set()
+            started = time.monotonic()
+            response = await self.llm.apredict_messages(messages)
+            self.latency.observe(time.monotonic() - started)
+        prompt_tokens, completion_tokens = token_usage(response)
+        record_tokens(self.model, prompt_tokens, completion_tokens)
+        usage_ledger.record(self.agent, self.model, prompt_tokens, completion_tokens)
+        return response
+
+    async def _hedged_call(self, messages: List[BaseMessage], hedge_after: float) -> BaseMessage:
+        admitted = asyncio.Event()
+        attempts = [asyncio.ensure_future(self._timed_call(messages, admitted))]
+        try:
+            # Time spent queueing for a slot doesn't count toward the hedge delay
+            slot_wait = asyncio.ensure_future(admitted.wait())
+            try:
+                await asyncio.wait([attempts[0], slot_wait], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                slot_wait.cancel()
+            done, _ = await asyncio.wait(attempts, timeout=hedge_after)
+            if not done:
+                if llm_admission.depth:
+                    # Saturated: a duplicate would only lengthen the queue
+                    logger.debug("LLM call is slow but calls are queued for slots, not hedging")
+                else:
+                    logger.info(f"LLM call exceeded p{int(HEDGE_PERCENTILE * 100)} ({hedge_after:.2f}s), sending hedge request")
+                    attempts.append(asyncio.ensure_future(self._timed_call(messages)))
+
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Every attempt failed; surface the primary's error
+            return attempts[0].result()
+        finally:
+            # Also runs when the caller's stage budget cancels us
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
@@ -0,0 +1,159 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, Tuple
+
+# Latency buckets (seconds) sized for a mix of local steps and LLM round trips
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: Tuple[str, ...]) -> Tuple[str, ...]:
+        return tuple(str(label) for label in labels)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} {self.type_name}"
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, one series per label combination"""
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        yield from super().render()
+        for key, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.label_names, key)} {value}"
+
+
+class Gauge(Counter):
+    """Value that goes up and down (e.g. requests in flight)"""
+    type_name = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        self.values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed distribution, Prometheus style"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self.series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, *labels, value: float):
+        key = self._key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        yield from super().render()
+        for key, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, 'le="%s"' % bound)
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            cumulative += series[len(self.buckets)]
+            labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {series[-1]}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    In-process metrics store rendered in Prometheus text format.
+    No external collector: /api/v1/admin/metrics scrapes this directly.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_LATENCY = metrics.histogram(
+    "nua_stage_duration_seconds", "Time spent in each request pipeline stage", labels=("stage",)
+)
+STAGE_IN_FLIGHT = metrics.gauge(
+    "nua_stage_in_flight", "Pipeline stages currently executing", labels=("stage",)
+)
+CACHE_REQUESTS = metrics.counter(
+    "nua_cache_requests_total", "Cache lookups by cache and result (hit/miss)", labels=("cache", "result")
+)
+LLM_TOKENS = metrics.counter(
+    "nua_llm_tokens_total", "LLM tokens consumed by model and kind (prompt/completion)", labels=("model", "kind")
+)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """Time a block as a pipeline stage and count it as in flight while it runs"""
+    STAGE_IN_FLIGHT.inc(stage)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(stage, value=time.perf_counter() - started)
+        STAGE_IN_FLIGHT.dec(stage)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def record_tokens(model: str, prompt_tokens: int, completion_tokens: int):
+    if prompt_tokens:
+        LLM_TOKENS.inc(model, "prompt", amount=prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.inc(model, "completion", amount=completion_tokens)
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from utils.metrics import track_stage
+
+logger = logging.getLogger(__name__)
+
+# Keeps background stage tasks referenced until they finish
+_background_tasks = set()
+
+
+class StageSkipped(Exception):
+    """Raised inside a stage whose dependency failed"""
+
+
+class Stage:
+    """
+    One node of a pipeline graph.
+    `func(context, **inputs)` receives the shared request context plus the
+    results of the stages named in `depends_on`. Critical stages gate the
+    response; non-critical ones keep running in the background.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Awaitable[Any]],
+        depends_on: Iterable[str] = (),
+        critical: bool = True
+    ):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.critical = critical
+
+
+class PipelineRun:
+    """Results of the critical path plus a handle on the background stages"""
+
+    def __init__(self, results: Dict[str, Any], background: Optional[asyncio.Future]):
+        self.results = results
+        self.background = background
+
+    async def wait_background(self) -> Dict[str, Any]:
+        """Wait for background stages (tests, replay, batch tooling)"""
+        if self.background:
+            await self.background
+        return self.results
+
+
+class StageGraph:
+    """
+    Declarative DAG of stages. Every stage starts as soon as its
+    dependencies are done; run() returns once the critical stages finish.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order, visiting, done = [], set(), set()
+
+        def visit(name: str):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a cycle through stage '{name}'")
+            visiting.add(name)
+            stage = self.stages[name]
+            for dep in stage.depends_on:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+                if stage.critical and not self.stages[dep].critical:
+                    raise ValueError(f"Critical stage '{name}' cannot depend on background stage '{dep}'")
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    async def run(self, context: Dict[str, Any], queue=None) -> PipelineRun:
+        """
+        With a task queue, background stages are not started alongside the
+        critical path; they are enqueued once it has finished (they may then
+        only depend on critical stages).
+        """
+        critical = [name for name in self.order if self.stages[name].critical]
+        background = [name for name in self.order if not self.stages[name].critical]
+        if queue is not None:
+            return await self._run_with_queue(context, queue, critical, background)
+
+        tasks: Dict[str, asyncio.Future] = {}
+        for name in self.order:
+            stage = self.stages[name]
+            tasks[name] = asyncio.ensure_future(
+                self._run_stage(stage, context, {dep: tasks[dep] for dep in stage.depends_on})
+            )
+
+        outcomes = await asyncio.gather(*(tasks[name] for name in critical), return_exceptions=True)
+        results = dict(zip(critical, outcomes))
+
+        background_future = None
+        if background:
+            # Background stages that already finished are returned right away
+            for name in background:
+                task = tasks[name]
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    results[name] = task.result()
+            background_future = asyncio.ensure_future(
+                self._collect_background(background, tasks, results)
+            )
+            _background_tasks.add(background_future)
+            background_future.add_done_callback(_background_tasks.discard)
+
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+        return PipelineRun(results, background_future)
+
+    async def _run_with_queue(self, context: Dict[str, Any], queue, critical: List[str], background: List[str]) -> PipelineRun:
+        tasks: Dict[str, asyncio.Future] = {}
+        for name in critical:
+            stage = self.stages[name]
+            tasks[name] = asyncio.ensure_future(
+                self._run_stage(stage, context, {dep: tasks[dep] for dep in stage.depends_on})
+            )
+        outcomes = await asyncio.gather(*(tasks[name] for name in critical), return_exceptions=True)
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+        results = dict(zip(critical, outcomes))
+
+        for name in background:
+            stage = self.stages[name]
+            if any(dep not in results for dep in stage.depends_on):
+                raise ValueError(f"Queued stage '{name}' may only depend on critical stages")
+            inputs = {dep: results[dep] for dep in stage.depends_on}
+            queue.enqueue(name, self._run_queued, stage, context, inputs)
+        return PipelineRun(results, None)
+
+    async def _run_queued(self, stage: Stage, context: Dict[str, Any], inputs: Dict[str, Any]) -> Any:
+        with track_stage(stage.name):
+            return await stage.func(context, **inputs)
+
+    async def _run_stage(self, stage: Stage, context: Dict[str, Any], deps: Dict[str, asyncio.Future]) -> Any:
+        inputs = {}
+        for dep_name, dep_task in deps.items():
+            try:
+                inputs[dep_name] = await dep_task
+            except Exception as e:
+                raise StageSkipped(f"{stage.name} skipped: dependency '{dep_name}' failed") from e
+        started = time.perf_counter()
+        try:
+            with track_stage(stage.name):
+                return await stage.func(context, **inputs)
+        finally:
+            # Per-request breakdown for callers that ask for it (replay, batch tooling)
+            timings = context.get("stage_timings")
+            if timings is not None:
+                timings[stage.name] = time.perf_counter() - started
+
+    async def _collect_background(self, names: List[str], tasks: Dict[str, asyncio.Future], results: Dict[str, Any]):
+        outcomes = await asyncio.gather(*(tasks[name] for name in names), return_exceptions=True)
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, StageSkipped):
+                logger.debug(str(outcome))
+            elif isinstance(outcome, BaseException):
+                logger.error(f"Background stage '{name}' failed: {outcome}")
+            else:
+                results[name] = outcome
@@ -0,0 +1,218 @@
+import cProfile
+import itertools
+import logging
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sample", "cprofile")
+PROFILE_HEADER = b"x-nua-profile"
+
+PROFILER_CONFIG = {
+    # Profile a random fraction of matching requests (toggled at runtime from the admin API)
+    "enabled": os.getenv("NUA_PROFILER", "false").lower() in ("1", "true", "yes"),
+    "sample_rate": float(os.getenv("NUA_PROFILER_SAMPLE_RATE", "0.01")),
+    # "sample": stack snapshots of the event loop thread (collapsed stacks, low overhead)
+    # "cprofile": deterministic cProfile (pstats, slows the profiled request noticeably)
+    "mode": os.getenv("NUA_PROFILER_MODE", "sample"),
+    # Honour an "X-Nua-Profile: 1" request header even when sampling is off
+    "allow_header": os.getenv("NUA_PROFILER_HEADER", "false").lower() in ("1", "true", "yes"),
+    # Seconds between stack snapshots in sample mode
+    "interval": float(os.getenv("NUA_PROFILER_INTERVAL", "0.005")),
+    # Profiles kept per worker; the oldest is dropped first
+    "max_profiles": int(os.getenv("NUA_PROFILER_MAX_PROFILES", "32")),
+    "max_depth": 64,
+}
+
+PROFILES_CAPTURED = metrics.counter(
+    "nua_profiles_captured_total", "Request profiles captured by mode", labels=("mode",)
+)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """
+    Snapshots one thread's Python stack every `interval` seconds from a
+    helper thread. Work interleaved on the event loop by other requests is
+    sampled too, so a profile shows where the loop's CPU went meanwhile.
+    """
+
+    def __init__(self, thread_id: int, interval: float, max_depth: int):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="nua-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+
+class RequestProfiler:
+    """
+    Opt-in profiling of live requests. Disabled (the default), the
+    middleware below only reads `active`; at most one request per worker is
+    profiled at a time and finished profiles live in a bounded ring buffer.
+    Either mode sees the whole event loop thread, so other requests
+    interleaved with the profiled one show up in its profile.
+    """
+
+    def __init__(self, config: Dict = None):
+        self.config = dict(config or PROFILER_CONFIG)
+        self.profiles: deque = deque(maxlen=self.config["max_profiles"])
+        self._ids = itertools.count(1)
+        self._busy = False
+
+    @property
+    def active(self) -> bool:
+        return self.config["enabled"] or self.config["allow_header"]
+
+    def configure(self, enabled: Optional[bool] = None, sample_rate: Optional[float] = None,
+                  mode: Optional[str] = None, allow_header: Optional[bool] = None) -> Dict:
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"mode must be one of {', '.join(PROFILE_MODES)}")
+        if sample_rate is not None and not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        for key, value in (("enabled", enabled), ("sample_rate", sample_rate), ("mode", mode), ("allow_header", allow_header)):
+            if value is not None:
+                self.config[key] = value
+        return self.status()
+
+    def status(self) -> Dict:
+        return {
+            "enabled": self.config["enabled"],
+            "sample_rate": self.config["sample_rate"],
+            "mode": self.config["mode"],
+            "allow_header": self.config["allow_header"],
+            "worker_pid": os.getpid(),
+            "profiles": [self._summary(profile) for profile in self.profiles],
+        }
+
+    def should_profile(self, scope) -> bool:
+        if self._busy:
+            return False
+        if self.config["allow_header"] and any(
+            key == PROFILE_HEADER and value not in (b"", b"0") for key, value in scope["headers"]
+        ):
+            return True
+        return self.config["enabled"] and random.random() < self.config["sample_rate"]
+
+    def get(self, profile_id: int) -> Optional[Dict]:
+        for profile in self.profiles:
+            if profile["id"] == profile_id:
+                return profile
+        return None
+
+    @staticmethod
+    def _summary(profile: Dict) -> Dict:
+        return {key: value for key, value in profile.items() if key not in ("stacks", "stats")}
+
+    def collapsed(self, profiles: List[Dict]) -> str:
+        """Brendan Gregg's collapsed-stack format ("frame;frame;frame count"), merged over `profiles`"""
+        merged: Counter = Counter()
+        for profile in profiles:
+            merged.update(profile.get("stacks", {}))
+        return "".join(f"{stack} {count}\n" for stack, count in merged.most_common())
+
+    @staticmethod
+    def pstats_bytes(profile: Dict) -> bytes:
+        """Same bytes as pstats.Stats.dump_stats; load with pstats.Stats(path)"""
+        return marshal.dumps(profile["stats"])
+
+    def start(self, scope) -> Dict:
+        self._busy = True
+        mode = self.config["mode"]
+        run = {"id": next(self._ids), "mode": mode, "path": scope["path"], "started_at": time.time()}
+        if mode == "cprofile":
+            run["profiler"] = cProfile.Profile()
+            run["profiler"].enable()
+        else:
+            run["profiler"] = StackSampler(threading.get_ident(), self.config["interval"], self.config["max_depth"])
+            run["profiler"].start()
+        run["clock"] = time.perf_counter()
+        return run
+
+    def finish(self, run: Dict, status: int):
+        profiler = run.pop("profiler")
+        duration = time.perf_counter() - run.pop("clock")
+        try:
+            if run["mode"] == "cprofile":
+                profiler.disable()
+                profiler.create_stats()
+                run["stats"] = profiler.stats
+            else:
+                run["stacks"] = dict(profiler.stop())
+                run["samples"] = sum(run["stacks"].values())
+        finally:
+            self._busy = False
+        run.update(duration_ms=round(duration * 1000, 2), status=status)
+        self.profiles.append(run)
+        PROFILES_CAPTURED.inc(run["mode"])
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a fraction of HTTP requests under `prefixes`, from receiving the
+    body to sending the response, so parsing, validation and serialization
+    are included. Profiled responses carry an X-Nua-Profile-Id header.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler, prefixes=("/api/v1/chat",)):
+        self.app = app
+        self.profiler = profiler
+        self.prefixes = tuple(prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if not self.profiler.active or scope["type"] != "http" or not scope["path"].startswith(self.prefixes) \
+                or not self.profiler.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        run = self.profiler.start(scope)
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-nua-profile-id", str(run["id"]).encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            self.profiler.finish(run, status)
+
+
+request_profiler = RequestProfiler()
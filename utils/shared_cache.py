@@ -0,0 +1,201 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# One SQLite file on tmpfs acts as the host-local shared cache tier: every
+# uvicorn worker opens it, reads are lock-free under WAL, and writes are
+# atomic transactions. Nothing in it needs to survive a reboot.
+_DEFAULT_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+SHARED_CACHE_CONFIG = {
+    "path": os.getenv("NUA_SHARED_CACHE_PATH", os.path.join(_DEFAULT_DIR, "nua-shared-cache.sqlite3")),
+    "max_entries": int(os.getenv("NUA_SHARED_CACHE_MAX_ENTRIES", "50000")),
+    "enabled": os.getenv("NUA_SHARED_CACHE", "true").lower() in ("1", "true", "yes"),
+    # Longest a write waits for another worker's write lock. Callers run on the
+    # event loop, so this stays in milliseconds; a busy cache is treated as a
+    # miss (or a skipped write) rather than waited for.
+    "busy_timeout_ms": int(os.getenv("NUA_SHARED_CACHE_BUSY_MS", "50")),
+}
+
+# Check the size bound every N writes rather than on every write
+_EVICTION_CHECK_EVERY = 200
+
+_connection = None
+_connection_pid = None
+_lock = threading.Lock()
+_writes_since_check = 0
+
+# With the shared tier disabled, counters still count, per process:
+# full key -> (value, expires_at)
+_local_counters: Dict[str, Tuple[int, float]] = {}
+
+
+def _get_connection() -> sqlite3.Connection:
+    """Per-process connection (never reuse one inherited across fork)"""
+    global _connection, _connection_pid
+    if _connection is None or _connection_pid != os.getpid():
+        conn = sqlite3.connect(
+            SHARED_CACHE_CONFIG["path"], timeout=SHARED_CACHE_CONFIG["busy_timeout_ms"] / 1000,
+            isolation_level=None, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache(expires_at)")
+        _connection, _connection_pid = conn, os.getpid()
+    return _connection
+
+
+def _maybe_evict(conn: sqlite3.Connection):
+    global _writes_since_check
+    _writes_since_check += 1
+    if _writes_since_check < _EVICTION_CHECK_EVERY:
+        return
+    _writes_since_check = 0
+    conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+    (count,) = conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+    overflow = count - SHARED_CACHE_CONFIG["max_entries"]
+    if overflow > 0:
+        # Drop the entries closest to expiry (roughly the oldest), plus 10% headroom
+        conn.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at LIMIT ?)",
+            (overflow + SHARED_CACHE_CONFIG["max_entries"] // 10,)
+        )
+
+
+def _local_incr(key: str, amount: int, expires_at: float) -> int:
+    now = time.time()
+    if len(_local_counters) >= SHARED_CACHE_CONFIG["max_entries"]:
+        for stale in [k for k, (_, expires) in _local_counters.items() if expires <= now]:
+            del _local_counters[stale]
+    value, expires = _local_counters.get(key, (0, expires_at))
+    if expires <= now:
+        value, expires = 0, expires_at
+    _local_counters[key] = (value + amount, expires)
+    return value + amount
+
+
+def _local_counter(key: str) -> Optional[int]:
+    entry = _local_counters.get(key)
+    if entry is None or entry[1] <= time.time():
+        return None
+    return entry[0]
+
+
+class SharedCache:
+    """
+    Namespaced view of the host-wide cache shared by all worker processes.
+    Values are JSON-serialized; operations are synchronous but local (tmpfs)
+    and never wait more than busy_timeout_ms for another worker. Errors are
+    logged, never raised: reads miss, writes are skipped, and increments
+    count in this process only. Disabled (NUA_SHARED_CACHE=false), nothing
+    is cached, but counters keep working per process so versions and
+    budgets built on them still move.
+    """
+
+    def __init__(self, namespace: str, ttl: float = 300):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.enabled = SHARED_CACHE_CONFIG["enabled"]
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return _local_counter(self._key(key))
+        try:
+            with _lock:
+                row = _get_connection().execute(
+                    "SELECT value FROM cache WHERE key = ? AND expires_at > ?",
+                    (self._key(key), time.time())
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache read failed: {e}")
+            row = None
+        record_cache(self.namespace, row is not None)
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        if not self.enabled:
+            return
+        payload = json.dumps(value, default=str)
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        try:
+            with _lock:
+                conn = _get_connection()
+                conn.execute(
+                    "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                    (self._key(key), payload, expires_at)
+                )
+                _maybe_evict(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache write failed: {e}")
+
+    def delete(self, key: str):
+        if not self.enabled:
+            _local_counters.pop(self._key(key), None)
+            return
+        try:
+            with _lock:
+                _get_connection().execute("DELETE FROM cache WHERE key = ?", (self._key(key),))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache delete failed: {e}")
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """Every live (key, value) in this namespace; meant for small namespaces"""
+        if not self.enabled:
+            return []
+        prefix = self._key("")
+        try:
+            with _lock:
+                rows = _get_connection().execute(
+                    "SELECT key, value FROM cache WHERE key >= ? AND key < ? AND expires_at > ?",
+                    (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1), time.time())
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache scan failed: {e}")
+            return []
+        return [(key[len(prefix):], json.loads(value)) for key, value in rows]
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Atomic counter shared across workers (per process when the tier is disabled)"""
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        if not self.enabled:
+            with _lock:
+                return _local_incr(self._key(key), amount, expires_at)
+        try:
+            with _lock:
+                conn = _get_connection()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(
+                        "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + ?",
+                        (self._key(key), str(amount), expires_at, amount)
+                    )
+                    (value,) = conn.execute("SELECT value FROM cache WHERE key = ?", (self._key(key),)).fetchone()
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache increment failed, counting in this process only: {e}")
+            with _lock:
+                return _local_incr(self._key(key), amount, expires_at)
+        return int(value)
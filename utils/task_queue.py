@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TASK_QUEUE_CONFIG = {
+    "max_size": int(os.getenv("NUA_TASK_QUEUE_SIZE", "1000")),
+    "workers": int(os.getenv("NUA_TASK_QUEUE_WORKERS", "4")),
+    "max_attempts": int(os.getenv("NUA_TASK_MAX_ATTEMPTS", "3")),
+    "retry_backoff": float(os.getenv("NUA_TASK_RETRY_BACKOFF", "0.5")),
+    "dead_letter_size": 500,
+    "drain_timeout": float(os.getenv("NUA_TASK_DRAIN_TIMEOUT", "10")),
+}
+
+QUEUE_DEPTH = metrics.gauge("nua_task_queue_depth", "Background tasks waiting to run")
+QUEUE_AGE = metrics.histogram(
+    "nua_task_queue_age_seconds", "Time a background task waited in the queue before running", labels=("task",)
+)
+TASK_OUTCOMES = metrics.counter(
+    "nua_background_tasks_total", "Background task attempts by task and outcome", labels=("task", "outcome")
+)
+
+
+class _Job:
+    __slots__ = ("name", "func", "args", "kwargs", "attempts", "enqueued_at")
+
+    def __init__(self, name: str, func: Callable[..., Awaitable[Any]], args: tuple, kwargs: dict):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+
+
+class BackgroundTaskQueue:
+    """
+    In-process async work queue for side effects that must not delay the
+    response: bounded capacity, a fixed pool of workers, retries with
+    exponential backoff and a dead-letter buffer for jobs that keep failing.
+    """
+
+    def __init__(self, config: Dict = None):
+        config = config or TASK_QUEUE_CONFIG
+        self.max_attempts = config["max_attempts"]
+        self.retry_backoff = config["retry_backoff"]
+        self.worker_count = config["workers"]
+        self.drain_timeout = config["drain_timeout"]
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=config["max_size"])
+        self.dead_letters = deque(maxlen=config["dead_letter_size"])
+        self.workers: List[asyncio.Task] = []
+        self.accepting = False
+
+    async def start(self):
+        self.accepting = True
+        self.workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        logger.info(f"✓ Background task queue started with {self.worker_count} workers")
+
+    def enqueue(self, name: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> bool:
+        """Schedule `func(*args, **kwargs)`; never blocks the caller"""
+        job = _Job(name, func, args, kwargs)
+        if not self.accepting:
+            self._dead_letter(job, "queue not accepting work")
+            return False
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._dead_letter(job, "queue full")
+            return False
+        QUEUE_DEPTH.set(value=self.queue.qsize())
+        return True
+
+    async def drain(self):
+        """Stop accepting work, finish what is queued (up to drain_timeout), stop workers"""
+        self.accepting = False
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=self.drain_timeout)
+            logger.info("Background task queue drained")
+        except asyncio.TimeoutError:
+            logger.warning(f"Background task queue drain timed out with {self.queue.qsize()} tasks left")
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def stats(self) -> Dict:
+        return {
+            "accepting": self.accepting,
+            "depth": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "workers": len(self.workers),
+            "dead_letters": len(self.dead_letters),
+        }
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self.queue.get()
+            QUEUE_DEPTH.set(value=self.queue.qsize())
+            QUEUE_AGE.observe(job.name, value=time.monotonic() - job.enqueued_at)
+            try:
+                await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job: _Job):
+        while True:
+            job.attempts += 1
+            try:
+                await job.func(*job.args, **job.kwargs)
+                TASK_OUTCOMES.inc(job.name, "success")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if job.attempts >= self.max_attempts:
+                    self._dead_letter(job, str(e))
+                    return
+                TASK_OUTCOMES.inc(job.name, "retry")
+                delay = self.retry_backoff * (2 ** (job.attempts - 1))
+                logger.warning(f"Background task '{job.name}' failed (attempt {job.attempts}): {e}. Retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def _dead_letter(self, job: _Job, reason: str):
+        logger.error(f"Background task '{job.name}' dead-lettered after {job.attempts} attempts: {reason}")
+        TASK_OUTCOMES.inc(job.name, "dead_letter")
+        self.dead_letters.append({
+            "task": job.name,
+            "reason": reason,
+            "attempts": job.attempts,
+            "failed_at": datetime.now().isoformat(),
+        })
@@ -0,0 +1,225 @@
+import contextvars
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from utils.metrics import metrics
+from utils.shared_cache import SHARED_CACHE_CONFIG, SharedCache
+
+logger = logging.getLogger(__name__)
+
+# USD per 1K tokens as (prompt, completion); NUA_MODEL_PRICES (JSON) overrides or adds models
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.005, 0.015),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+MODEL_PRICES.update({model: tuple(price) for model, price in json.loads(os.getenv("NUA_MODEL_PRICES", "{}")).items()})
+
+USAGE_CONFIG = {
+    # Tokens one user may spend per day before their requests run in economy mode (0 = unlimited)
+    "user_daily_tokens": int(os.getenv("NUA_USER_DAILY_TOKEN_BUDGET", "0")),
+    # Spend across all users per day (USD) before every request runs in minimal mode (0 = unlimited)
+    "global_daily_cost": float(os.getenv("NUA_GLOBAL_DAILY_COST_BUDGET", "0")),
+    # Model for the single fused call made in economy mode
+    "economy_model": os.getenv("NUA_ECONOMY_MODEL", "gpt-3.5-turbo"),
+    # Unflushed ledger days kept in memory (memory-only mode never flushes)
+    "retention_days": int(os.getenv("NUA_USAGE_RETENTION_DAYS", "7")),
+}
+
+# Budget modes, cheapest last: economy answers with one call to the economy
+# model, minimal answers from retrieval alone with no LLM calls
+BUDGET_NORMAL = "normal"
+BUDGET_ECONOMY = "economy"
+BUDGET_MINIMAL = "minimal"
+
+LLM_COST = metrics.counter(
+    "nua_llm_cost_usd_total", "Estimated LLM spend in USD by agent and model", labels=("agent", "model")
+)
+BUDGET_MODE = metrics.counter(
+    "nua_budget_mode_total", "Requests by the budget mode they ran in", labels=("mode",)
+)
+
+# Daily spend counters shared by every worker on the host (costs in micro-dollars)
+_budget_counters = SharedCache("llm_budget", ttl=2 * 24 * 3600)
+
+UNATTRIBUTED_USER = "-"
+
+if (USAGE_CONFIG["user_daily_tokens"] or USAGE_CONFIG["global_daily_cost"]) and not SHARED_CACHE_CONFIG["enabled"]:
+    logger.warning(
+        "LLM budgets are configured but the shared cache is disabled: spend is counted per worker process, "
+        "so each worker enforces the budgets on its own share of traffic only"
+    )
+
+
+def token_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost; models without a price count as free"""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+class RequestUsage:
+    """Token and cost totals for one request, broken down by agent"""
+
+    def __init__(self, user_id: Optional[str] = None):
+        self.user_id = user_id
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.by_agent: Dict[str, Dict] = {}
+
+    def add(self, agent: str, model: str, prompt_tokens: int, completion_tokens: int, cost: float):
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost_usd += cost
+        entry = self.by_agent.setdefault(agent, {"model": model, "calls": 0, "tokens": 0, "cost_usd": 0.0})
+        entry["calls"] += 1
+        entry["tokens"] += prompt_tokens + completion_tokens
+        entry["cost_usd"] += cost
+
+    def to_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "by_agent": {
+                agent: dict(entry, cost_usd=round(entry["cost_usd"], 6)) for agent, entry in self.by_agent.items()
+            },
+        }
+
+
+_request_usage: contextvars.ContextVar = contextvars.ContextVar("nua_request_usage", default=None)
+
+
+@contextmanager
+def track_request_usage(user_id: Optional[str] = None):
+    """Attribute LLM calls made inside the block (and tasks it spawns) to one request"""
+    usage = RequestUsage(user_id)
+    token = _request_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _request_usage.reset(token)
+
+
+class UsageLedger:
+    """
+    Per (day, user, agent, model) totals accumulated in memory and drained
+    by the database's periodic flush. Rollups per agent, user or day are
+    sums over these rows.
+    """
+
+    def __init__(self, config: Dict = None):
+        self.config = config or USAGE_CONFIG
+        self._rows: Dict[Tuple[str, str, str, str], List] = {}
+        self._day = date.today()
+
+    def record(self, agent: str, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Account one LLM call everywhere it is tracked; returns its cost"""
+        cost = token_cost(model, prompt_tokens, completion_tokens)
+        usage = _request_usage.get()
+        if usage is not None:
+            usage.add(agent, model, prompt_tokens, completion_tokens, cost)
+        user_id = usage.user_id if usage is not None and usage.user_id else UNATTRIBUTED_USER
+
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self._prune(today)
+        row = self._rows.setdefault((today.isoformat(), user_id, agent, model), [0, 0, 0, 0.0])
+        row[0] += 1
+        row[1] += prompt_tokens
+        row[2] += completion_tokens
+        row[3] += cost
+
+        LLM_COST.inc(agent, model, amount=cost)
+        day = today.isoformat()
+        if self.config["user_daily_tokens"] and user_id != UNATTRIBUTED_USER:
+            _budget_counters.incr(f"tokens:{day}:{user_id}", prompt_tokens + completion_tokens)
+        if self.config["global_daily_cost"]:
+            _budget_counters.incr(f"cost:{day}", int(cost * 1_000_000))
+        return cost
+
+    def _prune(self, today: date):
+        oldest = (today - timedelta(days=self.config["retention_days"])).isoformat()
+        for key in [key for key in self._rows if key[0] < oldest]:
+            del self._rows[key]
+
+    def drain(self) -> List[Tuple]:
+        """Take every unflushed row as (day, user_id, agent, model, calls, prompt, completion, cost)"""
+        rows, self._rows = self._rows, {}
+        return [key + tuple(values) for key, values in rows.items()]
+
+    def restore(self, rows: List[Tuple]):
+        """Put back rows whose flush failed, merging with anything recorded since"""
+        for row in rows:
+            totals = self._rows.setdefault(tuple(row[:4]), [0, 0, 0, 0.0])
+            for i, value in enumerate(row[4:]):
+                totals[i] += value
+
+    def report(self, since: date, group_by: str, user_id: Optional[str] = None) -> List[Dict]:
+        """Unflushed totals per day and `group_by` column (used when there is no database)"""
+        column = {"user": 1, "agent": 2, "model": 3}.get(group_by)
+        grouped: Dict[Tuple[str, Optional[str]], List] = {}
+        for (day, user, agent, model), values in self._rows.items():
+            if day < since.isoformat() or (user_id and user != user_id):
+                continue
+            key = (day, (day, user, agent, model)[column] if column else None)
+            totals = grouped.setdefault(key, [0, 0, 0, 0.0])
+            for i, value in enumerate(values):
+                totals[i] += value
+        return [
+            usage_row(day, group_by, group, *totals)
+            for (day, group), totals in sorted(grouped.items())
+        ]
+
+
+def usage_row(day, group_by: str, group, calls, prompt_tokens, completion_tokens, cost) -> Dict:
+    row = {"day": str(day)}
+    if group_by != "day":
+        row[group_by] = group
+    row.update({
+        "calls": int(calls),
+        "prompt_tokens": int(prompt_tokens),
+        "completion_tokens": int(completion_tokens),
+        "cost_usd": round(float(cost), 6),
+    })
+    return row
+
+
+def budget_status(user_id: Optional[str] = None) -> Dict:
+    """Today's spend against the configured budgets"""
+    day = date.today().isoformat()
+    status = {
+        "global_cost_usd": (_budget_counters.get(f"cost:{day}") or 0) / 1_000_000,
+        "global_daily_cost": USAGE_CONFIG["global_daily_cost"],
+        "user_daily_tokens": USAGE_CONFIG["user_daily_tokens"],
+        # Without the shared cache each worker counts (and enforces) only its own spend
+        "per_worker": not SHARED_CACHE_CONFIG["enabled"],
+    }
+    if user_id:
+        status["user_tokens"] = _budget_counters.get(f"tokens:{day}:{user_id}") or 0
+    return status
+
+
+def budget_mode(user_id: Optional[str] = None) -> str:
+    """Cheapest path the request must take given today's spend"""
+    day = date.today().isoformat()
+    global_limit = USAGE_CONFIG["global_daily_cost"]
+    if global_limit and (_budget_counters.get(f"cost:{day}") or 0) >= global_limit * 1_000_000:
+        return BUDGET_MINIMAL
+    user_limit = USAGE_CONFIG["user_daily_tokens"]
+    if user_limit and user_id and (_budget_counters.get(f"tokens:{day}:{user_id}") or 0) >= user_limit:
+        return BUDGET_ECONOMY
+    return BUDGET_NORMAL
+
+
+usage_ledger = UsageLedger()